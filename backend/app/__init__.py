@@ -9,17 +9,121 @@ load_dotenv()
 def create_app():
     app = Flask(__name__)
 
+    from app.services.responses import CompactJSONProvider
+    app.json = CompactJSONProvider(app)
+
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev-secret-key-change-in-production')
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///code_clone_detector.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # Connection pool for server databases; pragmas for SQLite files
+    app.config['DB_POOL_SIZE'] = int(os.getenv('DB_POOL_SIZE', 10))
+    app.config['DB_MAX_OVERFLOW'] = int(os.getenv('DB_MAX_OVERFLOW', 20))
+    app.config['DB_POOL_TIMEOUT'] = int(os.getenv('DB_POOL_TIMEOUT', 30))
+    app.config['DB_POOL_RECYCLE'] = int(os.getenv('DB_POOL_RECYCLE', 1800))
+    app.config['SQLITE_WAL'] = os.getenv('SQLITE_WAL', '1') == '1'
+    app.config['SQLITE_BUSY_TIMEOUT_MS'] = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 15000))
+    app.config['SQLITE_MMAP_BYTES'] = int(os.getenv('SQLITE_MMAP_BYTES', 256 * 1024 * 1024))
+    from app.models.engine import engine_options, install_sqlite_pragmas, sqlite_pragmas
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+
     app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwt-secret-key-change-in-production')
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = 86400 * 7
 
+    # Each web worker gets its own hashing and analysis pools; by default
+    # they share the cores among the WEB_CONCURRENCY workers
+    pool_processes = max(1, (os.cpu_count() or 1) // max(1, int(os.getenv('WEB_CONCURRENCY', 1))))
+
+    # Password hashing pool: bcrypt cost, processes, pending limit and the
+    # longest a login may wait for its hash before getting a 503
+    app.config['BCRYPT_LOG_ROUNDS'] = int(os.getenv('BCRYPT_LOG_ROUNDS', 12))
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS', 0)) or pool_processes
+    app.config['PASSWORD_HASH_QUEUE_DEPTH'] = int(os.getenv('PASSWORD_HASH_QUEUE_DEPTH', 64))
+    app.config['PASSWORD_HASH_TIMEOUT'] = float(os.getenv('PASSWORD_HASH_TIMEOUT', 5))
+
+    # Cached user roles for admin/instructor checks; a role change reaches
+    # other workers within the TTL
+    app.config['USER_ROLE_CACHE_SIZE'] = int(os.getenv('USER_ROLE_CACHE_SIZE', 10000))
+    app.config['USER_ROLE_CACHE_TTL'] = int(os.getenv('USER_ROLE_CACHE_TTL', 30))
+
+    # Global theme (GET /auth/admin/theme); other workers see changes after
+    # at most THEME_CHECK_INTERVAL seconds
+    app.config['THEME_FILE'] = os.getenv('THEME_FILE', os.path.join(app.root_path, 'theme.json'))
+    app.config['THEME_CHECK_INTERVAL'] = float(os.getenv('THEME_CHECK_INTERVAL', 5))
+
+    # Responses at least this large are sent gzip or brotli compressed
+    app.config['COMPRESS_MIN_BYTES'] = int(os.getenv('COMPRESS_MIN_BYTES', 1024))
+    app.config['COMPRESS_GZIP_LEVEL'] = int(os.getenv('COMPRESS_GZIP_LEVEL', 6))
+    app.config['COMPRESS_BROTLI_QUALITY'] = int(os.getenv('COMPRESS_BROTLI_QUALITY', 4))
+
+    # Request timings in a Server-Timing header; sampled cProfile dumps of
+    # requests slower than PROFILE_SLOW_MS (sampling off by default)
+    app.config['SERVER_TIMING'] = os.getenv('SERVER_TIMING', '1') == '1'
+    app.config['PROFILE_SAMPLE_RATE'] = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+    app.config['PROFILE_SLOW_MS'] = int(os.getenv('PROFILE_SLOW_MS', 500))
+    app.config['PROFILE_DIR'] = os.getenv('PROFILE_DIR')  # None = <instance>/profiles
+    app.config['PROFILE_MAX_DUMPS'] = int(os.getenv('PROFILE_MAX_DUMPS', 200))
+
+    # Analysis result cache: in-process LRU plus optional shared SQLite file
+    app.config['ANALYSIS_CACHE_SIZE'] = int(os.getenv('ANALYSIS_CACHE_SIZE', 256))
+    app.config['ANALYSIS_CACHE_MAX_BYTES'] = int(os.getenv('ANALYSIS_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+    app.config['ANALYSIS_CACHE_DB'] = os.getenv('ANALYSIS_CACHE_DB')
+    app.config['ANALYSIS_CACHE_DB_MAX_ENTRIES'] = int(os.getenv('ANALYSIS_CACHE_DB_MAX_ENTRIES', 10000))
+
+    # Background analysis jobs (POST /analyze?async=1)
+    app.config['ANALYSIS_WORKERS'] = int(os.getenv('ANALYSIS_WORKERS', 0)) or pool_processes
+    app.config['ANALYSIS_QUEUE_DEPTH'] = int(os.getenv('ANALYSIS_QUEUE_DEPTH', 64))
+    app.config['ANALYSIS_JOB_TTL'] = int(os.getenv('ANALYSIS_JOB_TTL', 600))
+    app.config['ANALYSIS_BATCH_MAX_ITEMS'] = int(os.getenv('ANALYSIS_BATCH_MAX_ITEMS', 100))
+
+    # Streaming uploads (POST /auth/files/upload): request body, each stored
+    # file, files per archive and total text expanded from one archive
+    app.config['UPLOAD_MAX_BYTES'] = int(os.getenv('UPLOAD_MAX_BYTES', 50 * 1024 * 1024))
+    app.config['UPLOAD_MAX_FILE_BYTES'] = int(os.getenv('UPLOAD_MAX_FILE_BYTES', 1024 * 1024))
+    app.config['UPLOAD_MAX_ARCHIVE_FILES'] = int(os.getenv('UPLOAD_MAX_ARCHIVE_FILES', 2000))
+    app.config['UPLOAD_MAX_EXPANDED_BYTES'] = int(os.getenv('UPLOAD_MAX_EXPANDED_BYTES', 200 * 1024 * 1024))
+
+    # Snapshots of recent analyses for incremental re-analysis, sized in
+    # tokens. They are per process: under gunicorn a resubmission only
+    # reuses work when it reaches the worker that analyzed the previous
+    # version, otherwise it is analyzed in full (snapshot_found: false)
+    app.config['ANALYSIS_SNAPSHOT_TOKENS'] = int(os.getenv('ANALYSIS_SNAPSHOT_TOKENS', 500_000))
+
+    # Apply pending schema migrations in create_app (normally `flask db-upgrade`)
+    app.config['SCHEMA_AUTO_UPGRADE'] = os.getenv('SCHEMA_AUTO_UPGRADE', '0') == '1'
+
     from app.models import db, bcrypt
     db.init_app(app)
+    with app.app_context():
+        install_sqlite_pragmas(db.engine, sqlite_pragmas(app.config))
     bcrypt.init_app(app)
     jwt = JWTManager(app)
 
+    from app.services.result_cache import result_cache
+    result_cache.init_app(app)
+
+    from app.services.jobs import job_queue
+    job_queue.init_app(app)
+
+    from app.services.incremental import snapshot_store
+    snapshot_store.init_app(app)
+
+    from app.services.passwords import password_hasher
+    password_hasher.init_app(app)
+
+    from app.services.user_roles import role_cache
+    role_cache.init_app(app)
+
+    from app.services.theme import theme_store
+    theme_store.init_app(app)
+
+    # Registered before the compressor so its timings include compression
+    from app.services.profiling import request_profiler
+    request_profiler.init_app(app)
+
+    from app.services.responses import compressor
+    compressor.init_app(app)
+
     # CORS — allow GitHub Pages, Render, and localhost for development
     CORS(app, origins=[
         "http://localhost:3000", 
@@ -28,9 +132,12 @@ def create_app():
         "https://syntaxy-fl.onrender.com"
     ])
 
-    with app.app_context():
-        db.create_all()
-        print("✅ Database initialized")
+    # Schema changes are applied by `flask db-upgrade`, not at every start
+    from app.models.migrations import upgrade, upgrade_command
+    app.cli.add_command(upgrade_command)
+    if app.config['SCHEMA_AUTO_UPGRADE']:
+        with app.app_context():
+            upgrade()
 
     from app.api import routes, auth
     app.register_blueprint(routes.bp, url_prefix='/api/v1')
@@ -1,18 +1,28 @@
 # backend/app/api/auth.py (NEW FILE)
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from flask_jwt_extended import (
     create_access_token, 
     jwt_required, 
     get_jwt_identity
 )
-from app.models import db, User, Analysis, Section, Student, HistoryEntry, UploadedFile
+from app.models import db, User, Analysis, Section, Student, HistoryEntry, UploadedFile, serialize_users
+from app.services import blob_store, clone_index, uploads
+from app.services.passwords import password_hasher, HasherBusy
+from app.services.theme import theme_store, DEFAULT_THEME
+from app.services.user_roles import role_cache, role_required
 from datetime import datetime, timezone
+from werkzeug.exceptions import RequestEntityTooLarge
+import base64
 import json
-import os
 import re
 
 bp = Blueprint('auth', __name__)
 
+# Largest page the user and roster listings return
+MAX_USER_PAGE = 500
+MAX_ROSTER_PAGE = 500
+MAX_FEED_PAGE = 500
+
 
 @bp.route('/register', methods=['POST'])
 def register():
@@ -85,6 +95,9 @@ def register():
             'access_token': access_token
         }), 201
         
+    except HasherBusy as e:
+        db.session.rollback()
+        return _hasher_busy(e)
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'Registration failed', 'details': str(e)}), 500
@@ -116,6 +129,10 @@ def login():
         if not user or not user.check_password(password):
             return jsonify({'error': 'Invalid username or password'}), 401
         
+        # Upgrade hashes made with an older bcrypt cost while we have the password
+        if user.password_needs_rehash():
+            user.set_password(password)
+        
         # Update last login
         user.last_login = datetime.now(timezone.utc)
         db.session.commit()
@@ -129,6 +146,9 @@ def login():
             'access_token': access_token
         }), 200
         
+    except HasherBusy as e:
+        db.session.rollback()
+        return _hasher_busy(e)
     except Exception as e:
         return jsonify({'error': 'Login failed', 'details': str(e)}), 500
 
@@ -206,10 +226,13 @@ def update_current_user():
 @jwt_required()
 def get_analysis_history():
     """
-    Get user's analysis history
+    Get user's analysis history, newest first
     
-    GET /api/v1/auth/history?limit=10&offset=0
+    GET /api/v1/auth/history?limit=10&cursor=<next_cursor>
     Headers: Authorization: Bearer <token>
+
+    Pages continue from next_cursor. total is only counted for the first
+    page (skip it with total=0); offset is still accepted without cursor.
     """
     try:
         current_user_id = get_jwt_identity()
@@ -219,25 +242,79 @@ def get_analysis_history():
             return jsonify({'error': 'User not found'}), 404
         
         # Pagination
-        limit = request.args.get('limit', 10, type=int)
         offset = request.args.get('offset', 0, type=int)
+        query = Analysis.query.filter_by(user_id=current_user_id)
+        analyses, next_cursor, error = _keyset_page(query, Analysis, default_limit=10, offset=offset)
+        if error:
+            return jsonify({'error': error}), 400
         
-        # Get analyses
-        analyses_query = user.analyses.order_by(Analysis.created_at.desc())
-        total = analyses_query.count()
-        analyses = analyses_query.limit(limit).offset(offset).all()
-        
-        return jsonify({
+        result = {
             'analyses': [a.to_dict() for a in analyses],
-            'total': total,
-            'limit': limit,
-            'offset': offset
-        }), 200
+            'limit': _page_limit(10),
+            'offset': offset,
+            'next_cursor': next_cursor,
+        }
+        if not request.args.get('cursor') and request.args.get('total') != '0':
+            result['total'] = db.session.query(db.func.count(Analysis.id))\
+                .filter(Analysis.user_id == current_user_id).scalar()
+        return jsonify(result), 200
         
     except Exception as e:
         return jsonify({'error': 'Failed to get history', 'details': str(e)}), 500
 
 
+def _keyset_page(query, model, default_limit=None, offset=0):
+    """
+    Newest-first page of ``query`` keyed on (created_at, id).
+
+    ?cursor= continues after the page that returned it, so every page
+    is an index range scan however deep it is. Returns (items,
+    next_cursor, error); next_cursor is None on the last page and when
+    no limit applies. Paged listings skip rows without a created_at,
+    which only databases not yet upgraded have.
+    """
+    limit = _page_limit(default_limit)
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            created_at, last_id = _decode_cursor(cursor)
+        except ValueError:
+            return None, None, 'Invalid cursor'
+        query = query.filter(db.tuple_(model.created_at, model.id) < (created_at, last_id))
+    elif offset:
+        query = query.offset(offset)
+    query = query.order_by(model.created_at.desc(), model.id.desc())
+    if limit is not None:
+        query = query.filter(model.created_at.isnot(None)).limit(limit + 1)
+
+    items = query.all()
+    next_cursor = None
+    if limit is not None and len(items) > limit:
+        items = items[:limit]
+        next_cursor = _encode_cursor(items[-1])
+    return items, next_cursor, None
+
+
+def _page_limit(default_limit=None):
+    """?limit= clamped to 1..MAX_FEED_PAGE, or default_limit when absent."""
+    limit = request.args.get('limit', default_limit, type=int)
+    if limit is None:
+        return None
+    return max(1, min(limit, MAX_FEED_PAGE))
+
+
+def _encode_cursor(row):
+    raw = f'{row.created_at.isoformat()}|{row.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor):
+    """(created_at, id) from a cursor; ValueError if it is malformed."""
+    raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+    created_at, row_id = raw.split('|', 1)
+    return datetime.fromisoformat(created_at), row_id
+
+
 @bp.route('/history/<analysis_id>', methods=['GET'])
 @jwt_required()
 def get_analysis_detail(analysis_id):
@@ -250,16 +327,16 @@ def get_analysis_detail(analysis_id):
     try:
         current_user_id = get_jwt_identity()
         
-        analysis = Analysis.query.filter_by(
-            id=analysis_id,
-            user_id=current_user_id
-        ).first()
+        # Stored report is returned as is; no re-analysis
+        analysis = db.session.get(Analysis, analysis_id, options=[
+            db.undefer_group('payload'), db.joinedload(Analysis.code_blob)
+        ])
         
-        if not analysis:
+        if not analysis or analysis.user_id != current_user_id:
             return jsonify({'error': 'Analysis not found'}), 404
         
         return jsonify({
-            'analysis': analysis.to_dict(include_code=True)
+            'analysis': analysis.to_dict(include_code=True, include_report=True)
         }), 200
         
     except Exception as e:
@@ -271,15 +348,88 @@ def get_analysis_detail(analysis_id):
 @bp.route('/sections', methods=['GET'])
 @jwt_required()
 def get_sections():
-    """Get all sections for the current instructor"""
+    """
+    Get all sections for the current instructor
+
+    GET /api/v1/auth/sections?roster_limit=50&fields=id,name
+
+    Every roster is loaded in one query. roster_limit caps the students
+    listed per section; student_count and students_next_cursor (for
+    GET /sections/<id>/students?after=) tell what was left out. The
+    cursor is None only when the whole roster is listed; it is '' when
+    students were left out but none listed (roster_limit=0), which
+    ?after= reads as the start of the roster. fields keeps only the
+    listed student fields.
+    """
     try:
         current_user_id = get_jwt_identity()
-        sections = Section.query.filter_by(instructor_id=current_user_id).all()
-        return jsonify({'sections': [s.to_dict() for s in sections]}), 200
+        fields, error = _student_fields()
+        if error:
+            return jsonify({'error': error}), 400
+        roster_limit = request.args.get('roster_limit', type=int)
+        if roster_limit is not None and roster_limit < 0:
+            return jsonify({'error': 'roster_limit must not be negative'}), 400
+
+        sections = Section.query.filter_by(instructor_id=current_user_id)\
+            .order_by(Section.created_at, Section.id).all()
+        rosters = _load_rosters([s.id for s in sections], roster_limit)
+
+        result = []
+        for section in sections:
+            students, count = rosters.get(section.id, ([], 0))
+            entry = section.to_dict(students=students, fields=fields)
+            entry['student_count'] = count
+            if roster_limit is not None:
+                cursor = None
+                if count > len(students):
+                    cursor = students[-1].id if students else ''
+                entry['students_next_cursor'] = cursor
+            result.append(entry)
+        return jsonify({'sections': result}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+def _student_fields():
+    """(fields, error) from ?fields=a,b; fields is None when not given."""
+    raw = request.args.get('fields')
+    if not raw:
+        return None, None
+    fields = [f.strip() for f in raw.split(',') if f.strip()]
+    unknown = [f for f in fields if f not in Student.FIELDS]
+    if unknown:
+        return None, f"Unknown student fields: {', '.join(unknown)}"
+    return fields, None
+
+
+def _load_rosters(section_ids, limit=None):
+    """
+    section id -> (students in roster order, student count), one query.
+
+    With a limit only the first ``limit`` students of each section are
+    loaded; the window count still reports the full roster size.
+    """
+    if not section_ids:
+        return {}
+    order = (Student.created_at, Student.id)
+    ranked = db.select(
+        Student.id.label('id'),
+        db.func.row_number().over(partition_by=Student.section_id, order_by=order).label('rank'),
+        db.func.count().over(partition_by=Student.section_id).label('total'),
+    ).where(Student.section_id.in_(section_ids)).subquery()
+    query = db.session.query(Student, ranked.c.total).join(ranked, ranked.c.id == Student.id)
+    if limit is not None:
+        # At least one row per section so roster_limit=0 still gets counts
+        query = query.filter(ranked.c.rank <= max(limit, 1))
+
+    rosters = {}
+    for student, total in query.order_by(Student.section_id, *order):
+        students, _ = rosters.setdefault(student.section_id, ([], total))
+        if limit is None or len(students) < limit:
+            students.append(student)
+    return rosters
+
+
 @bp.route('/sections', methods=['POST'])
 @jwt_required()
 def create_section():
@@ -316,6 +466,98 @@ def delete_section(section_id):
         return jsonify({'error': str(e)}), 500
 
 
+@bp.route('/sections/<section_id>/scan', methods=['POST'])
+@jwt_required()
+def scan_section(section_id):
+    """
+    Compare every submission in a section against every other
+
+    POST /api/v1/auth/sections/<id>/scan
+    Body (optional): {"threshold": 0.3}
+
+    Submissions are the analyses and uploaded files of registered users
+    whose email matches a student in the section. Matching is done
+    through the clone fingerprint index; submissions not yet indexed are
+    indexed first.
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        section = Section.query.filter_by(id=section_id, instructor_id=current_user_id).first()
+        if not section:
+            return jsonify({'error': 'Section not found'}), 404
+
+        data = request.get_json(silent=True) or {}
+        threshold = data.get('threshold', clone_index.DEFAULT_THRESHOLD)
+        if not isinstance(threshold, (int, float)) or not 0 < threshold <= 1:
+            return jsonify({'error': 'threshold must be a number between 0 and 1'}), 400
+
+        students_by_email = {s.email.strip().lower(): s for s in section.students}
+        users = User.query.filter(User.email.in_(list(students_by_email))).all() if students_by_email else []
+        student_for_user = {u.id: students_by_email[u.email] for u in users}
+
+        submissions = {}
+        if student_for_user:
+            user_ids = list(student_for_user)
+            for a in Analysis.query.filter(Analysis.user_id.in_(user_ids)):
+                submissions[(clone_index.SOURCE_ANALYSIS, a.id)] = (a.user_id, 'analysis', a.created_at)
+            for f in UploadedFile.query.filter(UploadedFile.user_id.in_(user_ids)):
+                submissions[(clone_index.SOURCE_FILE, f.id)] = (f.user_id, f.name, f.created_at)
+
+        # Code is only loaded for submissions the index has not seen yet
+        indexed = clone_index.indexed_sources(list(submissions))
+        missing = {clone_index.SOURCE_ANALYSIS: [], clone_index.SOURCE_FILE: []}
+        for key in submissions:
+            if key not in indexed:
+                missing[key[0]].append(key[1])
+        if missing[clone_index.SOURCE_ANALYSIS]:
+            analyses = Analysis.query.filter(Analysis.id.in_(missing[clone_index.SOURCE_ANALYSIS]))\
+                .options(db.undefer(Analysis.inline_code), db.joinedload(Analysis.code_blob))
+            for a in analyses:
+                clone_index.index_source(clone_index.SOURCE_ANALYSIS, a.id, a.code, a.language)
+        if missing[clone_index.SOURCE_FILE]:
+            files = UploadedFile.query.filter(UploadedFile.id.in_(missing[clone_index.SOURCE_FILE]))\
+                .options(db.undefer(UploadedFile.inline_content), db.joinedload(UploadedFile.content_blob))
+            for f in files:
+                clone_index.index_source(
+                    clone_index.SOURCE_FILE, f.id, f.content,
+                    clone_index.language_for_file(f.name, f.file_type)
+                )
+        db.session.commit()
+
+        owners = {key: sub[0] for key, sub in submissions.items()}
+        matches = clone_index.find_matches(list(submissions), owners=owners, threshold=threshold)
+
+        def describe(key):
+            user_id, name, created_at = submissions[key]
+            student = student_for_user[user_id]
+            return {
+                'source_type': key[0],
+                'source_id': key[1],
+                'name': name,
+                'student_id': student.id,
+                'student_name': student.name,
+                'created_at': created_at.isoformat() if created_at else None,
+            }
+
+        return jsonify({
+            'section_id': section.id,
+            'submissions': len(submissions),
+            'threshold': threshold,
+            'matches': [
+                {
+                    'a': describe(a),
+                    'b': describe(b),
+                    'shared_fingerprints': count,
+                    'similarity': similarity,
+                }
+                for a, b, count, similarity in matches
+            ],
+        }), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
 # ===== STUDENTS ENDPOINTS =====
 
 @bp.route('/sections/<section_id>/students', methods=['POST'])
@@ -345,6 +587,42 @@ def add_student(section_id):
         return jsonify({'error': str(e)}), 500
 
 
+@bp.route('/sections/<section_id>/students', methods=['GET'])
+@jwt_required()
+def list_section_students(section_id):
+    """
+    Page through a section's roster
+
+    GET /api/v1/auth/sections/<id>/students?limit=100&after=<student id>&fields=id,name
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        section = Section.query.filter_by(id=section_id, instructor_id=current_user_id).first()
+        if not section:
+            return jsonify({'error': 'Section not found'}), 404
+        fields, error = _student_fields()
+        if error:
+            return jsonify({'error': error}), 400
+        limit = max(1, min(request.args.get('limit', 100, type=int), MAX_ROSTER_PAGE))
+
+        query = section.students
+        after = request.args.get('after')
+        if after:
+            cursor = Student.query.filter_by(id=after, section_id=section_id).first()
+            if not cursor:
+                return jsonify({'error': 'Invalid cursor'}), 400
+            query = query.filter(db.tuple_(Student.created_at, Student.id) > (cursor.created_at, cursor.id))
+        students = query.order_by(Student.created_at, Student.id).limit(limit + 1).all()
+
+        next_cursor = students[limit - 1].id if len(students) > limit else None
+        return jsonify({
+            'students': [s.to_dict(fields) for s in students[:limit]],
+            'next_cursor': next_cursor,
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
 @bp.route('/students/<student_id>', methods=['DELETE'])
 @jwt_required()
 def delete_student(student_id):
@@ -366,13 +644,14 @@ def delete_student(student_id):
 @bp.route('/activity', methods=['GET'])
 @jwt_required()
 def get_activity():
-    """Get activity history"""
+    """Get activity history, newest first (?limit=50&cursor=<next_cursor>)"""
     try:
         current_user_id = get_jwt_identity()
-        limit = request.args.get('limit', 50, type=int)
-        entries = HistoryEntry.query.filter_by(user_id=current_user_id)\
-            .order_by(HistoryEntry.created_at.desc()).limit(limit).all()
-        return jsonify({'history': [e.to_dict() for e in entries]}), 200
+        query = HistoryEntry.query.filter_by(user_id=current_user_id)
+        entries, next_cursor, error = _keyset_page(query, HistoryEntry, default_limit=50)
+        if error:
+            return jsonify({'error': error}), 400
+        return jsonify({'history': [e.to_dict() for e in entries], 'next_cursor': next_cursor}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -406,12 +685,14 @@ def add_activity():
 @bp.route('/files', methods=['GET'])
 @jwt_required()
 def get_files():
-    """Get all uploaded files for the current user"""
+    """Get uploaded files for the current user, newest first (all unless ?limit= or ?cursor=)"""
     try:
         current_user_id = get_jwt_identity()
-        files = UploadedFile.query.filter_by(user_id=current_user_id)\
-            .order_by(UploadedFile.created_at.desc()).all()
-        return jsonify({'files': [f.to_dict() for f in files]}), 200
+        query = UploadedFile.query.filter_by(user_id=current_user_id)
+        files, next_cursor, error = _keyset_page(query, UploadedFile)
+        if error:
+            return jsonify({'error': error}), 400
+        return jsonify({'files': [f.to_dict() for f in files], 'next_cursor': next_cursor}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -426,14 +707,10 @@ def upload_file_meta():
         if not data or not data.get('name'):
             return jsonify({'error': 'File name is required'}), 400
 
-        uploaded = UploadedFile(
-            user_id=current_user_id,
-            name=data['name'],
-            size=data.get('size', 0),
-            file_type=data.get('file_type', 'text'),
-            content=data.get('content', '')
+        uploaded = _store_file(
+            current_user_id, data['name'], data.get('content') or '',
+            size=data.get('size', 0), file_type=data.get('file_type', 'text')
         )
-        db.session.add(uploaded)
         db.session.commit()
         return jsonify({'file': uploaded.to_dict()}), 201
     except Exception as e:
@@ -441,13 +718,89 @@ def upload_file_meta():
         return jsonify({'error': str(e)}), 500
 
 
+@bp.route('/files/upload', methods=['POST'])
+@jwt_required()
+def upload_files():
+    """
+    Upload source files or project archives as multipart/form-data
+
+    POST /api/v1/auth/files/upload  (one or more "file" parts)
+
+    Parts are spooled to disk while the request streams in and the body
+    may not exceed UPLOAD_MAX_BYTES. .zip and .tar.gz/.tgz archives are
+    expanded into one file entry per text member; members that are too
+    large or binary are listed under skipped.
+    """
+    config = current_app.config
+    try:
+        current_user_id = get_jwt_identity()
+        request.max_content_length = config['UPLOAD_MAX_BYTES']
+        parts = request.files.getlist('file')
+        if not parts:
+            return jsonify({'error': 'No file parts in the upload'}), 400
+
+        stored, skipped = [], []
+        for part in parts:
+            kind = uploads.archive_kind(part.filename)
+            if kind is None:
+                members = [(part.filename, *uploads.read_text(part.stream, config['UPLOAD_MAX_FILE_BYTES']))]
+            else:
+                members = uploads.expand_archive(
+                    part.stream, kind,
+                    max_file_bytes=config['UPLOAD_MAX_FILE_BYTES'],
+                    max_files=config['UPLOAD_MAX_ARCHIVE_FILES'],
+                    max_total_bytes=config['UPLOAD_MAX_EXPANDED_BYTES'],
+                )
+            for name, text, reason in members:
+                if text is None:
+                    skipped.append({'name': name, 'reason': reason})
+                else:
+                    stored.append(_store_file(current_user_id, name, text))
+        db.session.commit()
+        return jsonify({'files': [f.to_dict() for f in stored], 'skipped': skipped}), 201
+    except (RequestEntityTooLarge, uploads.UploadTooLarge) as e:
+        db.session.rollback()
+        return jsonify({'error': 'Upload too large', 'details': getattr(e, 'description', None) or str(e)}), 413
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+def _store_file(user_id, name, content, size=None, file_type=None):
+    """
+    Add an UploadedFile with its content blob and clone index entries.
+
+    size defaults to the UTF-8 length and file_type to one guessed from
+    the name. The caller commits.
+    """
+    language = clone_index.language_for_file(name, file_type or '')
+    content_hash, created = blob_store.put(content)
+    uploaded = UploadedFile(
+        user_id=user_id,
+        name=name,
+        size=len(content.encode('utf-8')) if size is None else size,
+        file_type=file_type or language or 'text',
+        content_hash=content_hash
+    )
+    # Exact duplicates of stored content share its fingerprints
+    hashes = None if created else clone_index.duplicate_hashes(content_hash, language)
+    db.session.add(uploaded)
+    db.session.flush()
+    clone_index.index_source(clone_index.SOURCE_FILE, uploaded.id, content, language, hashes=hashes)
+    return uploaded
+
+
 @bp.route('/files/<file_id>', methods=['GET'])
 @jwt_required()
 def get_file(file_id):
     """Get a file's content for scanning"""
     try:
         current_user_id = get_jwt_identity()
-        f = UploadedFile.query.filter_by(id=file_id, user_id=current_user_id).first()
+        f = UploadedFile.query.filter_by(id=file_id, user_id=current_user_id)\
+            .options(db.undefer(UploadedFile.inline_content), db.joinedload(UploadedFile.content_blob)).first()
         if not f:
             return jsonify({'error': 'File not found'}), 404
         return jsonify({'file': f.to_dict(include_content=True)}), 200
@@ -464,6 +817,8 @@ def delete_file(file_id):
         f = UploadedFile.query.filter_by(id=file_id, user_id=current_user_id).first()
         if not f:
             return jsonify({'error': 'File not found'}), 404
+        clone_index.remove_source(clone_index.SOURCE_FILE, f.id)
+        blob_store.release([f.content_hash])
         db.session.delete(f)
         db.session.commit()
         return jsonify({'message': 'File deleted'}), 200
@@ -476,49 +831,79 @@ def delete_file(file_id):
 
 @bp.route('/admin/users', methods=['GET'])
 @jwt_required()
+@role_required('admin')
 def admin_list_users():
-    """Admin: list all users"""
+    """Admin: list all users (?limit=&after=<username> to page)"""
     try:
-        current_user_id = get_jwt_identity()
-        user = db.session.get(User, current_user_id)
-        if not user or user.role != 'admin':
-            return jsonify({'error': 'Admin access required'}), 403
-        users = User.query.all()
-        return jsonify({'users': [u.to_dict() for u in users]}), 200
+        return jsonify(_user_page(User.query)), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/admin/password-hashing', methods=['GET'])
+@jwt_required()
+@role_required('admin')
+def admin_password_hashing():
+    """Admin: password hashing pool load and latency"""
+    try:
+        return jsonify(password_hasher.stats()), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+def _hasher_busy(error):
+    """503 asking the client to retry once the hashing backlog clears."""
+    response = jsonify({'error': 'Server busy, please retry', 'details': str(error)})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+
 @bp.route('/registered-students', methods=['GET'])
 @jwt_required()
+@role_required('instructor', 'admin')
 def list_registered_students():
-    """List all registered student accounts - available to instructors and admins"""
+    """List all registered student accounts - available to instructors and admins (pageable)"""
     try:
-        current_user_id = get_jwt_identity()
-        user = db.session.get(User, current_user_id)
-        if not user or user.role not in ('admin', 'instructor'):
-            return jsonify({'error': 'Instructor or admin access required'}), 403
-        students = User.query.filter_by(role='student').all()
-        return jsonify({'users': [u.to_dict() for u in students]}), 200
+        return jsonify(_user_page(User.query.filter_by(role='student'))), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
 @bp.route('/registered-users', methods=['GET'])
 @jwt_required()
+@role_required('instructor', 'admin')
 def list_registered_users():
-    """List all registered users - available to instructors and admins"""
+    """List registered users, 500 per page - available to instructors and admins"""
     try:
-        current_user_id = get_jwt_identity()
-        user = db.session.get(User, current_user_id)
-        if not user or user.role not in ('admin', 'instructor'):
-            return jsonify({'error': 'Instructor or admin access required'}), 403
-        all_users = User.query.limit(500).all()
-        return jsonify({'users': [u.to_dict() for u in all_users]}), 200
+        return jsonify(_user_page(User.query, default_limit=500)), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+def _user_page(query, default_limit=None):
+    """
+    One page of serialized users in username order.
+
+    ?limit=N caps the page (at most MAX_USER_PAGE) and ?after=<username>
+    continues after a previous page's next_cursor, which is None on the
+    last page.
+    """
+    limit = request.args.get('limit', default_limit, type=int)
+    after = request.args.get('after')
+    query = query.order_by(User.username)
+    if after:
+        query = query.filter(User.username > after)
+    if limit is not None:
+        limit = max(1, min(limit, MAX_USER_PAGE))
+        query = query.limit(limit + 1)
+    users = serialize_users(query)
+    next_cursor = None
+    if limit is not None and len(users) > limit:
+        users = users[:limit]
+        next_cursor = users[-1]['username']
+    return {'users': users, 'next_cursor': next_cursor}
+
+
 @bp.route('/change-password', methods=['PUT'])
 @jwt_required()
 def change_password():
@@ -542,6 +927,9 @@ def change_password():
         user.set_password(data['new_password'])
         db.session.commit()
         return jsonify({'message': 'Password changed successfully'}), 200
+    except HasherBusy as e:
+        db.session.rollback()
+        return _hasher_busy(e)
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'Password change failed', 'details': str(e)}), 500
@@ -549,23 +937,25 @@ def change_password():
 
 @bp.route('/admin/users/<user_id>', methods=['DELETE'])
 @jwt_required()
+@role_required('admin')
 def admin_delete_user(user_id):
     """Admin: delete a user account"""
     try:
-        current_user_id = get_jwt_identity()
-        admin = db.session.get(User, current_user_id)
-        if not admin or admin.role != 'admin':
-            return jsonify({'error': 'Admin access required'}), 403
-
-        if user_id == current_user_id:
+        if user_id == get_jwt_identity():
             return jsonify({'error': 'Cannot delete your own account'}), 400
 
         target = db.session.get(User, user_id)
         if not target:
             return jsonify({'error': 'User not found'}), 404
 
+        # The user's analyses are deleted with it; so are their code
+        # references and clone index entries
+        analyses = db.session.query(Analysis.id, Analysis.code_hash).filter_by(user_id=user_id).all()
+        clone_index.remove_sources(clone_index.SOURCE_ANALYSIS, [analysis_id for analysis_id, _ in analyses])
+        blob_store.release([code_hash for _, code_hash in analyses])
         db.session.delete(target)
         db.session.commit()
+        role_cache.invalidate(user_id)
         return jsonify({'message': f'User {target.username} deleted'}), 200
     except Exception as e:
         db.session.rollback()
@@ -574,14 +964,10 @@ def admin_delete_user(user_id):
 
 @bp.route('/admin/users/<user_id>/role', methods=['PUT'])
 @jwt_required()
+@role_required('admin')
 def admin_change_role(user_id):
     """Admin: change a user's role"""
     try:
-        current_user_id = get_jwt_identity()
-        admin = db.session.get(User, current_user_id)
-        if not admin or admin.role != 'admin':
-            return jsonify({'error': 'Admin access required'}), 403
-
         data = request.get_json()
         if not data or not data.get('role'):
             return jsonify({'error': 'Role is required'}), 400
@@ -596,6 +982,7 @@ def admin_change_role(user_id):
 
         target.role = new_role
         db.session.commit()
+        role_cache.invalidate(user_id)
         return jsonify({'message': f'Role updated to {new_role}', 'user': target.to_dict()}), 200
     except Exception as e:
         db.session.rollback()
@@ -604,28 +991,28 @@ def admin_change_role(user_id):
 
 @bp.route('/admin/theme', methods=['GET'])
 def get_theme():
-    """Get the global UI theme color (public endpoint)"""
+    """Get the global UI theme color (public endpoint, served from memory with an ETag)"""
     try:
-        theme_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'theme.json')
-        if os.path.exists(theme_file):
-            with open(theme_file, 'r') as f:
-                data = json.load(f)
-                return jsonify(data), 200
-        return jsonify({'accentColor': '#6366f1'}), 200
+        body, etag = theme_store.get()
     except Exception:
-        return jsonify({'accentColor': '#6366f1'}), 200
+        body, etag = json.dumps(DEFAULT_THEME).encode('utf-8'), None
+    # Browsers keep the theme but revalidate it on every use; unchanged themes get a 304
+    if etag and request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(body, mimetype='application/json')
+    if etag:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 
 @bp.route('/admin/theme', methods=['PUT'])
 @jwt_required()
+@role_required('admin')
 def set_theme():
     """Admin: set the global UI theme color"""
     try:
-        current_user_id = get_jwt_identity()
-        admin = db.session.get(User, current_user_id)
-        if not admin or admin.role != 'admin':
-            return jsonify({'error': 'Admin access required'}), 403
-
         data = request.get_json()
         if not data or not data.get('accentColor'):
             return jsonify({'error': 'accentColor is required'}), 400
@@ -634,10 +1021,9 @@ def set_theme():
         if not re.match(r'^#[0-9a-fA-F]{6}$', color):
             return jsonify({'error': 'Invalid color format'}), 400
 
-        theme_file = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'theme.json')
-        with open(theme_file, 'w') as f:
-            json.dump({'accentColor': color}, f)
-
-        return jsonify({'message': 'Theme updated', 'accentColor': color}), 200
+        _, etag = theme_store.set({'accentColor': color})
+        response = jsonify({'message': 'Theme updated', 'accentColor': color})
+        response.set_etag(etag)
+        return response, 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
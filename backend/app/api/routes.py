@@ -1,11 +1,19 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, request, jsonify, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.models import db, Analysis
+from app.services import blob_store, clone_index
+from app.services.analyzer import analyze_with_snapshot
+from app.services.incremental import count_regions, snapshot_store
+from app.services.jobs import job_queue, QueueFullError
+from app.services.result_cache import result_cache, cache_key
+import copy
+import json
 import time
 import uuid
 
 bp = Blueprint('api', __name__)
 
+
 @bp.route('/health', methods=['GET'])
 def health_check():
     return jsonify({'status': 'healthy', 'message': 'Code Clone Detector API is running'}), 200
@@ -20,60 +28,65 @@ def analyze_code():
     """
     Analyze code (auth optional - saves to DB if logged in)
     """
-    start_time = time.time()
+    start_time = time.perf_counter()
     
     # Get current user if authenticated
     current_user_id = get_jwt_identity()
     
-    # Validation (keep existing code)
+    # Validation
     data = request.get_json()
     
     if not data:
         return jsonify({'error': 'No JSON data provided'}), 400
     
-    if 'code' not in data:
-        return jsonify({'error': 'Missing required field: code'}), 400
-    
-    if 'language' not in data:
-        return jsonify({'error': 'Missing required field: language'}), 400
+    error = _submission_error(data)
+    if error:
+        return jsonify({'error': error}), 400
     
     code = data['code']
     language = data['language']
+
+    # Incremental re-analysis of an edited earlier submission
+    previous = None
+    previous_id = data.get('previous_analysis_id')
+    if previous_id is not None:
+        if not current_user_id:
+            return jsonify({'error': 'Authentication required for previous_analysis_id'}), 401
+        previous = Analysis.query.filter_by(id=previous_id, user_id=current_user_id)\
+            .options(db.undefer(Analysis.inline_code), db.joinedload(Analysis.code_blob)).first()
+        if not previous:
+            return jsonify({'error': 'Previous analysis not found'}), 404
+        if previous.language != language:
+            return jsonify({'error': f'Previous analysis is {previous.language}, not {language}'}), 400
     
-    if language not in ['java', 'python']:
-        return jsonify({'error': f'Unsupported language: {language}'}), 400
-    
-    if not code or not code.strip():
-        return jsonify({'error': 'Empty code provided'}), 400
-    
+    # Job mode: enqueue and return immediately, client polls /jobs/<id>
+    if request.args.get('async', '').lower() in ('1', 'true', 'yes'):
+        return _enqueue_analysis(code, language, current_user_id)
+
     try:
-        # Analyze code (still mock)
-        result = _mock_analyze(code, language)
+        # Identical resubmissions are served from the result cache
+        key = cache_key(code, language)
+        cached = result_cache.get(key)
+        if cached is not None:
+            result, hashes = cached['result'], cached['hashes']
+            total = count_regions(result['function_metrics'])
+            stats = {'regions_total': total, 'regions_reused': total, 'regions_recomputed': 0}
+            snapshot = None
+        else:
+            # Unchanged functions of the previous submission are reused
+            # when its snapshot is still held in memory
+            snapshot = snapshot_store.get(cache_key(previous.code, language)) if previous else None
+            result, hashes, new_snapshot, stats = analyze_with_snapshot(code, language, snapshot)
+            result_cache.put(key, {'result': result, 'hashes': hashes})
+            snapshot_store.put(key, new_snapshot)
+        result['cache_hit'] = cached is not None
+        if previous:
+            result['incremental'] = dict(stats, previous_analysis_id=previous.id,
+                                         snapshot_found=snapshot is not None)
         
         # Add execution time
-        execution_time_ms = int((time.time() - start_time) * 1000)
-        result['execution_time_ms'] = execution_time_ms
-        
-        # Save to database if authenticated
-        if current_user_id:
-            analysis = Analysis(
-                user_id=current_user_id,
-                language=language,
-                code=code,
-                clone_percentage=result['clone_percentage'],
-                cyclomatic_complexity=result['cyclomatic_complexity'],
-                maintainability_index=result['maintainability_index'],
-                execution_time_ms=execution_time_ms
-            )
-            
-            db.session.add(analysis)
-            db.session.commit()
-            
-            result['analysis_id'] = analysis.id
-            result['saved'] = True
-        else:
-            result['analysis_id'] = str(uuid.uuid4())
-            result['saved'] = False
+        execution_time_ms = int((time.perf_counter() - start_time) * 1000)
+        _save_analysis(current_user_id, code, language, result, hashes, execution_time_ms)
         
         return jsonify(result), 200
         
@@ -83,8 +96,276 @@ def analyze_code():
         return jsonify({'error': 'Analysis failed', 'details': str(e)}), 500
 
 
-def _mock_analyze(code, language):
-    """Generate mock analysis results using the CodeAnalyzer service."""
-    from app.services.analyzer import CodeAnalyzer
-    analyzer = CodeAnalyzer(language)
-    return analyzer.analyze(code)
\ No newline at end of file
+@bp.route('/analyze/batch', methods=['POST'])
+@jwt_required(optional=True)
+def analyze_batch():
+    """
+    Analyze many files in one request
+
+    POST /api/v1/analyze/batch[?stream=1]
+    Body: {"items": [{"name": "Main.java", "code": "...", "language": "java"}, ...]}
+    (a bare JSON array of items is also accepted)
+
+    Items are analyzed in parallel on the worker pool; identical items
+    and cached results are only analyzed once. Invalid or failing items
+    get an ``error`` entry without failing the batch.
+
+    By default the response is one JSON document and authenticated
+    requests save every successful item in a single transaction. With
+    ``stream=1`` (or ``Accept: application/x-ndjson``) each item's
+    result is written as one NDJSON line as soon as it is ready, each
+    row is committed before its line is sent, and a final
+    ``{"summary": ...}`` line closes the stream. Items that were
+    analyzed but could not be saved count as ``save_failed``.
+    """
+    start_time = time.perf_counter()
+    current_user_id = get_jwt_identity()
+
+    data = request.get_json(silent=True)
+    items = data.get('items') if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'Expected a non-empty array of items'}), 400
+
+    max_items = current_app.config.get('ANALYSIS_BATCH_MAX_ITEMS', 100)
+    if len(items) > max_items:
+        return jsonify({'error': f'Too many items: at most {max_items} per batch'}), 413
+
+    if _wants_stream():
+        return Response(
+            stream_with_context(_stream_batch(items, current_user_id, start_time)),
+            mimetype='application/x-ndjson'
+        )
+
+    results = [None] * len(items)
+    entries = []
+    for i, result, hashes, error in _batch_outcomes(items, start_time):
+        if error:
+            results[i] = {'name': items[i].get('name') if isinstance(items[i], dict) else None, 'error': error}
+            continue
+        results[i] = result
+        entries.append((items[i]['code'], items[i]['language'], result, hashes, result['execution_time_ms']))
+
+    try:
+        _save_analyses(current_user_id, entries)
+    except Exception as e:
+        if current_user_id:
+            db.session.rollback()
+        return jsonify({'error': 'Saving batch failed', 'details': str(e)}), 500
+
+    return jsonify({
+        'results': results,
+        'total': len(items),
+        'succeeded': len(entries),
+        'failed': len(items) - len(entries),
+        'execution_time_ms': int((time.perf_counter() - start_time) * 1000),
+    }), 200
+
+
+def _wants_stream():
+    """True when the client asked for an NDJSON response."""
+    if request.args.get('stream', '').lower() in ('1', 'true', 'yes'):
+        return True
+    return request.accept_mimetypes.best == 'application/x-ndjson'
+
+
+def _stream_batch(items, user_id, start_time):
+    """Yield one NDJSON line per finished item, then a summary line."""
+    succeeded = failed = save_failed = 0
+    for i, result, hashes, error in _batch_outcomes(items, start_time):
+        line = {'index': i}
+        if error:
+            failed += 1
+            line.update(name=items[i].get('name') if isinstance(items[i], dict) else None, error=error)
+        else:
+            # Each item commits on its own, so a line only says saved once
+            # its row is durable and a failure cannot undo earlier items
+            try:
+                _save_analyses(user_id, [
+                    (items[i]['code'], items[i]['language'], result, hashes, result['execution_time_ms'])
+                ])
+                succeeded += 1
+            except Exception as e:
+                db.session.rollback()
+                save_failed += 1
+                result.pop('analysis_id', None)
+                result.update(saved=False, save_error=str(e))
+            line.update(result)
+        yield json.dumps(line, separators=(',', ':')) + '\n'
+
+    yield json.dumps({'summary': {
+        'total': len(items),
+        'succeeded': succeeded,
+        'failed': failed,
+        'save_failed': save_failed,
+        'execution_time_ms': int((time.perf_counter() - start_time) * 1000),
+    }}) + '\n'
+
+
+def _batch_outcomes(items, start_time):
+    """
+    Yield (index, result, hashes, error) for each batch item as it is ready.
+
+    Invalid items and cache hits come first, then analyzed items in
+    completion order. Items identical to an earlier one are answered
+    from that item's result instead of being analyzed again.
+    """
+    duplicates = {}  # cache key -> later item indexes waiting on an analysis
+    work = []        # (item index, cache key) still to analyze
+
+    for i, item in enumerate(items):
+        error = _submission_error(item)
+        if error:
+            yield i, None, None, error
+            continue
+        key = cache_key(item['code'], item['language'])
+        if key in duplicates:
+            duplicates[key].append(i)
+            continue
+        cached = result_cache.get(key)
+        if cached is not None:
+            yield i, _batch_result(items[i], cached['result'], True, start_time), cached['hashes'], None
+            # Later copies of this item hit the cache on their own
+            continue
+        duplicates[key] = []
+        work.append((i, key))
+
+    submissions = ((items[i]['code'], items[i]['language']) for i, _ in work)
+    for n, analyzed, error in job_queue.run_batch(submissions):
+        i, key = work[n]
+        waiting = duplicates.pop(key)
+        if error is not None:
+            for j in [i] + waiting:
+                yield j, None, None, f'Analysis failed: {error}'
+            continue
+        result, hashes = analyzed
+        result_cache.put(key, {'result': result, 'hashes': hashes})
+        for j in waiting:
+            yield j, _batch_result(items[j], copy.deepcopy(result), True, start_time), hashes, None
+        yield i, _batch_result(items[i], result, False, start_time), hashes, None
+
+
+def _batch_result(item, result, cache_hit, start_time):
+    result['name'] = item.get('name')
+    result['cache_hit'] = cache_hit
+    result['execution_time_ms'] = int((time.perf_counter() - start_time) * 1000)
+    return result
+
+
+@bp.route('/jobs/<job_id>', methods=['GET'])
+@jwt_required(optional=True)
+def get_job(job_id):
+    """
+    Poll an asynchronous analysis job
+
+    GET /api/v1/jobs/<id>
+    Status is one of queued, running, finished or failed; finished jobs
+    include the same result body as a synchronous /analyze call.
+    """
+    job = job_queue.get(job_id)
+    if job is None or (job.user_id and job.user_id != get_jwt_identity()):
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict()), 200
+
+
+def _enqueue_analysis(code, language, user_id):
+    """Submit an analysis job, or answer 429 when the queue is full."""
+    key = cache_key(code, language)
+
+    def on_complete(job, result, hashes):
+        result_cache.put(key, {'result': result, 'hashes': hashes})
+        result['cache_hit'] = False
+        execution_time_ms = int((time.time() - job.created_at) * 1000)
+        try:
+            _save_analysis(user_id, code, language, result, hashes, execution_time_ms)
+        except Exception:
+            db.session.rollback()
+            raise
+        return result
+
+    try:
+        job = job_queue.submit(code, language, user_id=user_id, on_complete=on_complete)
+    except QueueFullError as e:
+        response = jsonify({'error': 'Analysis queue is full, retry shortly', 'details': str(e)})
+        response.headers['Retry-After'] = '5'
+        return response, 429
+
+    return jsonify({
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': f'{request.script_root}/api/v1/jobs/{job.id}',
+    }), 202
+
+
+def _submission_error(data):
+    """Validation message for one {code, language} submission, or None."""
+    if not isinstance(data, dict):
+        return 'Expected a JSON object'
+
+    if 'code' not in data:
+        return 'Missing required field: code'
+
+    if 'language' not in data:
+        return 'Missing required field: language'
+
+    code = data['code']
+    language = data['language']
+
+    if language not in ['java', 'python']:
+        return f'Unsupported language: {language}'
+
+    if not isinstance(code, str) or not code.strip():
+        return 'Empty code provided'
+
+    return None
+
+
+def _save_analysis(user_id, code, language, result, hashes, execution_time_ms):
+    """Record the analysis for authenticated users and fill in id/saved fields."""
+    _save_analyses(user_id, [(code, language, result, hashes, execution_time_ms)])
+    return result
+
+
+def _save_analyses(user_id, entries):
+    """
+    Record (code, language, result, hashes, execution_time_ms) entries.
+
+    Authenticated users get all rows, their code blobs and clone index
+    entries written in one transaction; each result gets analysis_id and
+    saved.
+    """
+    for _, _, result, _, execution_time_ms in entries:
+        result['execution_time_ms'] = execution_time_ms
+
+    if not user_id:
+        for _, _, result, _, _ in entries:
+            result['analysis_id'] = str(uuid.uuid4())
+            result['saved'] = False
+        return
+
+    code_hashes = blob_store.put_many([entry[0] for entry in entries])
+    analyses = [
+        Analysis(
+            user_id=user_id,
+            language=language,
+            code_hash=code_hash,
+            clone_percentage=result['clone_percentage'],
+            cyclomatic_complexity=result['cyclomatic_complexity'],
+            maintainability_index=result['maintainability_index'],
+            execution_time_ms=execution_time_ms,
+            clones_json=result['clones'],
+            suggestions_json=result['refactoring_suggestions']
+        )
+        for (_, language, result, _, execution_time_ms), (code_hash, _) in zip(entries, code_hashes)
+    ]
+
+    db.session.add_all(analyses)
+    db.session.flush()
+    clone_index.add_sources([
+        (clone_index.SOURCE_ANALYSIS, analysis.id, entry[3])
+        for analysis, entry in zip(analyses, entries)
+    ])
+    db.session.commit()
+
+    for analysis, (_, _, result, _, _) in zip(analyses, entries):
+        result['analysis_id'] = analysis.id
+        result['saved'] = True
@@ -1,13 +1,44 @@
 # backend/app/models/__init__.py
 from flask_sqlalchemy import SQLAlchemy
 from flask_bcrypt import Bcrypt
+from sqlalchemy.dialects import mysql
 from datetime import datetime, timezone
+import json
 import uuid
+import zlib
+
+from app.services.passwords import password_hasher
 
 db = SQLAlchemy()
 bcrypt = Bcrypt()
 
 
+class CompressedJSON(db.TypeDecorator):
+    """JSON value stored as zlib-compressed compact JSON"""
+    impl = db.LargeBinary
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name in ('mysql', 'mariadb'):  # BLOB stops at 64 KB
+            return dialect.type_descriptor(mysql.LONGBLOB())
+        return dialect.type_descriptor(db.LargeBinary())
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return zlib.compress(json.dumps(value, separators=(',', ':')).encode('utf-8'))
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, str):  # rows written as plain JSON text
+            return json.loads(value)
+        try:
+            return json.loads(zlib.decompress(value))
+        except zlib.error:  # plain JSON text converted to a binary column
+            return json.loads(value)
+
+
 class User(db.Model):
     """User account model"""
     __tablename__ = 'users'
@@ -25,15 +56,19 @@ class User(db.Model):
     analyses = db.relationship('Analysis', backref='user', lazy='dynamic', cascade='all, delete-orphan')
     
     def set_password(self, password):
-        """Hash and set password"""
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        """Hash and set password (on the hashing pool)"""
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
-        """Verify password"""
-        return bcrypt.check_password_hash(self.password_hash, password)
+        """Verify password (on the hashing pool)"""
+        return password_hasher.check(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        """True when the stored hash uses another bcrypt cost than configured"""
+        return password_hasher.needs_rehash(self.password_hash)
     
-    def to_dict(self):
-        """Convert to dictionary"""
+    def to_dict(self, analysis_count=None):
+        """Convert to dictionary; pass analysis_count to skip the COUNT query"""
         return {
             'id': self.id,
             'username': self.username,
@@ -41,10 +76,26 @@ class User(db.Model):
             'full_name': self.full_name,
             'role': self.role,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'total_analyses': self.analyses.count()
+            'total_analyses': self.analyses.count() if analysis_count is None else analysis_count
         }
 
 
+def serialize_users(query):
+    """
+    to_dict() for every user ``query`` returns, in a single SELECT.
+
+    Analysis counts come from a correlated subquery instead of one COUNT
+    per user.
+    """
+    count = (
+        db.select(db.func.count(Analysis.id))
+        .where(Analysis.user_id == User.id)
+        .correlate(User)
+        .scalar_subquery()
+    )
+    return [user.to_dict(analysis_count=n) for user, n in query.add_columns(count).all()]
+
+
 class Analysis(db.Model):
     """Code analysis record"""
     __tablename__ = 'analyses'
@@ -52,9 +103,13 @@ class Analysis(db.Model):
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
     
-    # Input data
+    # Input data. The code lives in a shared blob; rows from before blobs
+    # keep it inline. Inline code and stored results are deferred
+    # ('payload' group) so listings never load them.
     language = db.Column(db.String(20), nullable=False)
-    code = db.Column(db.Text, nullable=False)
+    inline_code = db.deferred(db.Column('code', db.Text, nullable=False, default=''), group='payload')
+    code_hash = db.Column(db.String(64), db.ForeignKey('blobs.hash'), index=True)
+    code_blob = db.relationship('Blob')
     
     # Results
     clone_percentage = db.Column(db.Float)
@@ -64,12 +119,22 @@ class Analysis(db.Model):
     
     # Metadata
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), index=True)
+
+    # Newest-first history pages are keyset scans of (user_id, created_at)
+    __table_args__ = (
+        db.Index('ix_analyses_user_created', 'user_id', 'created_at'),
+    )
     
-    # Stored JSON results
-    clones_json = db.Column(db.Text)  # Store full clone data as JSON
-    suggestions_json = db.Column(db.Text)  # Store suggestions as JSON
+    # Stored results, as written by /analyze
+    clones_json = db.deferred(db.Column(CompressedJSON), group='payload')  # Full clone list
+    suggestions_json = db.deferred(db.Column(CompressedJSON), group='payload')  # Refactoring suggestions
+
+    @property
+    def code(self):
+        """Submitted code, from its blob or the inline column"""
+        return self.code_blob.text if self.code_hash else self.inline_code
     
-    def to_dict(self, include_code=False):
+    def to_dict(self, include_code=False, include_report=False):
         """Convert to dictionary"""
         result = {
             'id': self.id,
@@ -83,6 +148,10 @@ class Analysis(db.Model):
         
         if include_code:
             result['code'] = self.code
+
+        if include_report:
+            result['clones'] = self.clones_json or []
+            result['refactoring_suggestions'] = self.suggestions_json or []
             
         return result
 
@@ -98,13 +167,16 @@ class Section(db.Model):
 
     students = db.relationship('Student', backref='section', lazy='dynamic', cascade='all, delete-orphan')
 
-    def to_dict(self):
+    def to_dict(self, students=None, fields=None):
+        """Convert to dictionary; pass preloaded students to skip the roster query"""
+        if students is None:
+            students = self.students.order_by(Student.created_at, Student.id)
         return {
             'id': self.id,
             'name': self.name,
             'instructor_id': self.instructor_id,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-            'students': [s.to_dict() for s in self.students],
+            'students': [s.to_dict(fields) for s in students],
         }
 
 
@@ -119,8 +191,11 @@ class Student(db.Model):
     submissions = db.Column(db.Integer, default=0)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
 
-    def to_dict(self):
-        return {
+    FIELDS = ('id', 'name', 'email', 'section_id', 'submissions', 'created_at')
+
+    def to_dict(self, fields=None):
+        """Convert to dictionary, optionally keeping only ``fields``"""
+        result = {
             'id': self.id,
             'name': self.name,
             'email': self.email,
@@ -128,6 +203,9 @@ class Student(db.Model):
             'submissions': self.submissions,
             'created_at': self.created_at.isoformat() if self.created_at else None,
         }
+        if fields:
+            result = {k: result[k] for k in fields}
+        return result
 
 
 class UploadedFile(db.Model):
@@ -135,13 +213,26 @@ class UploadedFile(db.Model):
     __tablename__ = 'uploaded_files'
 
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False, index=True)
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
     name = db.Column(db.String(255), nullable=False)
     size = db.Column(db.Integer, nullable=False)
     file_type = db.Column(db.String(20), nullable=False)
-    content = db.Column(db.Text)
+    # Content lives in a shared blob; rows from before blobs keep it
+    # inline (deferred, loaded by detail views only)
+    inline_content = db.deferred(db.Column('content', db.Text))
+    content_hash = db.Column(db.String(64), db.ForeignKey('blobs.hash'), index=True)
+    content_blob = db.relationship('Blob')
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
 
+    __table_args__ = (
+        db.Index('ix_uploaded_files_user_created', 'user_id', 'created_at'),
+    )
+
+    @property
+    def content(self):
+        """File body, from its blob or the inline column"""
+        return self.content_blob.text if self.content_hash else self.inline_content
+
     def to_dict(self, include_content=False):
         result = {
             'id': self.id,
@@ -161,12 +252,16 @@ class HistoryEntry(db.Model):
     __tablename__ = 'history_entries'
 
     id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
-    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False, index=True)
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False)
     entry_type = db.Column(db.String(20), nullable=False)
     description = db.Column(db.String(500), nullable=False)
     status = db.Column(db.String(20), default='success')
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), index=True)
 
+    __table_args__ = (
+        db.Index('ix_history_entries_user_created', 'user_id', 'created_at'),
+    )
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -175,4 +270,67 @@ class HistoryEntry(db.Model):
             'description': self.description,
             'status': self.status,
             'created_at': self.created_at.isoformat() if self.created_at else None,
-        }
\ No newline at end of file
+        }
+
+class Blob(db.Model):
+    """Content-addressed, compressed text shared by every row that stores it"""
+    __tablename__ = 'blobs'
+
+    hash = db.Column(db.String(64), primary_key=True)  # sha256 of the UTF-8 text
+    data = db.Column(db.LargeBinary, nullable=False)  # zlib-compressed text
+    size = db.Column(db.Integer, nullable=False)  # uncompressed bytes
+    refcount = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    @property
+    def text(self):
+        return zlib.decompress(self.data).decode('utf-8')
+
+
+class AnalysisJobRecord(db.Model):
+    """Status and result of a background analysis, readable by every worker"""
+    __tablename__ = 'analysis_jobs'
+
+    id = db.Column(db.String(36), primary_key=True)
+    user_id = db.Column(db.String(36))  # None for anonymous submissions
+    language = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(20), nullable=False)  # queued, finished, failed
+    result = db.Column(CompressedJSON)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.Float, nullable=False)  # Unix time, as returned by the API
+    finished_at = db.Column(db.Float, index=True)
+
+
+class CloneFingerprint(db.Model):
+    """Inverted index entry: one winnowed fingerprint of a stored submission"""
+    __tablename__ = 'clone_fingerprints'
+
+    id = db.Column(db.Integer, primary_key=True)
+    hash = db.Column(db.BigInteger, nullable=False, index=True)
+    source_type = db.Column(db.String(20), nullable=False)  # analysis, file
+    source_id = db.Column(db.String(36), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_clone_fingerprints_source', 'source_type', 'source_id'),
+    )
+
+
+def ensure_schema(conn):
+    """
+    Create missing tables, plus columns and indexes added to existing ones.
+
+    create_all() never alters a table that already exists, so databases
+    created by older versions get new nullable columns and new indexes
+    here. Constraints on added columns are not retrofitted. Run through
+    the migrations in app.models.migrations rather than directly.
+    """
+    db.metadata.create_all(conn)
+    inspector = db.inspect(conn)
+    for table in db.metadata.sorted_tables:
+        existing = {c['name'] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing and column.nullable:
+                column_type = column.type.compile(dialect=conn.dialect)
+                conn.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
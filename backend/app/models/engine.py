@@ -0,0 +1,56 @@
+"""
+Database engine tuning
+
+Server databases (PostgreSQL, MySQL) get a sized connection pool with
+pre-ping and recycling. SQLite files get per-connection pragmas instead:
+WAL so readers no longer block the writer, synchronous=NORMAL (safe
+with WAL), a busy timeout so concurrent writers wait for the lock
+rather than failing with "database is locked", and memory-mapped reads.
+"""
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+def is_sqlite(uri: str) -> bool:
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+
+def engine_options(config) -> dict:
+    """SQLALCHEMY_ENGINE_OPTIONS for the configured database URI."""
+    if is_sqlite(config['SQLALCHEMY_DATABASE_URI']):
+        # pysqlite's own lock wait, in seconds; the pragma below sets the same
+        return {'connect_args': {'timeout': config['SQLITE_BUSY_TIMEOUT_MS'] / 1000}}
+    return {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': True,
+    }
+
+
+def sqlite_pragmas(config) -> list:
+    """PRAGMA statements run on every new SQLite connection."""
+    pragmas = [
+        f"PRAGMA busy_timeout = {int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        f"PRAGMA mmap_size = {int(config['SQLITE_MMAP_BYTES'])}",
+    ]
+    if config['SQLITE_WAL']:
+        pragmas += ['PRAGMA journal_mode = WAL', 'PRAGMA synchronous = NORMAL']
+    return pragmas
+
+
+def install_sqlite_pragmas(engine, pragmas: list):
+    """Run ``pragmas`` on each connection the engine opens."""
+    if engine.dialect.name != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
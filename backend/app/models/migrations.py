@@ -0,0 +1,102 @@
+"""
+Versioned schema migrations
+
+The database records the last migration applied in the schema_version
+table. ``upgrade()`` runs the pending ones in order, each in its own
+transaction, so starting the app never has to inspect the schema:
+run ``flask --app run db-upgrade`` when deploying a new version (or set
+SCHEMA_AUTO_UPGRADE=1 to have create_app do it).
+
+To change the schema, append a (version, description, function) entry
+to MIGRATIONS; the function receives an open connection.
+"""
+
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+
+from app.models import db, ensure_schema, Analysis, AnalysisJobRecord, HistoryEntry, UploadedFile
+
+
+def _baseline(conn):
+    # Databases from before versioning may lack any table, column or
+    # index added since the first release; bring them all up to date
+    ensure_schema(conn)
+
+
+def _analysis_jobs(conn):
+    AnalysisJobRecord.__table__.create(conn, checkfirst=True)
+
+
+def _binary_payloads(conn):
+    # clones_json and suggestions_json were TEXT before they held
+    # compressed JSON. SQLite keeps bytes in any column; server databases
+    # need the column type changed.
+    if conn.dialect.name == 'sqlite':
+        return
+    types = {c['name']: c['type'] for c in db.inspect(conn).get_columns('analyses')}
+    for column in ('clones_json', 'suggestions_json'):
+        if isinstance(types.get(column), db.String):
+            conn.execute(db.text(binary_column_sql(conn.dialect.name, 'analyses', column)))
+
+
+def _backfill_created_at(conn):
+    # Rows from before created_at had a default may lack it; keyset pages
+    # cannot reach them, so they become the oldest entries instead
+    for model in (Analysis, HistoryEntry, UploadedFile):
+        table = model.__table__
+        conn.execute(table.update().where(table.c.created_at.is_(None)).values(created_at=datetime(1970, 1, 1)))
+
+
+def binary_column_sql(dialect: str, table: str, column: str) -> str:
+    """ALTER TABLE turning a text column into a binary one, keeping its bytes."""
+    if dialect == 'postgresql':
+        return f"ALTER TABLE {table} ALTER COLUMN {column} TYPE BYTEA USING convert_to({column}, 'UTF8')"
+    if dialect in ('mysql', 'mariadb'):
+        return f'ALTER TABLE {table} MODIFY {column} LONGBLOB'
+    raise NotImplementedError(f'Cannot convert {table}.{column} to binary on {dialect}')
+
+
+MIGRATIONS = [
+    (1, 'Baseline schema', _baseline),
+    (2, 'Shared analysis job table', _analysis_jobs),
+    (3, 'Binary analysis payload columns', _binary_payloads),
+    (4, 'Backfill missing created_at', _backfill_created_at),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn) -> int:
+    """Version recorded in the database, 0 when none is."""
+    if not db.inspect(conn).has_table('schema_version'):
+        return 0
+    return conn.execute(db.text('SELECT MAX(version) FROM schema_version')).scalar() or 0
+
+
+def upgrade() -> list:
+    """Apply pending migrations; returns the versions applied."""
+    applied = []
+    with db.engine.begin() as conn:
+        conn.execute(db.text('CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)'))
+        version = current_version(conn)
+    for number, _, migrate in MIGRATIONS:
+        if number <= version:
+            continue
+        with db.engine.begin() as conn:
+            migrate(conn)
+            conn.execute(db.text('INSERT INTO schema_version (version) VALUES (:v)'), {'v': number})
+        applied.append(number)
+    return applied
+
+
+@click.command('db-upgrade')
+@with_appcontext
+def upgrade_command():
+    """Create or upgrade the database schema."""
+    applied = upgrade()
+    for number, description, _ in MIGRATIONS:
+        if number in applied:
+            click.echo(f'Applied {number}: {description}')
+    click.echo(f'Database schema is at version {SCHEMA_VERSION}')
@@ -1,9 +1,25 @@
 import uuid
-import random
 import ast
+from functools import cached_property
+
+from app.services.fingerprint import detect_clones, kgram_hashes, tokenize, winnow
+from app.services.incremental import (
+    assemble_hashes,
+    assemble_tokens,
+    build_snapshot,
+    count_regions,
+    function_reuse,
+    plan_reuse,
+)
+from app.services.java_parser import parse_java
+from app.services.metrics import java_metrics, python_metrics, token_metrics
+from app.services.profiling import timed
 
 SUPPORTED_LANGUAGES = {"python", "java"}
 
+# Bump whenever analysis output changes so cached results are not reused
+ANALYZER_VERSION = "1.4"
+
 
 def validate_syntax(code: str, language: str) -> bool:
     """
@@ -11,27 +27,184 @@ def validate_syntax(code: str, language: str) -> bool:
 
     - For Python: try to parse with ast.parse; return True on success,
       raise SyntaxError on parse errors.
-    - For Java: stub that always returns True (tests expect a stub).
+    - For Java: parse with the built-in Java parser; same contract.
     - For unsupported languages: raise ValueError.
     """
     if language not in SUPPORTED_LANGUAGES:
         raise ValueError(f"Unsupported language: {language}")
 
+    # Both parsers raise SyntaxError so callers/tests can catch it
     if language == "python":
+        parse_python(code)
+    else:
+        parse_java(tokenize(code, language))
+    return True
+
+
+def parse_python(code: str) -> ast.Module:
+    """Parse Python code, raising SyntaxError on invalid input."""
+    if not isinstance(code, str):
+        raise SyntaxError("Code must be a string")
+    try:
+        return ast.parse(code)
+    except (RecursionError, MemoryError):
+        # CPython's parser gives up on pathologically nested code (a long
+        # a+a+... chain is enough); report it like any other syntax error
+        raise SyntaxError("too deeply nested", ("<unknown>", 1, None, None)) from None
+
+
+class AnalysisPipeline:
+    """
+    Parse-once view of one submission
+
+    Each stage is computed on first access and cached, so the code is
+    tokenized and parsed at most once however many stages use it: syntax
+    check and metrics share the tree, fingerprinting, the Java parser and
+    the metrics fallback share the token stream, and suggestions build on
+    the detected clones.
+
+    Given ``previous``, a snapshot of an earlier version of the code (see
+    the incremental module), tokens, k-gram hashes and function metrics
+    of unchanged functions are carried over instead of recomputed.
+    """
+
+    def __init__(self, code: str, language: str, previous=None):
+        if language not in SUPPORTED_LANGUAGES:
+            raise ValueError(f"Unsupported language: {language}")
         if not isinstance(code, str):
-            raise SyntaxError("Code must be a string")
+            raise ValueError("code must be a string")
+        self.code = code
+        self.language = language
+        self.syntax_error = None
+        self.previous = previous
+
+    @cached_property
+    def lines_of_code(self) -> int:
+        # Tests expect empty string to count as 1 line
+        return max(1, len(self.code.splitlines()))
+
+    @cached_property
+    def reuse_plan(self) -> list:
+        """(region, line delta) pairs of ``previous`` still present unchanged."""
+        previous = self.previous
+        if previous is None or previous.language != self.language:
+            return []
+        plan = plan_reuse(previous, self.code)
+        if plan and self.language == "python":
+            # Python is tokenized in pieces between reused regions, which
+            # is only exact if they still start and end real functions
+            if self.tree is None:
+                return []
+            outer = {(node.lineno, node.end_lineno) for node in _outer_functions(self.tree)}
+            plan = [(region, delta) for region, delta in plan
+                    if (region.start_line + delta, region.end_line + delta) in outer]
+        return plan
+
+    @cached_property
+    def assembly(self):
+        """(tokens, region spans) built from the reuse plan, or None."""
+        if not self.reuse_plan:
+            return None
+        return assemble_tokens(self.code, self.language, self.reuse_plan)
+
+    @cached_property
+    def tokens(self) -> list:
+        if self.assembly is not None:
+            return self.assembly[0]
+        return tokenize(self.code, self.language)
+
+    @cached_property
+    def function_reuse(self) -> dict:
+        if self.assembly is None:
+            return {}
+        return function_reuse(self.assembly[1], java=self.language == "java")
+
+    @cached_property
+    def tree(self):
+        """Python AST or parsed Java unit, or None if the code does not parse."""
         try:
-            ast.parse(code)
-            return True
-        except SyntaxError:
-            # Propagate the SyntaxError so callers/tests can catch it
-            raise
-    elif language == "java":
-        # Stub implementation for Java: assume valid
-        return True
+            if self.language == "python":
+                return parse_python(self.code)
+            return parse_java(self.tokens, self.function_reuse)
+        except SyntaxError as e:
+            self.syntax_error = e
+            return None
 
-    # Defensive fallback
-    return True
+    @property
+    def syntax_valid(self) -> bool:
+        return self.tree is not None
+
+    @cached_property
+    def kgram_hashes(self) -> list:
+        if self.assembly is not None:
+            return assemble_hashes(self.tokens, self.assembly[1], kgram_hashes)
+        return kgram_hashes(self.tokens)
+
+    @cached_property
+    def fingerprints(self) -> list:
+        return winnow(self.kgram_hashes)
+
+    @cached_property
+    def clone_detection(self) -> dict:
+        return detect_clones(self.code, self.language, tokens=self.tokens, fps=self.fingerprints)
+
+    @cached_property
+    def metrics(self) -> dict:
+        # Code that does not parse falls back to the token stream
+        if self.tree is None:
+            return token_metrics(self.tokens, self.code)
+        if self.language == "python":
+            return python_metrics(self.tree, self.code, self.function_reuse)
+        return java_metrics(self.tree, self.tokens, self.code)
+
+    @cached_property
+    def suggestions(self) -> list:
+        return _generate_suggestions(self.clone_detection["clones"], self.language)
+
+    def report(self) -> dict:
+        """Assemble the analysis result from every stage."""
+        # Stages are forced in dependency order so each timing is its own
+        with timed("analyze_tokenize"):
+            self.tokens
+        with timed("analyze_parse"):
+            self.tree
+        with timed("analyze_fingerprint"):
+            self.fingerprints
+        with timed("analyze_clones"):
+            detection = self.clone_detection
+        with timed("analyze_metrics"):
+            metrics = self.metrics
+        with timed("analyze_suggestions"):
+            self.suggestions
+        syntax_error = None
+        if not self.syntax_valid:
+            syntax_error = {"message": self.syntax_error.msg, "line": self.syntax_error.lineno}
+        return {
+            "analysis_id": str(uuid.uuid4()),
+            "language": self.language,
+            "lines_of_code": self.lines_of_code,
+            "syntax_error": syntax_error,
+            "clone_percentage": detection["clone_percentage"],
+            "clones": detection["clones"],
+            "cyclomatic_complexity": metrics["cyclomatic_complexity"],
+            "maintainability_index": metrics["maintainability_index"],
+            "halstead_volume": metrics["halstead_volume"],
+            "function_metrics": metrics["functions"],
+            "refactoring_suggestions": self.suggestions,
+        }
+
+    def reuse_stats(self) -> dict:
+        """How many outermost functions were carried over from ``previous``."""
+        total = count_regions(self.metrics["functions"])
+        reused = self.metrics["regions_reused"]
+        return {"regions_total": total, "regions_reused": reused, "regions_recomputed": total - reused}
+
+    def snapshot(self):
+        """Snapshot of this analysis to pass as a later version's ``previous``."""
+        if self.tree is None:
+            return None
+        spans = [(m.first, m.last) for m in self.tree.methods] if self.language == "java" else None
+        return build_snapshot(self.language, self.code, self.tokens, self.kgram_hashes, self.metrics, spans)
 
 
 class CodeAnalyzer:
@@ -41,82 +214,119 @@ class CodeAnalyzer:
         self.language = language
         # Tests expect this attribute to exist and be None at creation
         self.code = None
+        # Pipeline (tree, tokens, stage results) of the last analyzed code
+        self.pipeline = None
+
+    @property
+    def fingerprints(self):
+        """Winnowed fingerprints of the last analyzed code, for the clone index"""
+        return self.pipeline.fingerprints if self.pipeline is not None else None
+
+    def prepare(self, code: str) -> AnalysisPipeline:
+        """Return the pipeline for ``code``, reusing it if the code is unchanged."""
+        if self.pipeline is None or self.pipeline.code != code:
+            self.pipeline = AnalysisPipeline(code, self.language)
+        # Set stored code (tests may expect analyzer.code to be set after analyze)
+        self.code = code
+        return self.pipeline
+
+    def validate(self, code: str) -> bool:
+        """Syntax-check code through the shared pipeline; raises SyntaxError."""
+        pipeline = self.prepare(code)
+        if not pipeline.syntax_valid:
+            raise pipeline.syntax_error
+        return True
 
     def analyze(self, code: str) -> dict:
         """
-        Perform a mocked analysis and return a dictionary containing:
+        Analyze code and return a dictionary containing:
         - analysis_id
         - language
         - lines_of_code
+        - syntax_error (None, or message and line for code that does not parse)
         - clone_percentage
         - clones (list)
         - cyclomatic_complexity
         - maintainability_index
+        - halstead_volume
+        - function_metrics (list, per function)
         - refactoring_suggestions (list)
         """
         # Basic validation
         if not isinstance(code, str):
             raise ValueError("code must be a string")
 
-        # Set stored code (tests may expect analyzer.code to be set after analyze)
-        self.code = code
+        return self.prepare(code).report()
 
-        # Lines of code: tests expect empty string to count as 1 line
-        raw_lines = code.splitlines()
-        lines_of_code = max(1, len(raw_lines))
 
-        # Mock metrics
-        analysis = {
-            "analysis_id": str(uuid.uuid4()),
-            "language": self.language,
-            "lines_of_code": lines_of_code,
-            "clone_percentage": round(random.uniform(0.0, 50.0), 1),
-            "clones": _generate_mock_clones(lines_of_code),
-            "cyclomatic_complexity": round(random.uniform(1.0, 30.0), 1),
-            "maintainability_index": round(random.uniform(20.0, 100.0), 1),
-            "refactoring_suggestions": _generate_mock_suggestions(lines_of_code),
-        }
+def run_analysis(code: str, language: str) -> tuple:
+    """
+    Analyze code and return (report, sorted fingerprint hashes).
+
+    Module-level and built from plain data so it can run in a worker
+    process as well as in the request thread.
+    """
+    pipeline = AnalysisPipeline(code, language)
+    result = pipeline.report()
+    return result, sorted({fp.hash for fp in pipeline.fingerprints})
 
-        return analysis
 
+def analyze_with_snapshot(code: str, language: str, previous=None) -> tuple:
+    """
+    Analyze code, reusing unchanged functions of ``previous``.
 
-def _generate_mock_clones(num_lines: int) -> list:
-    """Return mock clone entries; short code should return empty list."""
-    if num_lines < 6:
-        return []
+    Returns (report, sorted fingerprint hashes, snapshot, reuse stats);
+    the snapshot can be passed as ``previous`` when a later version of
+    the same code is analyzed.
+    """
+    pipeline = AnalysisPipeline(code, language, previous=previous)
+    result = pipeline.report()
+    hashes = sorted({fp.hash for fp in pipeline.fingerprints})
+    return result, hashes, pipeline.snapshot(), pipeline.reuse_stats()
 
-    return [
-        {
-            "clone_id": str(uuid.uuid4()),
-            "type": 2,
-            "similarity": round(random.uniform(0.85, 0.98), 2),
-            "locations": [
-                {"start_line": max(1, num_lines // 4), "end_line": max(5, num_lines // 4 + 5)},
-                {"start_line": max(1, num_lines // 2), "end_line": max(5, num_lines // 2 + 5)},
-            ],
-            "code_snippet": "\n".join(["// mock snippet"] * min(5, num_lines)),
-        }
-    ]
 
+def _outer_functions(tree: ast.Module):
+    """Function definitions not nested inside another function."""
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        for field in ("body", "orelse", "handlers", "finalbody", "cases"):
+            for child in getattr(node, field, ()):
+                if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                    yield child
+                elif isinstance(child, ast.AST):
+                    stack.append(child)
 
-def _generate_mock_suggestions(num_lines: int) -> list:
-    """Return mock refactoring suggestions. Return empty list for very short code."""
-    if num_lines < 4:
-        return []
 
-    return [
-        {
+def _generate_suggestions(clones: list, language: str) -> list:
+    """Return an Extract Method suggestion for each detected clone."""
+    suggestions = []
+    for rank, clone in enumerate(clones, start=1):
+        first, second = clone["locations"][0], clone["locations"][1]
+        size = first["end_line"] - first["start_line"] + 1
+        suggestions.append({
             "suggestion_id": str(uuid.uuid4()),
-            "priority": 1,
-            "priority_score": round(random.uniform(0.7, 0.95), 2),
+            "priority": rank,
+            "priority_score": round(min(0.99, clone["similarity"] * min(1.0, 0.5 + size / 40)), 2),
             "refactoring_type": "Extract Method",
-            "affected_clone_id": str(uuid.uuid4()),
+            "affected_clone_id": clone["clone_id"],
             "explanation": {
-                "remember": "You have duplicated this code 2 times",
+                "remember": (
+                    f"Lines {first['start_line']}-{first['end_line']} are duplicated "
+                    f"at lines {second['start_line']}-{second['end_line']}"
+                ),
                 "understand": "Code duplication makes bugs hard to fix because changes must be made in multiple places",
-                "apply": "Extract this into a reusable method called processData()",
+                "apply": "Extract the shared code into a reusable method and call it from both places",
             },
-            "before_code": "// Mock before code\nif (x > 0) {\n    result = x * 2;\n}",
-            "after_code": "// Mock after code\nint processData(int x) {\n    return x * 2;\n}\n\nif (x > 0) {\n    result = processData(x);\n}",
-        }
-    ]
\ No newline at end of file
+            "before_code": clone["code_snippet"],
+            "after_code": _extract_method_sketch(clone["code_snippet"], language),
+        })
+    return suggestions
+
+
+def _extract_method_sketch(snippet: str, language: str) -> str:
+    """Wrap a duplicated snippet in a method skeleton for the suggestion."""
+    body = "\n".join("    " + line.strip() for line in snippet.splitlines())
+    if language == "python":
+        return f"def extracted_method():\n{body}"
+    return f"private void extractedMethod() {{\n{body}\n}}"
@@ -0,0 +1,109 @@
+"""
+Content-addressed blob store
+
+Submitted code and uploaded file bodies are stored once per distinct
+content in the blobs table, keyed by the SHA-256 of their UTF-8 text and
+zlib-compressed. Rows refer to a blob by hash and every reference is
+counted, so the starter file uploaded by a whole class is stored once
+and its blob is deleted when the last reference goes.
+
+New blobs are written with an INSERT ... ON CONFLICT that adds to the
+refcount, so requests storing the same new text at the same time (a
+class submitting fresh starter code) all succeed.
+"""
+
+import hashlib
+import zlib
+from collections import Counter, defaultdict
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from app.models import db, Blob
+
+_UPSERT_DIALECTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+# Stay well below SQLite's bound-parameter limit for IN (...) clauses
+_IN_CHUNK = 500
+
+
+def content_hash(text: str) -> str:
+    """Blob key of a piece of text."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def put(text: str) -> tuple:
+    """Store one text; returns (hash, created) as ``put_many`` does."""
+    return put_many([text])[0]
+
+
+def put_many(texts: list) -> list:
+    """
+    Add a reference to each text, storing the ones not seen before.
+
+    Returns a (hash, created) pair per text, where created is False when
+    identical content was already stored. The caller owns the
+    transaction.
+    """
+    encoded = [text.encode('utf-8') for text in texts]
+    hashes = [hashlib.sha256(data).hexdigest() for data in encoded]
+    references = Counter(hashes)
+
+    existing = set()
+    distinct = list(references)
+    for i in range(0, len(distinct), _IN_CHUNK):
+        chunk = distinct[i:i + _IN_CHUNK]
+        existing.update(h for (h,) in db.session.query(Blob.hash).filter(Blob.hash.in_(chunk)))
+    _adjust(existing, references, 1)
+
+    new_rows = {}
+    for h, data in zip(hashes, encoded):
+        if h not in existing and h not in new_rows:
+            new_rows[h] = {'hash': h, 'data': zlib.compress(data), 'size': len(data), 'refcount': references[h]}
+    if new_rows:
+        _insert(list(new_rows.values()))
+    return [(h, h not in existing) for h in hashes]
+
+
+def release(hashes: list):
+    """Drop one reference per hash (None is ignored); unreferenced blobs are deleted."""
+    references = Counter(h for h in hashes if h)
+    if not references:
+        return
+    _adjust(set(references), references, -1)
+    distinct = list(references)
+    for i in range(0, len(distinct), _IN_CHUNK):
+        Blob.query.filter(
+            Blob.hash.in_(distinct[i:i + _IN_CHUNK]), Blob.refcount <= 0
+        ).delete(synchronize_session=False)
+
+
+def _insert(rows: list):
+    """Insert blob rows; rows another transaction added meanwhile gain the refcount."""
+    insert = _UPSERT_DIALECTS.get(db.session.get_bind().dialect.name)
+    if insert is not None:
+        statement = insert(Blob.__table__)
+        statement = statement.on_conflict_do_update(
+            index_elements=['hash'],
+            set_={'refcount': Blob.__table__.c.refcount + statement.excluded.refcount},
+        )
+        db.session.execute(statement, rows)
+        return
+    for row in rows:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(Blob.__table__.insert(), row)
+        except IntegrityError:
+            _adjust({row['hash']}, Counter({row['hash']: row['refcount']}), 1)
+
+
+def _adjust(hashes: set, references: Counter, sign: int):
+    """Change refcounts in the database, one UPDATE per distinct amount."""
+    by_amount = defaultdict(list)
+    for h in hashes:
+        by_amount[references[h]].append(h)
+    for amount, group in by_amount.items():
+        for i in range(0, len(group), _IN_CHUNK):
+            Blob.query.filter(Blob.hash.in_(group[i:i + _IN_CHUNK])).update(
+                {Blob.refcount: Blob.refcount + sign * amount}, synchronize_session=False
+            )
@@ -0,0 +1,183 @@
+"""
+Cross-submission clone index
+
+Every stored submission (an Analysis or an UploadedFile) contributes its
+distinct winnowed fingerprints to the clone_fingerprints table. Finding
+which submissions share code with which is then a lookup of each
+fingerprint's posting list instead of comparing every pair of
+submissions token by token.
+"""
+
+from collections import Counter, defaultdict
+
+from app.models import db, Analysis, CloneFingerprint, UploadedFile
+from app.services.fingerprint import iter_fingerprints, iter_tokens
+
+SOURCE_ANALYSIS = 'analysis'
+SOURCE_FILE = 'file'
+
+# Fingerprints shared by more than this fraction of a corpus are starter
+# code or boilerplate, not evidence of copying, and are ignored when
+# scoring pairs. Small corpora always keep at least MIN_POSTING_LIMIT.
+MAX_DOCUMENT_FREQUENCY = 0.5
+MIN_POSTING_LIMIT = 4
+
+DEFAULT_THRESHOLD = 0.3
+
+# Stay well below SQLite's bound-parameter limit for IN (...) clauses
+_IN_CHUNK = 500
+
+_EXTENSIONS = {'.py': 'python', '.java': 'java'}
+
+
+def language_for_file(name: str, file_type: str):
+    """Guess the language of an uploaded file, or None if unsupported."""
+    if file_type in ('python', 'java'):
+        return file_type
+    lowered = (name or '').lower()
+    for ext, language in _EXTENSIONS.items():
+        if lowered.endswith(ext):
+            return language
+    return None
+
+
+def fingerprint_hashes(code: str, language: str) -> set:
+    """Distinct fingerprint hashes of a piece of code, computed as a stream."""
+    return {fp.hash for fp in iter_fingerprints(iter_tokens(code, language))}
+
+
+def index_source(source_type: str, source_id: str, code: str, language: str,
+                 hashes: set = None) -> int:
+    """
+    (Re)index one submission. The caller owns the transaction.
+
+    Pass ``hashes`` when fingerprints were already computed during
+    analysis to avoid tokenizing the code a second time.
+    """
+    remove_source(source_type, source_id)
+    if hashes is None:
+        if not code or language is None:
+            return 0
+        hashes = fingerprint_hashes(code, language)
+    return add_sources([(source_type, source_id, hashes)])
+
+
+def duplicate_hashes(content_hash: str, language: str):
+    """
+    Fingerprints of an indexed submission whose content is ``content_hash``.
+
+    Identical content in the same language has identical fingerprints,
+    so an exact duplicate is indexed by copying them instead of
+    tokenizing it again. Returns None when no such submission exists.
+    """
+    if language is None:
+        return None
+    candidates = [
+        (SOURCE_ANALYSIS, row.id)
+        for row in db.session.query(Analysis.id).filter_by(code_hash=content_hash, language=language).limit(5)
+    ]
+    candidates += [
+        (SOURCE_FILE, row.id)
+        for row in db.session.query(UploadedFile.id, UploadedFile.name, UploadedFile.file_type)
+        .filter_by(content_hash=content_hash).limit(5)
+        if language_for_file(row.name, row.file_type) == language
+    ]
+    for source_type, source_id in candidates:
+        hashes = {h for (h,) in db.session.query(CloneFingerprint.hash)
+                  .filter_by(source_type=source_type, source_id=source_id)}
+        if hashes:
+            return hashes
+    return None
+
+
+def add_sources(entries: list) -> int:
+    """
+    Bulk-index new submissions given as (source_type, source_id, hashes).
+
+    Unlike index_source this does not clear existing entries first, so it
+    is only for sources that were just created. The caller owns the
+    transaction.
+    """
+    rows = [
+        {'hash': h, 'source_type': source_type, 'source_id': source_id}
+        for source_type, source_id, hashes in entries
+        for h in hashes
+    ]
+    if rows:
+        db.session.bulk_insert_mappings(CloneFingerprint, rows)
+    return len(rows)
+
+
+def remove_source(source_type: str, source_id: str):
+    """Drop a submission's fingerprints from the index."""
+    remove_sources(source_type, [source_id])
+
+
+def remove_sources(source_type: str, source_ids: list):
+    """Drop the fingerprints of many submissions, one DELETE per chunk of ids."""
+    for chunk in _chunks(list(source_ids)):
+        CloneFingerprint.query.filter(
+            CloneFingerprint.source_type == source_type, CloneFingerprint.source_id.in_(chunk)
+        ).delete(synchronize_session=False)
+
+
+def indexed_sources(keys: list) -> set:
+    """Subset of (source_type, source_id) keys that have index entries."""
+    found = set()
+    ids = [source_id for _, source_id in keys]
+    for chunk in _chunks(ids):
+        rows = db.session.query(
+            CloneFingerprint.source_type, CloneFingerprint.source_id
+        ).filter(CloneFingerprint.source_id.in_(chunk)).distinct()
+        found.update((r.source_type, r.source_id) for r in rows)
+    return found
+
+
+def find_matches(keys: list, owners: dict = None, threshold: float = DEFAULT_THRESHOLD) -> list:
+    """
+    Score every pair of submissions in ``keys`` that share fingerprints.
+
+    ``owners`` maps a key to the user that submitted it; pairs from the
+    same owner (resubmissions) are skipped. Similarity is the number of
+    shared fingerprints over the smaller submission's fingerprint count.
+    Returns pairs at or above ``threshold``, most similar first.
+    """
+    owners = owners or {}
+    wanted = set(keys)
+    postings = defaultdict(list)
+    sizes = Counter()
+    ids = [source_id for _, source_id in keys]
+    for chunk in _chunks(ids):
+        rows = db.session.query(
+            CloneFingerprint.hash, CloneFingerprint.source_type, CloneFingerprint.source_id
+        ).filter(CloneFingerprint.source_id.in_(chunk))
+        for h, source_type, source_id in rows:
+            key = (source_type, source_id)
+            if key in wanted:
+                postings[h].append(key)
+                sizes[key] += 1
+
+    limit = max(MIN_POSTING_LIMIT, int(len(wanted) * MAX_DOCUMENT_FREQUENCY))
+    shared = Counter()
+    for sources in postings.values():
+        if len(sources) < 2 or len(sources) > limit:
+            continue
+        sources.sort()
+        for i, a in enumerate(sources):
+            for b in sources[i + 1:]:
+                if owners.get(a) is not None and owners.get(a) == owners.get(b):
+                    continue
+                shared[(a, b)] += 1
+
+    matches = []
+    for (a, b), count in shared.items():
+        similarity = count / max(1, min(sizes[a], sizes[b]))
+        if similarity >= threshold:
+            matches.append((a, b, count, round(similarity, 3)))
+    matches.sort(key=lambda m: m[3], reverse=True)
+    return matches
+
+
+def _chunks(items: list):
+    for i in range(0, len(items), _IN_CHUNK):
+        yield items[i:i + _IN_CHUNK]
@@ -0,0 +1,296 @@
+"""
+Incremental re-analysis
+
+Students usually edit one function and resubmit. A synchronous analysis
+leaves a snapshot of its per-function work in a bounded in-process
+store: for each outermost function (a "region") its tokens, the k-gram
+hashes inside it and the metric counts of it and its nested functions.
+Re-analysis against a previous submission finds which of the snapshot's
+regions still appear line for line in the new code, carries them over
+to their new position and recomputes only the rest. Winnowing and clone
+detection still run over the whole file, since clones cross function
+boundaries.
+
+The store lives in one process. With several gunicorn workers a
+resubmission reaching a worker without the snapshot is simply analyzed
+in full and reported with snapshot_found: false.
+"""
+
+import bisect
+import threading
+from collections import Counter, OrderedDict, namedtuple
+
+from app.services.fingerprint import KGRAM, Token, tokenize
+
+# One function inside a region. first/last are token indexes, kept for
+# Java only; counts are the metrics module's running counts.
+FunctionArtifact = namedtuple('FunctionArtifact', ['name', 'start_line', 'end_line', 'first', 'last', 'counts'])
+
+# tokens are the region's tokens (every token on its lines), hashes the
+# k-grams lying entirely inside them; functions the outermost first.
+Region = namedtuple('Region', ['start_line', 'end_line', 'tokens', 'hashes', 'functions'])
+
+Snapshot = namedtuple('Snapshot', ['language', 'code', 'regions', 'token_count'])
+
+# Markers the Java tokenizer yields when a comment or text block is still
+# open at the end of a segment; a segment ending in one was cut mid-token.
+_OPEN_MARKERS = frozenset({'/*', '"""'})
+
+
+def build_snapshot(language: str, code: str, tokens: list, hashes: list, metrics: dict,
+                   method_spans: list = None):
+    """
+    Snapshot of an analysis for later re-use.
+
+    ``metrics`` is a metrics report with aligned ``functions`` and
+    ``function_counts``; ``method_spans`` the (first, last) token span of
+    each of those functions, for Java. Returns None when there are no
+    functions to carry over.
+    """
+    functions = metrics['functions']
+    if not functions:
+        return None
+    lines = [t.line for t in tokens]
+    regions = []
+    group = []
+    for i, (summary, counts) in enumerate(zip(functions, metrics['function_counts'])):
+        first, last = method_spans[i] if method_spans else (None, None)
+        artifact = FunctionArtifact(summary['name'], summary['start_line'], summary['end_line'],
+                                    first, last, counts)
+        if group and artifact.start_line > group[0].end_line:
+            regions.append(_region(group, tokens, hashes, lines))
+            group = []
+        group.append(artifact)
+    regions.append(_region(group, tokens, hashes, lines))
+    return Snapshot(language, code, regions, len(tokens))
+
+
+def _region(functions, tokens, hashes, lines):
+    outer = functions[0]
+    a = bisect.bisect_left(lines, outer.start_line)
+    b = bisect.bisect_right(lines, outer.end_line)
+    if outer.first is not None:
+        # Token indexes become relative to the region
+        functions = [f._replace(first=f.first - a, last=f.last - a) for f in functions]
+    return Region(outer.start_line, outer.end_line, tokens[a:b], hashes[a:max(a, b - KGRAM + 1)], functions)
+
+
+def count_regions(functions: list) -> int:
+    """Number of outermost functions among analysis function summaries."""
+    count = 0
+    end = 0
+    for f in functions:
+        if f['start_line'] > end:
+            count += 1
+            end = f['end_line']
+    return count
+
+
+def plan_reuse(snapshot: Snapshot, code: str) -> list:
+    """
+    Regions of ``snapshot`` whose lines appear unchanged in ``code``.
+
+    Matching is anchored like a patience diff rather than a general line
+    diff, which degrades on the many repeated lines ("}", "return x") of
+    student code. A region holding a line that occurs exactly once in
+    both versions is anchored by it; every other region is only looked
+    for between the anchors around it, nearest its expected position, so
+    identical one-line methods are not handed to a neighbouring class.
+    Returns
+    (region, line_delta) pairs in new file order, without overlaps.
+    """
+    old_lines = snapshot.code.split('\n')
+    new_lines = code.split('\n')
+    heads = [old_lines[r.start_line - 1] for r in snapshot.regions]
+    wanted = set(heads)
+    positions = {}
+    new_counts = Counter(new_lines)
+    unique_new = {}
+    for j, line in enumerate(new_lines):
+        if line in wanted:
+            positions.setdefault(line, []).append(j)
+        if new_counts[line] == 1:
+            unique_new[line] = j
+    old_counts = Counter(old_lines)
+
+    # Anchors: a line unique to both versions pins its region, kept only
+    # while the anchors stay in order
+    anchors = {}
+    end = 0
+    for i, region in enumerate(snapshot.regions):
+        block = old_lines[region.start_line - 1:region.end_line]
+        for offset, line in enumerate(block):
+            if old_counts[line] == 1 and line in unique_new:
+                j = unique_new[line] - offset
+                if j >= end and new_lines[j:j + len(block)] == block:
+                    anchors[i] = j
+                    end = j + len(block)
+                break
+
+    plan = []
+    low = 0
+    delta = 0
+    following = sorted(anchors)
+    k = 0
+    for i, region in enumerate(snapshot.regions):
+        first = region.start_line - 1
+        block = old_lines[first:region.end_line]
+        if i in anchors:
+            j = anchors[i]
+            k += 1
+        else:
+            while k < len(following) and following[k] < i:
+                k += 1
+            high = anchors[following[k]] if k < len(following) else len(new_lines)
+            j = _nearest_match(positions.get(heads[i], ()), first + delta, block, new_lines, low, high)
+        if j is not None:
+            delta = j - first
+            low = j + len(block)
+            plan.append((region, delta))
+    return plan
+
+
+def _nearest_match(candidates, expected, block, lines, low, high):
+    """Line index in [low, high) nearest ``expected`` where ``block`` fits."""
+    size = len(block)
+    lo = bisect.bisect_left(candidates, low)
+    hi = bisect.bisect_right(candidates, high - size)
+    right = min(max(bisect.bisect_left(candidates, expected), lo), hi)
+    left = right - 1
+    while left >= lo or right < hi:
+        if right >= hi or (left >= lo and expected - candidates[left] <= candidates[right] - expected):
+            j = candidates[left]
+            left -= 1
+        else:
+            j = candidates[right]
+            right += 1
+        if lines[j:j + size] == block:
+            return j
+    return None
+
+
+def assemble_tokens(code: str, language: str, plan: list):
+    """
+    Token list for ``code`` reusing the planned regions' tokens.
+
+    Returns (tokens, spans) where spans lists (a, b, region, delta) for
+    the token range each region occupies, or None when a recomputed
+    segment ends inside a comment or text block and the code has to be
+    tokenized whole.
+    """
+    lines = code.split('\n')
+    tokens = []
+    spans = []
+    line = 1
+    for region, delta in plan:
+        start = region.start_line + delta
+        if start > line and not _extend_segment(tokens, lines, line, start - 1, language):
+            return None
+        a = len(tokens)
+        if delta:
+            new = tuple.__new__
+            tokens.extend(new(Token, (t.text, t.norm, t.line + delta)) for t in region.tokens)
+        else:
+            tokens.extend(region.tokens)
+        spans.append((a, len(tokens), region, delta))
+        line = region.end_line + delta + 1
+    if line <= len(lines):
+        _extend_segment(tokens, lines, line, len(lines), language)
+    return tokens, spans
+
+
+def _extend_segment(tokens, lines, first, last, language) -> bool:
+    segment = tokenize('\n'.join(lines[first - 1:last]), language, first_line=first)
+    if segment and segment[-1].text in _OPEN_MARKERS and segment[-1].norm == segment[-1].text:
+        return False
+    tokens.extend(segment)
+    return True
+
+
+def assemble_hashes(tokens: list, spans: list, hash_tokens, k: int = KGRAM) -> list:
+    """
+    k-gram hashes of ``tokens``, reusing each region's inner hashes.
+
+    ``hash_tokens`` computes the hashes of a token slice; it is only
+    called for windows that touch recomputed tokens.
+    """
+    hashes = []
+    pos = 0  # first window start not yet covered
+    for a, b, region, _ in spans:
+        if b - a < k:
+            continue
+        if a > pos:
+            hashes.extend(hash_tokens(tokens[pos:a + k - 1]))
+        hashes.extend(region.hashes)
+        pos = b - k + 1
+    if len(tokens) - k + 1 > pos:
+        hashes.extend(hash_tokens(tokens[pos:]))
+    return hashes
+
+
+def function_reuse(spans: list, java: bool) -> dict:
+    """
+    Per-region function counts keyed for the metrics stage.
+
+    Python keys by the outermost function's new start line, Java by the
+    new index of its first token; entries are shifted to new positions.
+    """
+    reuse = {}
+    for a, _, region, delta in spans:
+        entries = []
+        for f in region.functions:
+            f = f._replace(start_line=f.start_line + delta, end_line=f.end_line + delta)
+            if java:
+                f = f._replace(first=f.first + a, last=f.last + a)
+            else:
+                f = (f.name, f.start_line, f.end_line, f.counts)
+            entries.append(f)
+        key = entries[0].first if java else entries[0][1]
+        reuse[key] = entries
+    return reuse
+
+
+class SnapshotStore:
+    """Bounded in-process LRU of analysis snapshots, sized in tokens"""
+
+    def __init__(self, max_tokens=500_000):
+        self.max_tokens = max_tokens
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._tokens = 0
+
+    def init_app(self, app):
+        """Configure from Flask config and register on the app."""
+        self.max_tokens = app.config.get('ANALYSIS_SNAPSHOT_TOKENS', 500_000)
+        app.extensions['analysis_snapshots'] = self
+
+    def get(self, key: str):
+        with self._lock:
+            snapshot = self._entries.get(key)
+            if snapshot is not None:
+                self._entries.move_to_end(key)
+            return snapshot
+
+    def put(self, key: str, snapshot):
+        if snapshot is None or snapshot.token_count > self.max_tokens:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._tokens -= old.token_count
+            self._entries[key] = snapshot
+            self._tokens += snapshot.token_count
+            while self._tokens > self.max_tokens:
+                _, evicted = self._entries.popitem(last=False)
+                self._tokens -= evicted.token_count
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+snapshot_store = SnapshotStore()
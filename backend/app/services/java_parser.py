@@ -0,0 +1,1045 @@
+"""
+Java syntax checking
+
+A recursive-descent parser for Java 17 compilation units (plus the
+top-level methods and fields of Java 21 implicitly declared classes),
+working on the token list from ``fingerprint.iter_java_tokens``. It does
+not build a full syntax tree: it validates the structure, raising
+SyntaxError like ``ast.parse`` does, and records what analysis needs,
+namely every method and constructor with its token span, lines and
+cyclomatic decision count. Unchanged methods from an earlier analysis
+can be carried over without parsing their bodies again.
+"""
+
+from collections import namedtuple
+
+JavaUnit = namedtuple('JavaUnit', ['methods', 'decisions', 'reused'])
+
+MODIFIERS = frozenset({
+    'public', 'protected', 'private', 'static', 'abstract', 'final',
+    'native', 'synchronized', 'transient', 'volatile', 'strictfp', 'default',
+})
+PRIMITIVES = frozenset({
+    'boolean', 'byte', 'char', 'short', 'int', 'long', 'float', 'double',
+})
+# Keywords only in some positions; elsewhere they are plain identifiers
+CONTEXTUAL_KEYWORDS = frozenset({'var', 'record', 'yield'})
+
+ASSIGNMENT_OPERATORS = frozenset({
+    '=', '+=', '-=', '*=', '/=', '%=', '&=', '|=', '^=', '<<=', '>>=', '>>>=',
+})
+# Binary operator precedence, loosest first. Shifts arrive as runs of
+# '<' or '>' tokens (the tokenizer never joins them, for generics).
+_PRECEDENCE = {
+    '||': 1, '&&': 2, '|': 3, '^': 4, '&': 5, '==': 6, '!=': 6,
+    '<': 7, '>': 7, '<=': 7, '>=': 7, 'instanceof': 7,
+    '<<': 8, '>>': 8, '>>>': 8, '+': 9, '-': 9, '*': 10, '/': 10, '%': 10,
+}
+_OPENERS = {'(': ')', '[': ']', '{': '}'}
+_CLOSERS = {')': '(', ']': '[', '}': '{'}
+# Expression kinds that may stand alone as a statement
+_STATEMENT_EXPRESSIONS = frozenset({'assign', 'call', 'new', 'step', 'switch'})
+# Tokens that can start the operand of a cast (unary + and - cannot:
+# "(a) - b" is a subtraction)
+_CAST_OPERAND_STARTS = frozenset({
+    '(', '!', '~', 'this', 'super', 'new', 'switch', 'true', 'false', 'null',
+})
+_TYPE_DECLARATIONS = frozenset({'class', 'interface', 'enum'})
+# Lone tokens the tokenizer leaves for constructs it could not close
+_UNCLOSED = {
+    '/*': 'unclosed comment',
+    '"""': 'unclosed text block',
+    '"': 'unclosed string literal',
+    "'": 'unclosed character literal',
+}
+
+
+class JavaMethod:
+    """A method or constructor body found by the parser"""
+
+    __slots__ = ('name', 'start_line', 'end_line', 'first', 'last', 'decisions', 'counts')
+
+    def __init__(self, name, start_line, first):
+        self.name = name
+        self.start_line = start_line
+        self.end_line = start_line
+        self.first = first
+        self.last = first
+        self.decisions = 0
+        # Metric counts, set only for methods carried over from earlier
+        self.counts = None
+
+
+def parse_java(tokens, reuse: dict = None) -> JavaUnit:
+    """
+    Parse a Java compilation unit from its tokens.
+
+    Returns the methods and constructors that have a body, outermost
+    first, the decision count for the whole unit and the (first, last)
+    token spans of carried-over methods. Raises SyntaxError with the
+    offending line on invalid input.
+
+    ``reuse`` maps the index of a method's first token to an unchanged
+    method from an earlier analysis, as a list of entries with name,
+    start_line, end_line, first, last and counts attributes for it and
+    its nested methods. A method matching its entry by name and closing
+    brace is skipped instead of parsed.
+    """
+    parser = _Parser(list(tokens), reuse)
+    try:
+        return parser.compilation_unit()
+    except RecursionError:
+        # Expressions and compound statements nest by recursion, so
+        # pathological nesting is reported like any other syntax error
+        raise parser.error('too deeply nested', min(parser.pos, parser.end - 1)) from None
+
+
+class _Parser:
+    def __init__(self, tokens, reuse=None):
+        self.tokens = tokens
+        self.reuse = reuse or {}
+        self.reused = []
+        # Sentinel '' past the end so lookahead never needs bounds checks
+        self.texts = [t.text for t in tokens] + ['', '', '']
+        self.norms = [t.norm for t in tokens] + ['', '', '']
+        self.end = len(tokens)
+        self.pos = 0
+        self.partner = _match_brackets(tokens)
+        self.methods = []
+        self.scope = None
+        self.prefix = ''
+        self.decisions = 0
+
+    # Token helpers
+
+    def error(self, message, pos=None):
+        pos = self.pos if pos is None else pos
+        if pos >= self.end:
+            message = 'reached end of file while parsing'
+            pos = self.end - 1
+        elif self.texts[pos] in _UNCLOSED:
+            message = _UNCLOSED[self.texts[pos]]
+        line = self.tokens[pos].line if pos >= 0 else 1
+        return SyntaxError(message, ('<java>', line, None, None))
+
+    def accept(self, text):
+        if self.texts[self.pos] == text:
+            self.pos += 1
+            return True
+        return False
+
+    def expect(self, text):
+        if self.texts[self.pos] != text:
+            raise self.error(f"expected '{text}', found {self.describe()}")
+        self.pos += 1
+
+    def describe(self, pos=None):
+        pos = self.pos if pos is None else pos
+        if pos >= self.end:
+            return 'end of file'
+        return repr(self.texts[pos])
+
+    def is_ident(self, ahead=0):
+        pos = self.pos + ahead
+        return self.norms[pos] == 'ID' or self.texts[pos] in CONTEXTUAL_KEYWORDS
+
+    def ident(self):
+        if not self.is_ident():
+            raise self.error(f'expected identifier, found {self.describe()}')
+        self.pos += 1
+        return self.texts[self.pos - 1]
+
+    def decision(self):
+        self.decisions += 1
+        if self.scope is not None:
+            self.scope.decisions += 1
+
+    def speculate(self, parse):
+        """Run ``parse`` and report success, rewinding if it fails."""
+        start = self.pos
+        try:
+            parse()
+            return True
+        except SyntaxError:
+            self.pos = start
+            return False
+
+    # Declarations
+
+    def compilation_unit(self):
+        if self.texts[self.pos] == 'package' or (
+                self.texts[self.pos] == '@' and self._annotated_package()):
+            self.annotations()
+            self.expect('package')
+            self.qualified_name()
+            self.expect(';')
+        while self.texts[self.pos] == 'import':
+            self.pos += 1
+            self.accept('static')
+            self.qualified_name()
+            if self.accept('.'):
+                self.expect('*')
+            self.expect(';')
+        while self.pos < self.end:
+            if self.texts[self.pos] == 'import':
+                raise self.error('imports must come before declarations')
+            # Java 21 implicitly declared classes allow top-level members
+            self.member(None)
+        return JavaUnit(self.methods, self.decisions, self.reused)
+
+    def _annotated_package(self):
+        start = self.pos
+        try:
+            self.annotations()
+            return self.texts[self.pos] == 'package'
+        except SyntaxError:
+            return False
+        finally:
+            self.pos = start
+
+    def qualified_name(self):
+        self.ident()
+        while self.texts[self.pos] == '.' and self.is_ident(1):
+            self.pos += 2
+
+    def at_type_declaration(self):
+        text = self.texts[self.pos]
+        if text in _TYPE_DECLARATIONS:
+            return True
+        if text == '@':
+            return self.texts[self.pos + 1] == 'interface'
+        return text == 'record' and self.is_ident(1) and self.texts[self.pos + 2] in ('(', '<')
+
+    def type_declaration(self):
+        kind = self.texts[self.pos]
+        if kind == '@':
+            self.pos += 1
+            kind = 'annotation'
+        self.pos += 1
+        name = self.ident()
+        if kind != 'annotation':
+            self.type_parameters()
+        if kind == 'record':
+            self.record_header()
+        if self.accept('extends'):
+            self.type_list()
+        if self.accept('implements'):
+            self.type_list()
+        if self.texts[self.pos] == 'permits':
+            self.pos += 1
+            self.type_list()
+
+        outer, self.prefix = self.prefix, f'{self.prefix}{name}.'
+        outer_scope, self.scope = self.scope, None
+        if kind == 'enum':
+            self.enum_body(name)
+        else:
+            self.class_body(name, record=kind == 'record')
+        self.prefix, self.scope = outer, outer_scope
+
+    def record_header(self):
+        self.expect('(')
+        if not self.accept(')'):
+            while True:
+                self.modifiers()
+                self.type_()
+                self.varargs()
+                self.ident()
+                if not self.accept(','):
+                    break
+            self.expect(')')
+
+    def type_list(self):
+        self.type_()
+        while self.accept(','):
+            self.type_()
+
+    def class_body(self, name, record=False):
+        self.expect('{')
+        while not self.accept('}'):
+            self.member(name, record)
+
+    def enum_body(self, name):
+        self.expect('{')
+        while self.texts[self.pos] not in (';', '}'):
+            self.annotations()
+            constant = self.ident()
+            if self.texts[self.pos] == '(':
+                self.arguments()
+            if self.texts[self.pos] == '{':
+                outer, self.prefix = self.prefix, f'{self.prefix}{constant}.'
+                self.class_body(constant)
+                self.prefix = outer
+            if not self.accept(','):
+                break
+        if self.accept(';'):
+            while self.texts[self.pos] != '}':
+                self.member(name)
+        self.expect('}')
+
+    def member(self, class_name, record=False):
+        """One class body declaration; class_name is None at top level."""
+        text = self.texts[self.pos]
+        if text == ';':
+            self.pos += 1
+            return
+        if class_name is not None and (text == '{' or (text == 'static' and self.texts[self.pos + 1] == '{')):
+            # Initializer blocks count towards the unit, not a method
+            self.accept('static')
+            self.block()
+            return
+        self.modifiers()
+        if self.at_type_declaration():
+            self.type_declaration()
+            return
+
+        start = self.pos
+        generic = self.texts[start] == '<'
+        self.type_parameters()
+        if self.is_ident() and self.texts[self.pos + 1] == '(' and class_name is not None:
+            if self.texts[self.pos] != class_name:
+                raise self.error('invalid method declaration; return type required')
+            self.pos += 1
+            self.method_rest(start, class_name)
+            return
+        if (record and self.texts[self.pos] == class_name
+                and self.texts[self.pos + 1] == '{'):
+            # Compact canonical constructor
+            self.pos += 1
+            self.method_body(start, class_name)
+            return
+
+        self.type_()
+        name = self.ident()
+        if self.texts[self.pos] == '(':
+            self.method_rest(start, name)
+            return
+        if generic:
+            raise self.error(f"expected '(', found {self.describe()}")
+        self.declarators_rest()
+        self.expect(';')
+
+    def method_rest(self, start, name):
+        self.formal_parameters()
+        self.dims()
+        if self.accept('throws'):
+            self.type_list()
+        if self.accept('default'):
+            self.element_value()
+        if self.texts[self.pos] == '{':
+            self.method_body(start, name)
+        else:
+            self.expect(';')
+
+    def method_body(self, start, name):
+        earlier = self.reuse.get(start)
+        if (earlier and earlier[0].name == f'{self.prefix}{name}'
+                and self.partner[self.pos] == earlier[0].last):
+            self.adopt(earlier)
+            return
+        method = JavaMethod(f'{self.prefix}{name}', self.tokens[start].line, start)
+        self.methods.append(method)
+        outer_scope, self.scope = self.scope, method
+        outer, self.prefix = self.prefix, f'{method.name}.'
+        self.block()
+        self.scope, self.prefix = outer_scope, outer
+        method.last = self.pos - 1
+        method.end_line = self.tokens[method.last].line
+
+    def adopt(self, entries):
+        """Take over an unchanged method body (and its nested methods)."""
+        for entry in entries:
+            method = JavaMethod(entry.name, entry.start_line, entry.first)
+            method.end_line = entry.end_line
+            method.last = entry.last
+            method.counts = entry.counts
+            method.decisions = entry.counts.decisions
+            self.methods.append(method)
+            self.decisions += method.decisions
+        self.reused.append((entries[0].first, entries[0].last))
+        self.pos = entries[0].last + 1
+
+    def formal_parameters(self):
+        self.expect('(')
+        if self.accept(')'):
+            return
+        while True:
+            self.modifiers()
+            self.type_()
+            self.varargs()
+            if not self.accept('this'):
+                self.ident()
+                self.dims()
+            if not self.accept(','):
+                break
+        self.expect(')')
+
+    def varargs(self):
+        if self.texts[self.pos] == '.':
+            for _ in range(3):
+                self.expect('.')
+
+    def modifiers(self):
+        texts = self.texts
+        while True:
+            text = texts[self.pos]
+            if text in MODIFIERS:
+                self.pos += 1
+            elif text == '@' and texts[self.pos + 1] != 'interface':
+                self.annotation()
+            elif text == 'sealed' and (texts[self.pos + 1] in MODIFIERS
+                                       or texts[self.pos + 1] in _TYPE_DECLARATIONS):
+                self.pos += 1
+            elif text == 'non' and texts[self.pos + 1] == '-' and texts[self.pos + 2] == 'sealed':
+                self.pos += 3
+            else:
+                return
+
+    def annotations(self):
+        while self.texts[self.pos] == '@' and self.texts[self.pos + 1] != 'interface':
+            self.annotation()
+
+    def annotation(self):
+        self.expect('@')
+        self.qualified_name()
+        if self.texts[self.pos] == '(':
+            self.pos = self.partner[self.pos] + 1
+
+    def element_value(self):
+        if self.texts[self.pos] == '{':
+            self.pos = self.partner[self.pos] + 1
+        elif self.texts[self.pos] == '@':
+            self.annotation()
+        else:
+            self.ternary()
+
+    # Types
+
+    def type_(self):
+        self.annotations()
+        text = self.texts[self.pos]
+        if text in PRIMITIVES or text == 'void':
+            self.pos += 1
+        else:
+            self.class_type()
+        self.dims()
+
+    def class_type(self):
+        self.ident()
+        self.type_arguments()
+        while self.texts[self.pos] == '.' and (self.is_ident(1) or self.texts[self.pos + 1] == '@'):
+            self.pos += 1
+            self.annotations()
+            self.ident()
+            self.type_arguments()
+
+    def type_arguments(self):
+        if not self.accept('<'):
+            return
+        if self.accept('>'):
+            return  # diamond
+        while True:
+            self.annotations()
+            if self.accept('?'):
+                if self.accept('extends') or self.accept('super'):
+                    self.type_()
+            else:
+                self.type_()
+            if not self.accept(','):
+                break
+        self.expect('>')
+
+    def type_parameters(self):
+        if not self.accept('<'):
+            return
+        while True:
+            self.annotations()
+            self.ident()
+            if self.accept('extends'):
+                self.type_()
+                while self.accept('&'):
+                    self.type_()
+            if not self.accept(','):
+                break
+        self.expect('>')
+
+    def dims(self):
+        while self.texts[self.pos] == '[' and self.texts[self.pos + 1] == ']':
+            self.pos += 2
+
+    # Statements
+
+    def block(self):
+        self.expect('{')
+        texts = self.texts
+        # Bare nested blocks are counted rather than parsed recursively
+        depth = 1
+        while depth:
+            text = texts[self.pos]
+            if text == '}':
+                self.pos += 1
+                depth -= 1
+            elif text == '{':
+                self.pos += 1
+                depth += 1
+            elif self.pos >= self.end:
+                raise self.error('')
+            else:
+                self.block_statement()
+
+    def block_statement(self):
+        texts = self.texts
+        text = texts[self.pos]
+        if text == 'yield' and self._yield_statement():
+            self.pos += 1
+            self.expression()
+            self.expect(';')
+            return
+        if text in ('final', '@', 'abstract', 'static', 'strictfp') or self.at_type_declaration():
+            self.modifiers()
+            if self.at_type_declaration():
+                self.type_declaration()
+                return
+            self.local_variables()
+            self.expect(';')
+            return
+        if self.at_local_variables():
+            self.local_variables()
+            self.expect(';')
+            return
+        self.statement()
+
+    def _yield_statement(self):
+        after = self.texts[self.pos + 1]
+        return not (after in ASSIGNMENT_OPERATORS or after in ('.', '[', '(', '++', '--', ';', ':', ')'))
+
+    def at_local_variables(self):
+        """True when a local variable declaration starts here."""
+        text = self.texts[self.pos]
+        if text in PRIMITIVES:
+            return True
+        if not self.is_ident():
+            return False
+        if self.is_ident(1):
+            return True
+        if self.texts[self.pos + 1] not in ('<', '.', '['):
+            return False
+        start = self.pos
+        try:
+            self.type_()
+            return self.is_ident()
+        except SyntaxError:
+            return False
+        finally:
+            self.pos = start
+
+    def local_variables(self):
+        self.type_()
+        self.ident()
+        self.declarators_rest()
+
+    def declarators_rest(self):
+        """Rest of 'Type name [= init], name2 ...' after the first name."""
+        while True:
+            self.dims()
+            if self.accept('='):
+                self.variable_initializer()
+            if not self.accept(','):
+                return
+            self.ident()
+
+    def variable_initializer(self):
+        if self.texts[self.pos] == '{':
+            self.array_initializer()
+        else:
+            self.expression()
+
+    def array_initializer(self):
+        self.expect('{')
+        while self.texts[self.pos] != '}':
+            self.variable_initializer()
+            if not self.accept(','):
+                break
+        self.expect('}')
+
+    def statement(self):
+        texts = self.texts
+        text = texts[self.pos]
+        start = self.pos
+        if text == '{':
+            self.block()
+        elif text == ';':
+            self.pos += 1
+        elif text == 'if':
+            # Walk 'else if' chains in a loop so long chains do not recurse
+            while True:
+                self.pos += 1
+                self.decision()
+                self.parenthesized()
+                self.statement()
+                if not self.accept('else'):
+                    break
+                if texts[self.pos] != 'if':
+                    self.statement()
+                    break
+        elif text == 'while':
+            self.pos += 1
+            self.decision()
+            self.parenthesized()
+            self.statement()
+        elif text == 'do':
+            self.pos += 1
+            self.decision()
+            self.statement()
+            self.expect('while')
+            self.parenthesized()
+            self.expect(';')
+        elif text == 'for':
+            self.pos += 1
+            self.decision()
+            self.for_control()
+            self.statement()
+        elif text == 'try':
+            self.try_statement()
+        elif text == 'switch':
+            self.switch()
+        elif text == 'return':
+            self.pos += 1
+            if texts[self.pos] != ';':
+                self.expression()
+            self.expect(';')
+        elif text in ('break', 'continue'):
+            self.pos += 1
+            if self.is_ident():
+                self.pos += 1
+            self.expect(';')
+        elif text == 'throw':
+            self.pos += 1
+            self.expression()
+            self.expect(';')
+        elif text == 'synchronized':
+            self.pos += 1
+            self.parenthesized()
+            self.block()
+        elif text == 'assert':
+            self.pos += 1
+            self.decision()
+            self.expression()
+            if self.accept(':'):
+                self.expression()
+            self.expect(';')
+        elif self.is_ident() and texts[self.pos + 1] == ':':
+            self.pos += 2
+            self.statement()
+        elif text in ('else', 'catch', 'finally', 'case', 'default'):
+            raise self.error(f"'{text}' without a matching statement")
+        else:
+            kind = self.expression()
+            if kind not in _STATEMENT_EXPRESSIONS:
+                raise self.error('not a statement', start)
+            self.expect(';')
+
+    def parenthesized(self):
+        self.expect('(')
+        self.expression()
+        self.expect(')')
+
+    def for_control(self):
+        self.expect('(')
+        self.modifiers()
+        if self.at_local_variables():
+            self.type_()
+            self.ident()
+            self.dims()
+            if self.accept(':'):
+                self.expression()
+                self.expect(')')
+                return
+            if self.accept('='):
+                self.variable_initializer()
+            if self.accept(','):
+                self.ident()
+                self.declarators_rest()
+        elif self.texts[self.pos] != ';':
+            self.statement_expressions()
+        self.expect(';')
+        if self.texts[self.pos] != ';':
+            self.expression()
+        self.expect(';')
+        if self.texts[self.pos] != ')':
+            self.statement_expressions()
+        self.expect(')')
+
+    def statement_expressions(self):
+        while True:
+            start = self.pos
+            if self.expression() not in _STATEMENT_EXPRESSIONS:
+                raise self.error('not a statement', start)
+            if not self.accept(','):
+                return
+
+    def try_statement(self):
+        self.pos += 1
+        resources = self.texts[self.pos] == '('
+        if resources:
+            self.pos += 1
+            while self.texts[self.pos] != ')':
+                self.modifiers()
+                if self.at_local_variables():
+                    self.type_()
+                    self.ident()
+                    self.expect('=')
+                self.expression()
+                if not self.accept(';'):
+                    break
+            self.expect(')')
+        self.block()
+        handlers = 0
+        while self.accept('catch'):
+            handlers += 1
+            self.decision()
+            self.expect('(')
+            self.modifiers()
+            self.type_()
+            while self.accept('|'):
+                self.type_()
+            self.ident()
+            self.expect(')')
+            self.block()
+        if self.accept('finally'):
+            handlers += 1
+            self.block()
+        if not handlers and not resources:
+            raise self.error("'try' without 'catch', 'finally' or resource declarations")
+
+    def switch(self):
+        """A switch statement or expression; both allow either label style."""
+        self.pos += 1
+        self.parenthesized()
+        self.expect('{')
+        texts = self.texts
+        while not self.accept('}'):
+            text = texts[self.pos]
+            if text == 'case':
+                self.pos += 1
+                self.decision()
+                self.case_labels()
+            elif text == 'default':
+                self.pos += 1
+            else:
+                self.block_statement()
+                continue
+            if self.accept('->'):
+                if texts[self.pos] == '{':
+                    self.block()
+                elif texts[self.pos] == 'throw':
+                    self.statement()
+                else:
+                    self.expression()
+                    self.expect(';')
+            else:
+                self.expect(':')
+
+    def case_labels(self):
+        while True:
+            if not self.accept('default') and not self.speculate(self.case_pattern):
+                # Not lambda-aware: in "case X -> ..." the arrow ends the label
+                self.ternary()
+            if not self.accept(','):
+                break
+        if self.texts[self.pos] == 'when':
+            self.pos += 1
+            self.expression()
+
+    def case_pattern(self):
+        self.modifiers()
+        self.type_()
+        if self.texts[self.pos] == '(':
+            # Record pattern: skip the nested component patterns
+            self.pos = self.partner[self.pos] + 1
+            if self.is_ident():
+                self.pos += 1
+        else:
+            self.ident()
+        if self.texts[self.pos] not in ('->', ':', ',', 'when'):
+            raise self.error('')
+
+    # Expressions
+
+    def expression(self):
+        """Parse an expression and return its kind (see _STATEMENT_EXPRESSIONS)."""
+        if self.at_lambda():
+            return self.lambda_()
+        kind = self.ternary()
+        if self.texts[self.pos] in ASSIGNMENT_OPERATORS:
+            self.pos += 1
+            self.expression()
+            return 'assign'
+        return kind
+
+    def at_lambda(self):
+        texts = self.texts
+        if texts[self.pos] == '(':
+            return texts[self.partner[self.pos] + 1] == '->'
+        return self.is_ident() and texts[self.pos + 1] == '->'
+
+    def lambda_(self):
+        if self.texts[self.pos] == '(':
+            self.pos += 1
+            while self.texts[self.pos] != ')':
+                self.modifiers()
+                if not (self.is_ident() and self.texts[self.pos + 1] in (',', ')')):
+                    self.type_()
+                self.ident()
+                if not self.accept(','):
+                    break
+            self.expect(')')
+        else:
+            self.pos += 1
+        self.expect('->')
+        if self.texts[self.pos] == '{':
+            self.block()
+        else:
+            self.expression()
+        return 'lambda'
+
+    def ternary(self):
+        kind = self.binary(1)
+        if self.accept('?'):
+            self.decision()
+            self.expression()
+            self.expect(':')
+            if self.at_lambda():
+                self.lambda_()
+            else:
+                self.ternary()
+            return 'other'
+        return kind
+
+    def binary_operator(self):
+        texts = self.texts
+        text = texts[self.pos]
+        if text == '<' and texts[self.pos + 1] == '<':
+            return '<<', 2
+        if text == '>' and texts[self.pos + 1] == '>':
+            if texts[self.pos + 2] == '>':
+                return '>>>', 3
+            return '>>', 2
+        if text in _PRECEDENCE:
+            return text, 1
+        return None, 0
+
+    def binary(self, min_precedence):
+        kind = self.unary()
+        while True:
+            op, width = self.binary_operator()
+            if op is None or _PRECEDENCE[op] < min_precedence:
+                return kind
+            self.pos += width
+            kind = 'other'
+            if op == 'instanceof':
+                self.accept('final')
+                self.type_()
+                if self.texts[self.pos] == '(':
+                    self.pos = self.partner[self.pos] + 1
+                if self.is_ident():
+                    self.pos += 1
+                continue
+            if op == '&&' or op == '||':
+                self.decision()
+            self.binary(_PRECEDENCE[op] + 1)
+
+    def unary(self):
+        text = self.texts[self.pos]
+        if text == '++' or text == '--':
+            self.pos += 1
+            self.unary()
+            return 'step'
+        if text in ('+', '-', '!', '~'):
+            self.pos += 1
+            self.unary()
+            return 'other'
+        if text == '(' and self.at_cast():
+            self.pos += 1
+            self.type_()
+            while self.accept('&'):
+                self.type_()
+            self.expect(')')
+            if self.at_lambda():
+                self.lambda_()
+            else:
+                self.unary()
+            return 'other'
+        return self.postfix(self.primary())
+
+    def at_cast(self):
+        close = self.partner[self.pos]
+        start = self.pos
+        self.pos += 1
+        try:
+            primitive = self.texts[self.pos] in PRIMITIVES
+            self.type_()
+            while self.accept('&'):
+                self.type_()
+            if self.pos != close:
+                return False
+        except SyntaxError:
+            return False
+        finally:
+            self.pos = start
+        if primitive:
+            return True
+        after = close + 1
+        return (self.norms[after] in ('ID', 'NUM', 'STR')
+                or self.texts[after] in _CAST_OPERAND_STARTS
+                or self.texts[after] in CONTEXTUAL_KEYWORDS)
+
+    def primary(self):
+        texts = self.texts
+        text = texts[self.pos]
+        norm = self.norms[self.pos]
+        if norm in ('NUM', 'STR') or text in ('true', 'false', 'null'):
+            self.pos += 1
+            return 'other'
+        if self.is_ident():
+            self.pos += 1
+            return 'name'
+        if text == '(':
+            self.parenthesized()
+            return 'other'
+        if text == 'this':
+            self.pos += 1
+            if texts[self.pos] == '(':
+                self.arguments()
+                return 'call'
+            return 'other'
+        if text == 'super':
+            self.pos += 1
+            if texts[self.pos] == '(':
+                self.arguments()
+                return 'call'
+            if texts[self.pos] != '::':
+                self.expect('.')
+                self.type_arguments()
+                self.ident()
+                return 'name'
+            return 'other'
+        if text == 'new':
+            self.creator()
+            return 'new'
+        if text == 'switch':
+            self.switch()
+            return 'switch'
+        if text in PRIMITIVES or text == 'void':
+            # int.class, int[].class, int[]::new
+            self.pos += 1
+            self.dims()
+            if self.accept('.'):
+                self.expect('class')
+            elif texts[self.pos] != '::':
+                raise self.error(f"expected '.class', found {self.describe()}")
+            return 'other'
+        raise self.error(f'illegal start of expression: {self.describe()}')
+
+    def postfix(self, kind):
+        texts = self.texts
+        while True:
+            text = texts[self.pos]
+            if text == '.':
+                self.pos += 1
+                after = texts[self.pos]
+                if after == 'new':
+                    self.creator()
+                    kind = 'new'
+                elif after in ('class', 'this', 'super'):
+                    self.pos += 1
+                    kind = 'other'
+                else:
+                    self.type_arguments()
+                    self.ident()
+                    kind = 'name'
+            elif text == '(' and kind == 'name':
+                self.arguments()
+                kind = 'call'
+            elif text == '[':
+                if texts[self.pos + 1] == ']':
+                    self.dims()
+                    if texts[self.pos] not in ('.', '::'):
+                        raise self.error(f"expected '.class', found {self.describe()}")
+                else:
+                    self.pos += 1
+                    self.expression()
+                    self.expect(']')
+                kind = 'other'
+            elif text == '::':
+                self.pos += 1
+                self.type_arguments()
+                if not self.accept('new'):
+                    self.ident()
+                kind = 'other'
+            elif text == '++' or text == '--':
+                self.pos += 1
+                kind = 'step'
+            else:
+                return kind
+
+    def arguments(self):
+        self.expect('(')
+        if self.accept(')'):
+            return
+        while True:
+            self.expression()
+            if not self.accept(','):
+                break
+        self.expect(')')
+
+    def creator(self):
+        self.expect('new')
+        self.type_arguments()
+        self.annotations()
+        name = self.texts[self.pos]
+        if name in PRIMITIVES:
+            self.pos += 1
+        else:
+            self.class_type()
+        if self.texts[self.pos] == '[':
+            sized = False
+            while self.texts[self.pos] == '[':
+                self.pos += 1
+                if not self.accept(']'):
+                    self.expression()
+                    self.expect(']')
+                    sized = True
+            if not sized or self.texts[self.pos] == '{':
+                self.array_initializer()
+            return
+        self.arguments()
+        if self.texts[self.pos] == '{':
+            outer, self.prefix = self.prefix, f'{self.prefix}<anonymous {name}>.'
+            outer_scope, self.scope = self.scope, None
+            self.class_body(name)
+            self.prefix, self.scope = outer, outer_scope
+
+
+def _match_brackets(tokens) -> list:
+    """partner[i] = index of the bracket closing the one opened at i."""
+    partner = [0] * (len(tokens) + 3)
+    stack = []
+    for i, token in enumerate(tokens):
+        text = token.text
+        if text in _OPENERS:
+            stack.append(i)
+        elif text in _CLOSERS:
+            if not stack:
+                raise SyntaxError(f"unmatched '{text}'", ('<java>', token.line, None, None))
+            opener = stack.pop()
+            if tokens[opener].text != _CLOSERS[text]:
+                raise SyntaxError(
+                    f"closing '{text}' does not match '{tokens[opener].text}' on line {tokens[opener].line}",
+                    ('<java>', token.line, None, None))
+            partner[opener] = i
+            partner[i] = opener
+    if stack:
+        token = tokens[stack[-1]]
+        raise SyntaxError(f"'{token.text}' was never closed", ('<java>', token.line, None, None))
+    return partner
@@ -0,0 +1,252 @@
+"""
+Background analysis jobs
+
+Large submissions can be analyzed outside the request thread: the
+request enqueues a job on a bounded process pool and returns its id,
+and the client polls for the result. A limit on pending jobs turns
+bursts into 429 responses instead of unbounded memory growth.
+
+Each worker process runs its own pool, but job status and results are
+kept in the analysis_jobs table, so a poll answered by any worker finds
+the job. Only the worker running a job can tell queued from running;
+the others report it as queued until it finishes. Rows are deleted
+ANALYSIS_JOB_TTL seconds after they finish (or after they were created,
+for jobs whose worker went away).
+"""
+
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+from app.models import db, AnalysisJobRecord
+from app.services.analyzer import run_analysis
+
+
+class QueueFullError(Exception):
+    """Raised when the number of pending jobs has reached the limit"""
+
+
+class AnalysisJob:
+    """A queued analysis and, once finished, its result"""
+
+    def __init__(self, user_id, language):
+        self.id = str(uuid.uuid4())
+        self.user_id = user_id
+        self.language = language
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.future = None
+
+    @classmethod
+    def from_record(cls, record):
+        """A job as stored by whichever worker ran it"""
+        job = cls(record.user_id, record.language)
+        job.id = record.id
+        job.status = record.status
+        job.result = record.result
+        job.error = record.error
+        job.created_at = record.created_at
+        job.finished_at = record.finished_at
+        return job
+
+    def to_record(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'language': self.language,
+            'status': self.status,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+        }
+
+    @property
+    def done(self):
+        return self.status in ('finished', 'failed')
+
+    def to_dict(self):
+        status = self.status
+        future = self.future
+        if status == 'queued' and future is not None and future.running():
+            status = 'running'
+        result = {
+            'job_id': self.id,
+            'status': status,
+            'language': self.language,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+        }
+        if self.status == 'finished':
+            result['result'] = self.result
+        elif self.status == 'failed':
+            result['error'] = self.error
+        return result
+
+
+class AnalysisJobQueue:
+    """Bounded process pool plus a job table shared by all workers"""
+
+    def __init__(self, max_workers=None, max_pending=64, ttl=600):
+        self.app = None
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._jobs = {}  # jobs running in this process
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def init_app(self, app):
+        """Configure from Flask config and register on the app."""
+        self.app = app
+        self.max_workers = app.config.get('ANALYSIS_WORKERS') or os.cpu_count() or 1
+        self.max_pending = app.config.get('ANALYSIS_QUEUE_DEPTH', 64)
+        self.ttl = app.config.get('ANALYSIS_JOB_TTL', 600)
+        app.extensions['analysis_jobs'] = self
+
+    def submit(self, code, language, user_id=None, on_complete=None):
+        """
+        Enqueue an analysis and return its job.
+
+        ``on_complete(job, result, hashes)`` runs in the parent process
+        inside an app context once the worker is done; its return value
+        becomes the job result. Raises QueueFullError when max_pending
+        jobs are already waiting or running.
+        """
+        with self._lock:
+            if self.pending >= self.max_pending:
+                raise QueueFullError(f'{self.pending} analysis jobs pending')
+            job = AnalysisJob(user_id, language)
+            self._jobs[job.id] = job
+        try:
+            with db.engine.begin() as conn:
+                self._prune(conn)
+                conn.execute(AnalysisJobRecord.__table__.insert(), job.to_record())
+            with self._lock:
+                job.future = self._submit(code, language)
+        except Exception:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+            raise
+        job.future.add_done_callback(lambda future: self._finish(job, future, on_complete))
+        return job
+
+    def run_batch(self, submissions):
+        """
+        Analyze (code, language) pairs on the worker pool.
+
+        ``submissions`` may be any iterable and is consumed lazily. Yields
+        (index, (result, hashes), error) in completion order so callers
+        can use each result as soon as it is ready. At most two tasks per
+        worker are in flight, so memory stays flat however many
+        submissions there are. With a single worker the pool round trip
+        buys nothing, so analysis runs inline.
+        """
+        if self.max_workers == 1:
+            for i, (code, language) in enumerate(submissions):
+                try:
+                    yield i, run_analysis(code, language), None
+                except Exception as e:
+                    yield i, None, e
+            return
+
+        source = enumerate(submissions)
+        in_flight = {}
+        limit = 2 * self.max_workers
+        exhausted = False
+        while in_flight or not exhausted:
+            while not exhausted and len(in_flight) < limit:
+                try:
+                    i, (code, language) = next(source)
+                except StopIteration:
+                    exhausted = True
+                    break
+                with self._lock:
+                    in_flight[self._submit(code, language)] = i
+            if not in_flight:
+                break
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = in_flight.pop(future)
+                try:
+                    yield i, future.result(), None
+                except Exception as e:
+                    yield i, None, e
+
+    def get(self, job_id):
+        """The job with this id, from this process or the shared table."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+        # A plain row rather than an ORM object, so repeated polls in one
+        # session are not answered from its identity map
+        table = AnalysisJobRecord.__table__
+        record = db.session.execute(db.select(table).where(table.c.id == job_id)).first()
+        return AnalysisJob.from_record(record) if record is not None else None
+
+    @property
+    def pending(self):
+        return len(self._jobs)
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=wait, cancel_futures=not wait)
+                self._pool = None
+
+    def _submit(self, code, language):
+        """Submit to the pool (caller holds the lock), replacing a broken pool once."""
+        try:
+            return self._executor().submit(run_analysis, code, language)
+        except BrokenProcessPool:
+            self._pool = None
+            return self._executor().submit(run_analysis, code, language)
+
+    def _executor(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+    def _finish(self, job, future, on_complete):
+        status, result, error = 'finished', None, None
+        try:
+            result, hashes = future.result()
+            if on_complete is not None:
+                with self.app.app_context():
+                    result = on_complete(job, result, hashes)
+        except Exception as e:
+            status, result, error = 'failed', None, str(e) or e.__class__.__name__
+        finished_at = time.time()
+        try:
+            # The shared row first, so no worker reports the job as queued
+            # after this one has reported it done
+            with self.app.app_context(), db.engine.begin() as conn:
+                conn.execute(
+                    AnalysisJobRecord.__table__.update()
+                    .where(AnalysisJobRecord.id == job.id)
+                    .values(status=status, result=result, error=error, finished_at=finished_at)
+                )
+        finally:
+            job.result, job.error = result, error
+            job.finished_at = finished_at
+            job.future = None
+            # Set last: readers treat a done status as "result is complete"
+            job.status = status
+            with self._lock:
+                self._jobs.pop(job.id, None)
+
+    def _prune(self, conn):
+        """Delete jobs that finished (or, if never finished, started) over ttl ago."""
+        cutoff = time.time() - self.ttl
+        table = AnalysisJobRecord.__table__
+        conn.execute(table.delete().where(db.func.coalesce(table.c.finished_at, table.c.created_at) < cutoff))
+
+
+job_queue = AnalysisJobQueue()
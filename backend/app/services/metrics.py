@@ -0,0 +1,322 @@
+"""
+Code quality metrics
+
+Cyclomatic complexity, Halstead volume and maintainability index, both
+per function and for the whole submission. Python metrics come from a
+single pass over an already-parsed ``ast`` tree and Java metrics from
+the parsed unit plus its tokens; code that does not parse falls back to
+counting over the token stream.
+"""
+
+import ast
+import math
+
+# Python nodes that add one independent path each
+_DECISION_NODES = (
+    ast.If, ast.IfExp, ast.For, ast.AsyncFor, ast.While,
+    ast.ExceptHandler, ast.Assert,
+) + ((ast.match_case,) if hasattr(ast, 'match_case') else ())
+
+_FUNCTION_NODES = (ast.FunctionDef, ast.AsyncFunctionDef)
+_SCOPE_NODES = _FUNCTION_NODES + (ast.ClassDef,)
+
+# Operator nodes for Halstead counting: arithmetic/logic/comparison
+# operators plus the statements and expressions that act on operands
+_OPERATOR_NODES = (
+    ast.operator, ast.unaryop, ast.boolop, ast.cmpop,
+    ast.Assign, ast.AugAssign, ast.AnnAssign, ast.Call, ast.Return,
+    ast.Subscript, ast.Attribute, ast.Yield, ast.YieldFrom, ast.Await,
+    ast.Raise, ast.Delete, ast.Lambda, ast.If, ast.IfExp, ast.For,
+    ast.AsyncFor, ast.While, ast.With, ast.AsyncWith, ast.Try,
+    ast.Import, ast.ImportFrom, ast.Global, ast.Nonlocal,
+)
+
+# Token-level equivalents used by the fallback path
+_DECISION_TOKENS = frozenset({
+    'if', 'elif', 'for', 'while', 'case', 'catch', 'except', 'assert',
+    '&&', '||', '?', 'and', 'or',
+})
+_OPERAND_TOKENS = frozenset({'ID', 'NUM', 'STR'})
+_GROUPING_TOKENS = frozenset({')', ']', '}', ',', ';', ':'})
+
+
+class _Counts:
+    """Running complexity and Halstead counts for one scope"""
+
+    __slots__ = ('decisions', 'operators', 'operands', 'total_operators', 'total_operands')
+
+    def __init__(self):
+        self.decisions = 0
+        self.operators = set()
+        self.operands = set()
+        self.total_operators = 0
+        self.total_operands = 0
+
+    def volume(self) -> float:
+        length = self.total_operators + self.total_operands
+        vocabulary = len(self.operators) + len(self.operands)
+        if vocabulary < 2:
+            return float(length)
+        return length * math.log2(vocabulary)
+
+
+def maintainability_index(volume: float, complexity: float, loc: int) -> float:
+    """Normalized (0-100) maintainability index, as used by Visual Studio."""
+    raw = 171 - 5.2 * math.log(max(volume, 1.0)) - 0.23 * complexity - 16.2 * math.log(max(loc, 1))
+    return round(max(0.0, min(100.0, raw * 100 / 171)), 1)
+
+
+def python_metrics(tree: ast.AST, code: str, reuse: dict = None) -> dict:
+    """
+    Metrics for a parsed Python module in one traversal of ``tree``.
+
+    Each function gets its own complexity and Halstead counts; nested
+    functions are measured separately from their enclosing function.
+    The file-wide counts are the union of every scope.
+
+    ``reuse`` maps a start line to the counts of an unchanged function
+    from an earlier analysis, as a list of (name, start_line, end_line,
+    counts) for it and its nested functions. A function matching its
+    entry by name and end line is not traversed again.
+    """
+    counted_lines = _counted_line_prefix(code)
+    module_counts = _Counts()
+    scopes = [module_counts]
+    functions = []
+    node_info = _NODE_INFO
+    reuse = reuse or {}
+    reused = 0
+
+    stack = [(tree, module_counts, '')]
+    pop, push = stack.pop, stack.append
+    while stack:
+        node, counts, prefix = pop()
+        cls = node.__class__
+        info = node_info.get(cls)
+        if info is None:
+            info = node_info[cls] = _classify(cls)
+        kind, decisions, operator, fields = info
+
+        if kind:
+            if kind == _SCOPE:
+                name = f'{prefix}{node.name}'
+                if isinstance(node, _FUNCTION_NODES):
+                    earlier = reuse.get(node.lineno)
+                    if earlier and earlier[0][0] == name and earlier[0][2] == node.end_lineno:
+                        for entry in earlier:
+                            scopes.append(entry[3])
+                            functions.append(entry)
+                        reused += 1
+                        continue
+                    counts = _Counts()
+                    scopes.append(counts)
+                    functions.append((name, node.lineno, node.end_lineno or node.lineno, counts))
+                prefix = f'{name}.'
+            elif kind == _BOOLOP:
+                decisions = len(node.values) - 1
+            elif kind == _COMPREHENSION:
+                decisions = 1 + len(node.ifs)
+            else:
+                operand = node.id if kind == _NAME else (
+                    repr(node.value)[:64] if kind == _CONSTANT else (
+                        node.arg if kind == _ARG else node.attr))
+                counts.operands.add(operand)
+                counts.total_operands += 1
+
+        if decisions:
+            counts.decisions += decisions
+        if operator is not None:
+            counts.operators.add(operator)
+            counts.total_operators += 1
+
+        for field in fields:
+            value = getattr(node, field, None)
+            if value.__class__ is list:
+                for item in value:
+                    if isinstance(item, ast.AST):
+                        push((item, counts, prefix))
+            elif isinstance(value, ast.AST):
+                push((value, counts, prefix))
+
+    file_counts = _Counts()
+    for counts in scopes:
+        _merge(file_counts, counts)
+
+    functions.sort(key=lambda f: f[1])
+    report = _report(file_counts, counted_lines[-1], _function_summaries(functions, counted_lines))
+    report['function_counts'] = [f[3] for f in functions]
+    report['regions_reused'] = reused
+    return report
+
+
+# Node kinds needing per-node work beyond the static table lookup
+_SCOPE, _BOOLOP, _COMPREHENSION, _NAME, _CONSTANT, _ARG, _ATTRIBUTE = range(1, 8)
+
+# node class -> (kind, decisions, operator name or None, child field names)
+_NODE_INFO = {}
+
+
+def _classify(cls) -> tuple:
+    """Static metrics facts about an AST node class, computed once per class."""
+    kind = 0
+    if issubclass(cls, _SCOPE_NODES):
+        kind = _SCOPE
+    elif issubclass(cls, ast.BoolOp):
+        kind = _BOOLOP
+    elif issubclass(cls, ast.comprehension):
+        kind = _COMPREHENSION
+    elif issubclass(cls, ast.Name):
+        kind = _NAME
+    elif issubclass(cls, ast.Constant):
+        kind = _CONSTANT
+    elif issubclass(cls, ast.arg):
+        kind = _ARG
+    elif issubclass(cls, ast.Attribute):
+        kind = _ATTRIBUTE
+    decisions = 1 if issubclass(cls, _DECISION_NODES) else 0
+    operator = cls.__name__ if issubclass(cls, _OPERATOR_NODES) else None
+    # Load/Store contexts and plain-value fields never hold countable nodes
+    skip = {'ctx', 'type_comment'}
+    if kind in (_NAME, _CONSTANT):
+        skip.update(cls._fields)
+    fields = tuple(f for f in cls._fields if f not in skip)
+    return kind, decisions, operator, fields
+
+
+def java_metrics(unit, tokens: list, code: str) -> dict:
+    """
+    Metrics for a parsed Java unit (see ``java_parser.parse_java``).
+
+    Decision counts come from the parser, which can tell a conditional
+    ``?`` from a generic wildcard. Halstead counts come from the tokens,
+    each counted for the innermost method containing it, so methods of
+    local and anonymous classes are measured separately. Methods the
+    parser carried over from an earlier analysis keep their counts and
+    their tokens are skipped.
+    """
+    counted_lines = _counted_line_prefix(code)
+    file_counts = _Counts()
+    file_counts.decisions = unit.decisions
+    methods = []
+    fresh = []
+    for m in unit.methods:
+        if m.counts is None:
+            counts = _Counts()
+            counts.decisions = m.decisions
+            fresh.append((m, counts))
+        else:
+            counts = m.counts
+            _merge(file_counts, counts, decisions=False)
+        methods.append((m.name, m.start_line, m.end_line, counts))
+
+    # Methods are ordered by first token and nest properly, so a stack of
+    # open methods tracks the innermost one
+    open_methods = []
+    upcoming = iter(fresh)
+    following = next(upcoming, None)
+    start = 0
+    for first, last in list(unit.reused) + [(len(tokens), len(tokens))]:
+        for i in range(start, first):
+            token = tokens[i]
+            while following is not None and following[0].first == i:
+                open_methods.append(following)
+                following = next(upcoming, None)
+            _count_token(file_counts, token)
+            if open_methods:
+                _count_token(open_methods[-1][1], token)
+                while open_methods and open_methods[-1][0].last == i:
+                    open_methods.pop()
+        start = last + 1
+
+    report = _report(file_counts, counted_lines[-1], _function_summaries(methods, counted_lines))
+    report['function_counts'] = [m[3] for m in methods]
+    report['regions_reused'] = len(unit.reused)
+    return report
+
+
+def token_metrics(tokens: list, code: str) -> dict:
+    """File-wide metrics from a normalized token stream (no per-function data)."""
+    counts = _Counts()
+    for token in tokens:
+        if token.norm in _DECISION_TOKENS:
+            counts.decisions += 1
+        _count_token(counts, token)
+    return _report(counts, _counted_line_prefix(code)[-1], [])
+
+
+def _function_summaries(functions: list, counted_lines: list) -> list:
+    """Summaries for (name, start_line, end_line, counts) entries."""
+    summaries = []
+    for name, start, end, counts in functions:
+        loc = counted_lines[end] - counted_lines[start - 1]
+        summaries.append(_summary(counts, loc, name=name, start_line=start, end_line=end))
+    return summaries
+
+
+def _merge(into: _Counts, counts: _Counts, decisions: bool = True):
+    if decisions:
+        into.decisions += counts.decisions
+    into.operators |= counts.operators
+    into.operands |= counts.operands
+    into.total_operators += counts.total_operators
+    into.total_operands += counts.total_operands
+
+
+def _count_token(counts: _Counts, token):
+    if token.norm in _OPERAND_TOKENS:
+        counts.operands.add(token.text)
+        counts.total_operands += 1
+    elif token.norm not in _GROUPING_TOKENS:
+        counts.operators.add(token.norm)
+        counts.total_operators += 1
+
+
+def _report(file_counts: _Counts, loc: int, functions: list) -> dict:
+    """
+    Combine file-wide counts and per-function summaries into a report.
+
+    When there are functions, complexity is their mean and the
+    maintainability index their line-weighted mean; the raw file-wide
+    index bottoms out at 0 for any large file, which says nothing useful.
+    """
+    overall = _summary(file_counts, loc)
+    if functions:
+        complexity = sum(f['cyclomatic_complexity'] for f in functions) / len(functions)
+        max_complexity = max(f['cyclomatic_complexity'] for f in functions)
+        weights = sum(max(1, f['lines_of_code']) for f in functions)
+        maintainability = sum(
+            f['maintainability_index'] * max(1, f['lines_of_code']) for f in functions
+        ) / weights
+    else:
+        complexity = max_complexity = overall['cyclomatic_complexity']
+        maintainability = overall['maintainability_index']
+    return {
+        'cyclomatic_complexity': round(complexity, 1),
+        'max_cyclomatic_complexity': max_complexity,
+        'halstead_volume': overall['halstead_volume'],
+        'maintainability_index': round(maintainability, 1),
+        'functions': functions,
+        'function_counts': [],
+        'regions_reused': 0,
+    }
+
+
+def _summary(counts: _Counts, loc: int, **extra) -> dict:
+    complexity = counts.decisions + 1
+    volume = counts.volume()
+    summary = dict(extra)
+    summary.update({
+        'lines_of_code': loc,
+        'cyclomatic_complexity': complexity,
+        'halstead_volume': round(volume, 1),
+        'maintainability_index': maintainability_index(volume, complexity, loc),
+    })
+    return summary
+
+
+def _counted_line_prefix(code: str) -> list:
+    """prefix[i] = number of non-blank lines among the first i lines."""
+    prefix = [0]
+    for line in code.splitlines():
+        prefix.append(prefix[-1] + (1 if line.strip() else 0))
+    return prefix
@@ -0,0 +1,192 @@
+"""
+Password hashing off the request thread
+
+bcrypt is deliberately slow, and a class logging in at the start of a
+lab session would otherwise have every request thread hashing at once.
+Hashes and checks run on a small dedicated process pool instead. An
+operation is only accepted while the work queued ahead of it should
+finish within PASSWORD_HASH_TIMEOUT (judged from recent bcrypt times),
+so a burst beyond what the pool can serve gets fast 503s and login
+latency stays bounded rather than growing with the queue.
+
+The work factor is BCRYPT_LOG_ROUNDS. Stored hashes made with another
+cost are upgraded on the next successful login (see ``needs_rehash``).
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+
+# Samples kept per operation for the latency percentiles
+_SAMPLES = 1000
+
+# Weight of the newest sample in the running bcrypt time estimate
+_EWMA_WEIGHT = 0.2
+
+
+class HasherBusy(Exception):
+    """Raised when too many hash operations are already pending"""
+
+
+def _hash(password: bytes, rounds: int):
+    started = time.perf_counter()
+    hashed = bcrypt.hashpw(password, bcrypt.gensalt(rounds=rounds)).decode('utf-8')
+    return hashed, time.perf_counter() - started
+
+
+def _check(password: bytes, hashed: bytes):
+    started = time.perf_counter()
+    ok = bcrypt.checkpw(password, hashed)
+    return ok, time.perf_counter() - started
+
+
+class PasswordHasher:
+    """Bounded process pool for bcrypt plus latency statistics"""
+
+    def __init__(self, rounds=12, max_workers=None, max_pending=64, timeout=5):
+        self.rounds = rounds
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._pool = None
+        self._samples = {'hash': deque(maxlen=_SAMPLES), 'check': deque(maxlen=_SAMPLES)}
+        self._counts = {'hash': 0, 'check': 0}
+        self._rejected = 0
+        self._bcrypt_seconds = None
+
+    def init_app(self, app):
+        """Configure from Flask config and register on the app."""
+        self.rounds = app.config.get('BCRYPT_LOG_ROUNDS', 12)
+        self.max_workers = app.config.get('PASSWORD_HASH_WORKERS') or os.cpu_count() or 1
+        self.max_pending = app.config.get('PASSWORD_HASH_QUEUE_DEPTH', 64)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', 5)
+        app.extensions['password_hasher'] = self
+
+    def hash(self, password: str) -> str:
+        """bcrypt hash of a password at the configured cost."""
+        if not password:
+            raise ValueError('Password must be non-empty.')
+        return self._run('hash', _hash, password.encode('utf-8'), self.rounds)
+
+    def check(self, hashed: str, password: str) -> bool:
+        """Whether ``password`` matches the stored hash."""
+        if not hashed or not password:
+            return False
+        return self._run('check', _check, password.encode('utf-8'), hashed.encode('utf-8'))
+
+    def needs_rehash(self, hashed: str) -> bool:
+        """True when a stored hash was made with a different cost."""
+        try:
+            return int(hashed.split('$')[2]) != self.rounds
+        except (AttributeError, IndexError, ValueError):
+            return True
+
+    def estimated_wait(self) -> float:
+        """Seconds a new operation would take given the work already queued."""
+        if self._bcrypt_seconds is None:
+            return 0.0
+        return (self._pending + 1) * self._bcrypt_seconds / (self.max_workers or os.cpu_count() or 1)
+
+    def stats(self) -> dict:
+        """
+        Operation counts and latency percentiles in milliseconds.
+
+        p50/p99 run from submission to result, queueing included;
+        bcrypt_p50/bcrypt_p99 are the time spent in bcrypt alone. Both cover the most
+        recent operations only.
+        """
+        with self._lock:
+            result = {
+                'rounds': self.rounds,
+                'workers': self.max_workers,
+                'pending': self._pending,
+                'estimated_wait_ms': round(self.estimated_wait() * 1000, 1),
+                'rejected': self._rejected,
+            }
+            for operation, samples in self._samples.items():
+                result[operation] = dict(_summary(samples), count=self._counts[operation])
+        return result
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        # Outside the lock: finishing tasks run _done, which takes it
+        if pool is not None:
+            pool.shutdown(wait=wait, cancel_futures=not wait)
+
+    def _run(self, operation, function, *args):
+        """Run on the pool and wait, recording queue wait and hash time."""
+        submitted = time.perf_counter()
+        with self._lock:
+            if self._pending >= self.max_pending or self.estimated_wait() > self.timeout:
+                self._rejected += 1
+                raise HasherBusy(f'{self._pending} password operations pending')
+            self._pending += 1
+            try:
+                future = self._submit(function, args)
+            except Exception:
+                self._pending -= 1
+                raise
+        # A task that outlives the timeout still occupies a worker, so it
+        # stays pending until it finishes or is cancelled, not until we
+        # stop waiting for it. Added outside the lock: the callback runs
+        # at once if the future is already done.
+        future.add_done_callback(self._done)
+        try:
+            result, elapsed = future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            raise HasherBusy(f'password {operation} took longer than {self.timeout}s')
+        total = time.perf_counter() - submitted
+        with self._lock:
+            self._counts[operation] += 1
+            self._samples[operation].append((total, elapsed))
+            if self._bcrypt_seconds is None:
+                self._bcrypt_seconds = elapsed
+            else:
+                self._bcrypt_seconds += _EWMA_WEIGHT * (elapsed - self._bcrypt_seconds)
+        return result
+
+    def _done(self, future):
+        with self._lock:
+            self._pending -= 1
+
+    def _submit(self, function, args):
+        """Submit to the pool (caller holds the lock), replacing a broken pool once."""
+        try:
+            return self._executor().submit(function, *args)
+        except BrokenProcessPool:
+            self._pool = None
+            return self._executor().submit(function, *args)
+
+    def _executor(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._pool
+
+
+def _summary(samples):
+    if not samples:
+        return {}
+    totals = sorted(total for total, _ in samples)
+    hashing = sorted(elapsed for _, elapsed in samples)
+    return {
+        'p50_ms': round(_percentile(totals, 0.5) * 1000, 1),
+        'p99_ms': round(_percentile(totals, 0.99) * 1000, 1),
+        'bcrypt_p50_ms': round(_percentile(hashing, 0.5) * 1000, 1),
+        'bcrypt_p99_ms': round(_percentile(hashing, 0.99) * 1000, 1),
+    }
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,182 @@
+"""
+Per-request timing and sampling profiler
+
+Every request collects monotonic timings for the phases that usually
+dominate: JSON decoding, JWT verification, analysis stages, database
+queries (with a query count) and serialization. They are returned in a
+Server-Timing header, which browser dev tools show next to each request:
+
+    Server-Timing: db;dur=3.1;desc="4 queries", analyze_clones;dur=12.0, total;dur=20.4
+
+Code marks a phase with ``timed(name)``; outside a request (for example
+in analysis worker processes) it does nothing.
+
+With PROFILE_SAMPLE_RATE > 0 that fraction of requests also runs under
+cProfile, and those slower than PROFILE_SLOW_MS are dumped as pstats
+files to PROFILE_DIR, e.g. ``python -m pstats <file>``.
+"""
+
+import cProfile
+import os
+import random
+import time
+import uuid
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+
+class _Timings:
+    """Seconds and call count per phase"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+
+    def add(self, name, seconds):
+        total, count = self.phases.get(name, (0.0, 0))
+        self.phases[name] = (total + seconds, count + 1)
+
+
+def _current():
+    if not has_request_context():
+        return None
+    return g.get('_timings')
+
+
+@contextmanager
+def timed(name):
+    """Add the time spent in the block to the current request's ``name`` phase."""
+    timings = _current()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+class RequestProfiler:
+    """Flask hooks collecting timings and sampled profiles"""
+
+    def __init__(self):
+        self.server_timing = True
+        self.sample_rate = 0.0
+        self.slow_ms = 500
+        self.profile_dir = None
+        self.max_dumps = 200
+
+    def init_app(self, app):
+        """Configure from Flask config and register hooks on the app."""
+        self.server_timing = app.config.get('SERVER_TIMING', True)
+        self.sample_rate = app.config.get('PROFILE_SAMPLE_RATE', 0.0)
+        self.slow_ms = app.config.get('PROFILE_SLOW_MS', 500)
+        self.profile_dir = app.config.get('PROFILE_DIR') or os.path.join(app.instance_path, 'profiles')
+        self.max_dumps = app.config.get('PROFILE_MAX_DUMPS', 200)
+
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._teardown)
+
+        from app.models import db
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', _before_query)
+            event.listen(db.engine, 'after_cursor_execute', _after_query)
+
+        jwt = app.extensions.get('flask-jwt-extended')
+        if jwt is not None:
+            _time_jwt(jwt)
+        app.extensions['request_profiler'] = self
+
+    def _start(self):
+        g._timings = _Timings()
+        if self.sample_rate and random.random() < self.sample_rate:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:  # another profiler is active in this thread
+                return
+            g._profiler = profiler
+
+    def _finish(self, response):
+        timings = g.pop('_timings', None)
+        if timings is None:
+            return response
+        elapsed = time.perf_counter() - timings.started
+        profiler = g.pop('_profiler', None)
+        if profiler is not None:
+            profiler.disable()
+            if elapsed * 1000 >= self.slow_ms:
+                self._dump(profiler, elapsed)
+        if self.server_timing:
+            response.headers['Server-Timing'] = _header(timings, elapsed)
+        return response
+
+    def _teardown(self, exc):
+        # after_request is skipped for unhandled errors; never leave a profiler on
+        profiler = g.pop('_profiler', None)
+        if profiler is not None:
+            profiler.disable()
+
+    def _dump(self, profiler, elapsed):
+        try:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            if len(os.listdir(self.profile_dir)) >= self.max_dumps:
+                return
+            endpoint = (request.endpoint or 'unknown').replace('.', '-')
+            name = (f'{time.strftime("%Y%m%d-%H%M%S")}-{request.method}-{endpoint}'
+                    f'-{int(elapsed * 1000)}ms-{uuid.uuid4().hex[:6]}.prof')
+            profiler.dump_stats(os.path.join(self.profile_dir, name))
+        except OSError:
+            pass
+
+
+def _header(timings, elapsed):
+    parts = []
+    for name, (seconds, count) in timings.phases.items():
+        part = f'{name};dur={seconds * 1000:.1f}'
+        if name == 'db':
+            part += f';desc="{count} {"query" if count == 1 else "queries"}"'
+        parts.append(part)
+    parts.append(f'total;dur={elapsed * 1000:.1f}')
+    return ', '.join(parts)
+
+
+def _before_query(conn, cursor, statement, parameters, context, executemany):
+    if _current() is not None:
+        conn.info.setdefault('_query_started', []).append(time.perf_counter())
+
+
+def _after_query(conn, cursor, statement, parameters, context, executemany):
+    timings = _current()
+    started = conn.info.get('_query_started')
+    if timings is not None and started:
+        timings.add('db', time.perf_counter() - started.pop())
+
+
+def _time_jwt(jwt):
+    """Time signature and claim checks between two flask_jwt_extended callbacks."""
+    from flask_jwt_extended.default_callbacks import (
+        default_decode_key_callback,
+        default_token_verification_callback,
+    )
+
+    @jwt.decode_key_loader
+    def decode_key(jwt_header, jwt_data):
+        if _current() is not None:
+            g._jwt_started = time.perf_counter()
+        return default_decode_key_callback(jwt_header, jwt_data)
+
+    @jwt.token_verification_loader
+    def verify_token(jwt_header, jwt_data):
+        timings = _current()
+        started = g.pop('_jwt_started', None) if timings is not None else None
+        if started is not None:
+            timings.add('jwt', time.perf_counter() - started)
+        return default_token_verification_callback(jwt_header, jwt_data)
+
+
+request_profiler = RequestProfiler()
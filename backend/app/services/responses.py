@@ -0,0 +1,110 @@
+"""
+Compact JSON and compressed responses
+
+Analysis reports and rosters can run to hundreds of kilobytes, so JSON
+is encoded compactly (with orjson when it is installed) and responses
+above COMPRESS_MIN_BYTES are compressed with brotli or gzip, whichever
+the client accepts (brotli only when the brotli package is installed).
+Streamed responses are left alone so NDJSON batches still arrive line by
+line.
+"""
+
+import gzip
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+from app.services.profiling import timed
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class CompactJSONProvider(DefaultJSONProvider):
+    """Compact, unsorted JSON; orjson when available, the stdlib otherwise"""
+
+    compact = True
+    sort_keys = False
+
+    # Datetimes go through Flask's default (HTTP dates) so the output does
+    # not change with the encoder; non-string keys are allowed as json allows
+    _OPTIONS = (orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS) if orjson else 0
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=self._OPTIONS).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        with timed('json_decode'):
+            if orjson is None or kwargs:
+                return super().loads(s, **kwargs)
+            return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        with timed('serialize'):
+            if orjson is None:
+                return super().response(obj)
+            body = orjson.dumps(obj, default=self.default, option=self._OPTIONS)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+class ResponseCompressor:
+    """after_request hook compressing large responses"""
+
+    def __init__(self, min_bytes=1024, gzip_level=6, brotli_quality=4):
+        self.min_bytes = min_bytes
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def init_app(self, app):
+        """Configure from Flask config and register on the app."""
+        self.min_bytes = app.config.get('COMPRESS_MIN_BYTES', 1024)
+        self.gzip_level = app.config.get('COMPRESS_GZIP_LEVEL', 6)
+        self.brotli_quality = app.config.get('COMPRESS_BROTLI_QUALITY', 4)
+        app.after_request(self.compress)
+        app.extensions['compressor'] = self
+
+    def encoding_for(self, accept_encodings):
+        """'br', 'gzip' or None for an Accept-Encoding header."""
+        if brotli is not None and accept_encodings['br'] > 0:
+            return 'br'
+        if accept_encodings['gzip'] > 0:
+            return 'gzip'
+        return None
+
+    def compress(self, response):
+        if (response.direct_passthrough or response.is_streamed
+                or response.status_code < 200 or response.status_code in (204, 206, 304)
+                or 'Content-Encoding' in response.headers):
+            return response
+        response.vary.add('Accept-Encoding')
+        encoding = self.encoding_for(request.accept_encodings)
+        if encoding is None:
+            return response
+        data = response.get_data()
+        if len(data) < self.min_bytes:
+            return response
+        with timed('compress'):
+            if encoding == 'br':
+                data = brotli.compress(data, quality=self.brotli_quality)
+            else:
+                data = gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+        response.set_data(data)
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            # The bytes differ from the identity encoding
+            response.set_etag(etag, weak=True)
+        return response
+
+
+compressor = ResponseCompressor()
@@ -0,0 +1,146 @@
+"""
+Content-addressed cache for analysis results
+
+Results are keyed by a hash of the normalized code, the language and the
+analyzer version, so byte-identical (or whitespace-equivalent)
+resubmissions skip the analyzer entirely. Entries live in a size-bounded
+in-process LRU and, when ANALYSIS_CACHE_DB is configured, in a SQLite
+file shared by all workers that survives restarts.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from app.services.analyzer import ANALYZER_VERSION
+
+
+def normalize_code(code: str) -> str:
+    """Normalize line endings and trailing whitespace; line numbers are kept."""
+    lines = code.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    return '\n'.join(line.rstrip() for line in lines)
+
+
+def cache_key(code: str, language: str) -> str:
+    """Cache key for a submission under the current analyzer version."""
+    digest = hashlib.sha256()
+    digest.update(f'{ANALYZER_VERSION}\0{language}\0'.encode('utf-8'))
+    digest.update(normalize_code(code).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class AnalysisResultCache:
+    """Two-tier (memory LRU + optional SQLite) cache of serialized results"""
+
+    def __init__(self, max_entries=256, max_bytes=32 * 1024 * 1024, path=None, max_disk_entries=10000):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._conn = None
+        self.configure(max_entries, max_bytes, path, max_disk_entries)
+
+    def init_app(self, app):
+        """Configure from Flask config and register on the app."""
+        self.configure(
+            app.config.get('ANALYSIS_CACHE_SIZE', 256),
+            app.config.get('ANALYSIS_CACHE_MAX_BYTES', 32 * 1024 * 1024),
+            app.config.get('ANALYSIS_CACHE_DB'),
+            app.config.get('ANALYSIS_CACHE_DB_MAX_ENTRIES', 10000),
+        )
+        app.extensions['analysis_cache'] = self
+
+    def configure(self, max_entries, max_bytes, path=None, max_disk_entries=10000):
+        with self._lock:
+            self.max_entries = max_entries
+            self.max_bytes = max_bytes
+            self.max_disk_entries = max_disk_entries
+            self.path = path
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            if path:
+                self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+                self._conn.execute(
+                    'CREATE TABLE IF NOT EXISTS analysis_cache ('
+                    ' key TEXT PRIMARY KEY,'
+                    ' value TEXT NOT NULL,'
+                    ' accessed_at REAL NOT NULL)'
+                )
+                self._conn.execute(
+                    'CREATE INDEX IF NOT EXISTS ix_analysis_cache_accessed_at'
+                    ' ON analysis_cache (accessed_at)'
+                )
+                self._conn.commit()
+            self._evict()
+
+    def get(self, key: str):
+        """Return a fresh copy of the cached value, or None on a miss."""
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+            elif self._conn is not None:
+                row = self._conn.execute(
+                    'SELECT value FROM analysis_cache WHERE key = ?', (key,)
+                ).fetchone()
+                if row is not None:
+                    payload = row[0]
+                    self._conn.execute(
+                        'UPDATE analysis_cache SET accessed_at = ? WHERE key = ?',
+                        (time.time(), key)
+                    )
+                    self._conn.commit()
+                    self._remember(key, payload)
+        if payload is None:
+            return None
+        return json.loads(payload)
+
+    def put(self, key: str, value):
+        """Store a JSON-serializable value in both tiers."""
+        payload = json.dumps(value, separators=(',', ':'))
+        with self._lock:
+            self._remember(key, payload)
+            if self._conn is not None:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO analysis_cache (key, value, accessed_at) VALUES (?, ?, ?)',
+                    (key, payload, time.time())
+                )
+                self._conn.execute(
+                    'DELETE FROM analysis_cache WHERE key IN ('
+                    ' SELECT key FROM analysis_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+                    (self.max_disk_entries,)
+                )
+                self._conn.commit()
+
+    def clear(self):
+        """Drop every entry from both tiers."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            if self._conn is not None:
+                self._conn.execute('DELETE FROM analysis_cache')
+                self._conn.commit()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remember(self, key, payload):
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old)
+        if len(payload) > self.max_bytes:
+            return
+        self._entries[key] = payload
+        self._bytes += len(payload)
+        self._evict()
+
+    def _evict(self):
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, payload = self._entries.popitem(last=False)
+            self._bytes -= len(payload)
+
+
+result_cache = AnalysisResultCache()
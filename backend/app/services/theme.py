@@ -0,0 +1,93 @@
+"""
+Global UI theme kept in memory
+
+The theme is read on every page load, so it is served from memory as
+pre-serialized JSON with an ETag, and browsers revalidate instead of
+downloading it again. Writes go to a temporary file renamed over
+theme.json, so a reader never sees a half-written file. Other workers
+notice a change by the file's stat, checked at most every
+THEME_CHECK_INTERVAL seconds; the file itself is only read when it changed.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+DEFAULT_THEME = {'accentColor': '#6366f1'}
+
+
+class ThemeStore:
+    """theme.json cached as (body, etag)"""
+
+    def __init__(self, path=None, check_interval=5):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._reset()
+
+    def init_app(self, app):
+        """Configure from Flask config and register on the app."""
+        self.path = app.config['THEME_FILE']
+        self.check_interval = app.config.get('THEME_CHECK_INTERVAL', 5)
+        with self._lock:
+            self._reset()
+        app.extensions['theme'] = self
+
+    def get(self):
+        """(body bytes, etag) of the current theme."""
+        now = time.monotonic()
+        with self._lock:
+            if now >= self._next_check:
+                self._next_check = now + self.check_interval
+                signature = self._signature()
+                if signature != self._file_signature:
+                    self._load(signature)
+            return self._body, self._etag
+
+    def set(self, theme: dict):
+        """Replace the theme on disk and in memory; returns (body, etag)."""
+        with self._lock:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.theme-', suffix='.json')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(theme, f)
+                os.replace(temp_path, self.path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+            self._store(theme, self._signature())
+            self._next_check = time.monotonic() + self.check_interval
+            return self._body, self._etag
+
+    def _reset(self):
+        self._store(DEFAULT_THEME, None)
+        self._next_check = 0.0
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _load(self, signature):
+        theme = DEFAULT_THEME
+        if signature is not None:
+            try:
+                with open(self.path, 'r') as f:
+                    theme = json.load(f)
+            except (OSError, ValueError):
+                pass
+        self._store(theme, signature)
+
+    def _store(self, theme, signature):
+        self._body = json.dumps(theme, separators=(',', ':')).encode('utf-8')
+        self._etag = hashlib.sha256(self._body).hexdigest()[:16]
+        self._file_signature = signature
+
+
+theme_store = ThemeStore()
@@ -0,0 +1,118 @@
+"""
+Streaming upload helpers
+
+Multipart uploads are spooled to temporary files by Werkzeug in chunks,
+so a request body is never held in memory whole. This module reads
+those streams with explicit size limits and expands project archives
+(.zip, .tar.gz) one member at a time, yielding the text source files
+they contain. Nothing is extracted to disk; only member names are kept.
+"""
+
+import posixpath
+import tarfile
+import zipfile
+import zlib
+
+CHUNK_SIZE = 64 * 1024
+
+_ARCHIVE_SUFFIXES = (('.zip', 'zip'), ('.tar.gz', 'tar'), ('.tgz', 'tar'))
+
+
+class UploadTooLarge(Exception):
+    """An upload or archive exceeded a configured limit"""
+
+
+def archive_kind(filename: str):
+    """'zip' or 'tar' for archive names, None for anything else."""
+    lowered = (filename or '').lower()
+    for suffix, kind in _ARCHIVE_SUFFIXES:
+        if lowered.endswith(suffix):
+            return kind
+    return None
+
+
+def read_text(stream, max_bytes: int):
+    """
+    (text, reason) for a stream read in chunks of at most ``max_bytes``.
+
+    text is None when the stream is larger than the limit or is not
+    UTF-8 text; reason says which.
+    """
+    chunks = []
+    size = 0
+    while True:
+        chunk = stream.read(min(CHUNK_SIZE, max_bytes + 1 - size))
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > max_bytes:
+            return None, 'too large'
+        chunks.append(chunk)
+    data = b''.join(chunks)
+    if b'\0' in data:
+        return None, 'binary'
+    try:
+        return data.decode('utf-8'), None
+    except UnicodeDecodeError:
+        return None, 'binary'
+
+
+def expand_archive(fileobj, kind: str, max_file_bytes: int, max_files: int, max_total_bytes: int):
+    """
+    Yield (name, text, reason) for each file member of an archive.
+
+    Members are read one at a time with bounded reads, so a small archive
+    claiming huge members cannot exhaust memory. Directories and hidden
+    or metadata entries (dotfiles, __MACOSX) are not reported; members
+    that are too large or not text come back with text None and a
+    reason. Raises UploadTooLarge past ``max_files`` members or
+    ``max_total_bytes`` of extracted text, and ValueError for a corrupt
+    archive.
+    """
+    members = _iter_zip(fileobj) if kind == 'zip' else _iter_tar(fileobj)
+    count = 0
+    total = 0
+    for name, open_member in members:
+        if _ignored(name):
+            continue
+        count += 1
+        if count > max_files:
+            raise UploadTooLarge(f'Archive has more than {max_files} files')
+        try:
+            with open_member() as stream:
+                text, reason = read_text(stream, max_file_bytes)
+        except (tarfile.TarError, zipfile.BadZipFile, zlib.error, EOFError, OSError) as e:
+            raise ValueError(f'Corrupt archive member {name}: {e}')
+        if text is not None:
+            total += len(text)
+            if total > max_total_bytes:
+                raise UploadTooLarge(f'Archive expands to more than {max_total_bytes} bytes')
+        yield name, text, reason
+
+
+def _iter_zip(fileobj):
+    try:
+        archive = zipfile.ZipFile(fileobj)
+    except zipfile.BadZipFile as e:
+        raise ValueError(f'Invalid zip archive: {e}')
+    with archive:
+        for info in archive.infolist():
+            if not info.is_dir():
+                yield info.filename, lambda info=info: archive.open(info)
+
+
+def _iter_tar(fileobj):
+    # Stream mode: members are read in order without seeking, and a
+    # corrupt stream can fail at any member
+    try:
+        with tarfile.open(fileobj=fileobj, mode='r|gz') as archive:
+            for member in archive:
+                if member.isfile():
+                    yield member.name, lambda member=member: archive.extractfile(member)
+    except (tarfile.TarError, OSError, EOFError, zlib.error) as e:
+        raise ValueError(f'Invalid tar.gz archive: {e}')
+
+
+def _ignored(name: str) -> bool:
+    parts = posixpath.normpath(name.replace('\\', '/')).split('/')
+    return any(part.startswith('.') or part == '__MACOSX' for part in parts)
@@ -0,0 +1,89 @@
+"""
+Cached role lookups for access checks
+
+Admin and instructor endpoints only need the caller's role, so instead
+of loading the user on every request the role is kept in a small
+in-process LRU for USER_ROLE_CACHE_TTL seconds. Changing a role or
+deleting a user invalidates the entry in the worker that made the
+change; other workers pick it up when their entry expires.
+
+Roles are deliberately not trusted from the JWT: tokens live for days
+and cannot be revoked, so a demoted admin would keep their rights.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import jsonify
+from flask_jwt_extended import get_jwt_identity
+
+from app.models import db, User
+
+
+class RoleCache:
+    """user id -> role (None for deleted users), with a TTL"""
+
+    def __init__(self, max_entries=10000, ttl=30):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Configure from Flask config and register on the app."""
+        self.max_entries = app.config.get('USER_ROLE_CACHE_SIZE', 10000)
+        self.ttl = app.config.get('USER_ROLE_CACHE_TTL', 30)
+        self.clear()
+        app.extensions['user_roles'] = self
+
+    def get(self, user_id):
+        """Role of a user, loading it when missing or expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(user_id)
+                return entry[0]
+        role = db.session.query(User.role).filter_by(id=user_id).scalar()
+        if self.ttl > 0:
+            with self._lock:
+                self._entries[user_id] = (role, now + self.ttl)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return role
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+role_cache = RoleCache()
+
+
+def role_required(*roles):
+    """
+    Reject callers whose role is not one of ``roles`` with a 403.
+
+    Goes below @jwt_required(), e.g. @role_required('instructor', 'admin').
+    """
+    message = f"{' or '.join(roles).capitalize()} access required"
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                role = role_cache.get(get_jwt_identity())
+            except Exception as e:
+                return jsonify({'error': str(e)}), 500
+            if role not in roles:
+                return jsonify({'error': message}), 403
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
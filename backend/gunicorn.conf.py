@@ -0,0 +1,66 @@
+"""
+Gunicorn settings for serving the API in production
+
+    gunicorn -c gunicorn.conf.py run:app
+    python run.py serve
+
+Every setting can be overridden from the environment (or .env). The app
+is imported once in the master and workers fork from it, so imports
+happen once instead of per worker. Starting the server does no schema
+work: run ``flask --app run db-upgrade`` before it on each deploy.
+"""
+
+import multiprocessing
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _int(name, default):
+    return int(os.getenv(name, default))
+
+
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', '5000')}")
+
+# One process per core for the CPU-bound analyzer, a few threads each so
+# requests waiting on the database or the client do not hold a core
+workers = _int('WEB_CONCURRENCY', multiprocessing.cpu_count())
+threads = _int('GUNICORN_THREADS', 4)
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Every worker also starts an analysis pool and a password hashing pool.
+# Unless ANALYSIS_WORKERS / PASSWORD_HASH_WORKERS are set, create_app sizes
+# each at cores // WEB_CONCURRENCY (at least 1), so across all workers
+# there is about one analysis and one hashing process per core rather
+# than per core per worker. Exporting the worker count lets the
+# preloaded app see it.
+os.environ.setdefault('WEB_CONCURRENCY', str(workers))
+
+# Analyses of large submissions can take a while; keep-alive lets the
+# frontend reuse connections between its calls
+timeout = _int('GUNICORN_TIMEOUT', 120)
+graceful_timeout = _int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+keepalive = _int('GUNICORN_KEEPALIVE', 5)
+
+# Recycle workers now and then so slow leaks cannot accumulate
+max_requests = _int('GUNICORN_MAX_REQUESTS', 2000)
+max_requests_jitter = _int('GUNICORN_MAX_REQUESTS_JITTER', 200)
+
+preload_app = True
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_fork(server, worker):
+    """Give each worker its own connections instead of the master's."""
+    from app.models import db
+    from app.services.result_cache import result_cache
+
+    app = server.app.wsgi()  # the preloaded app, not a fresh import
+    with app.app_context():
+        db.engine.dispose(close=False)
+    result_cache.init_app(app)
@@ -4,16 +4,52 @@ Main entry point for the Code Clone Detector API
 Run this file to start the Flask development server:
     python run.py
 
+or the production server (gunicorn, settings in gunicorn.conf.py),
+after creating or upgrading the database schema:
+    flask --app run db-upgrade
+    python run.py serve
+
 The API will be available at:
     http://localhost:5000
 """
 
+import os
+import sys
+
 from app import create_app
 
 # Create Flask application
 app = create_app()
 
+
+def serve():
+    """Run the app under gunicorn with the settings in gunicorn.conf.py."""
+    from gunicorn.app.base import Application
+
+    class ProductionServer(Application):
+        def load_config(self):
+            self.load_config_from_file(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.conf.py'))
+
+        def init(self, parser, opts, args):
+            pass
+
+        def load(self):
+            return app
+
+    ProductionServer().run()
+
+
 if __name__ == '__main__':
+    if sys.argv[1:] == ['serve']:
+        serve()
+        sys.exit(0)
+
+    # The development server keeps a local database current on its own
+    from app.models.migrations import upgrade
+    with app.app_context():
+        upgrade()
+    print("✅ Database initialized")
+
     print("=" * 50)
     print("🚀 Code Clone Detector API Starting...")
     print("=" * 50)
@@ -21,9 +57,9 @@ if __name__ == '__main__':
     print("📍 Health Check: http://localhost:5000/api/v1/health")
     print("📍 API Docs: See API_SPEC.md")
     print("=" * 50)
-    
+
     app.run(
         host='0.0.0.0',  # Accept connections from any IP (needed for Docker later)
         port=5000,
-        debug=True  # Auto-reload when code changes
-    )
\ No newline at end of file
+        debug=os.getenv('FLASK_DEBUG', '1') != '0'  # Auto-reload when code changes
+    )
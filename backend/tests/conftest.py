@@ -1,6 +1,8 @@
 import os
 import sys
 
+import pytest
+
 HERE = os.path.dirname(__file__)
 # backend/ (so backend/app can be imported as top-level 'app')
 BACKEND_DIR = os.path.abspath(os.path.join(HERE, ".."))
@@ -10,4 +12,38 @@ REPO_ROOT = os.path.abspath(os.path.join(HERE, "..", ".."))
 # Insert backend first (so `import app` resolves to backend/app), then repo root
 for path in (BACKEND_DIR, REPO_ROOT):
     if path not in sys.path:
-        sys.path.insert(0, path)
\ No newline at end of file
+        sys.path.insert(0, path)
+
+# Cheapest bcrypt cost: tests register many users and do not need slow hashes
+os.environ.setdefault('BCRYPT_LOG_ROUNDS', '4')
+
+from app import create_app  # noqa: E402
+from app.models import db  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def test_database(monkeypatch):
+    """Point every create_app() at an in-memory database.
+
+    The URL must be set before create_app() builds the engine, or the
+    app binds to the development database file. Tests that need a
+    database file set DATABASE_URL again themselves.
+    """
+    monkeypatch.setenv('DATABASE_URL', 'sqlite://')
+
+
+@pytest.fixture
+def app():
+    """Create a test Flask application."""
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """Create a test client."""
+    return app.test_client()
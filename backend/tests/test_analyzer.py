@@ -6,10 +6,12 @@ Tests cover:
 - Basic analysis flow
 - Error handling
 - Syntax validation
+- Parse-once analysis pipeline
+- Deeply nested code
 """
 
 import pytest
-from app.services.analyzer import CodeAnalyzer, validate_syntax
+from app.services.analyzer import AnalysisPipeline, CodeAnalyzer, validate_syntax
 
 
 class TestCodeAnalyzerInitialization:
@@ -93,10 +95,17 @@ class TestSyntaxValidation:
         with pytest.raises(SyntaxError):
             validate_syntax(code, 'python')
     
-    def test_java_syntax_stub(self):
-        """Java validation is stub (always returns True for now)"""
-        code = "public class Test { invalid syntax }"
-        assert validate_syntax(code, 'java') is True  # Stub returns True
+    def test_valid_java_syntax(self):
+        """Should accept valid Java code"""
+        code = "public class Test {\n    int f(int x) { return x > 0 ? x : -x; }\n}"
+        assert validate_syntax(code, 'java') is True
+
+    def test_invalid_java_syntax(self):
+        """Should reject invalid Java syntax with the offending line"""
+        code = "public class Test {\n    invalid syntax\n}"
+        with pytest.raises(SyntaxError) as excinfo:
+            validate_syntax(code, 'java')
+        assert excinfo.value.lineno == 3
 
 
 class TestCloneDetection:
@@ -144,4 +153,92 @@ class TestMetricsCalculation:
         analyzer = CodeAnalyzer('python')
         result = analyzer.analyze("print(1)")
         
-        assert 0 <= result['maintainability_index'] <= 100
\ No newline at end of file
+        assert 0 <= result['maintainability_index'] <= 100
+
+class TestAnalysisPipeline:
+    """Test that stages share one parse and one token stream"""
+
+    def test_python_is_parsed_once(self, monkeypatch):
+        """Validation, metrics and the report reuse the same tree"""
+        from app.services import analyzer as analyzer_module
+        calls = []
+        real_parse = analyzer_module.parse_python
+
+        def counting_parse(code):
+            calls.append(code)
+            return real_parse(code)
+
+        monkeypatch.setattr(analyzer_module, 'parse_python', counting_parse)
+        analyzer = CodeAnalyzer('python')
+        code = "def f(x):\n    if x:\n        return 1\n    return 2\n"
+        assert analyzer.validate(code)
+        analyzer.analyze(code)
+        analyzer.analyze(code)
+        assert len(calls) == 1
+
+    def test_tokens_are_shared(self):
+        """Fingerprints and clone detection use the same token list"""
+        pipeline = AnalysisPipeline("public class A { int f() { return 1; } }", 'java')
+        assert pipeline.clone_detection['fingerprints'] is pipeline.fingerprints
+        assert pipeline.tree.methods[0].name == 'A.f'
+
+    def test_invalid_python_reports_syntax_error(self):
+        """Unparsable Python is still analyzed from tokens"""
+        result = CodeAnalyzer('python').analyze("def broken(:\n    pass\n")
+        assert result['syntax_error']['line'] == 1
+        assert result['cyclomatic_complexity'] >= 1
+
+    def test_java_gets_per_method_metrics(self):
+        """Parsed Java reports metrics for each method"""
+        code = "class A {\n    int f(int x) {\n        if (x > 0) return 1;\n        return 0;\n    }\n}\n"
+        result = CodeAnalyzer('java').analyze(code)
+        assert result['syntax_error'] is None
+        assert result['function_metrics'][0]['name'] == 'A.f'
+        assert result['function_metrics'][0]['cyclomatic_complexity'] == 2
+
+    def test_validate_raises_on_invalid_python(self):
+        """validate surfaces the stored SyntaxError"""
+        with pytest.raises(SyntaxError):
+            CodeAnalyzer('python').validate("def broken(:")
+
+    def test_long_java_else_if_chain_parses(self):
+        """Each 'else if' adds a decision without adding a stack frame"""
+        branches = ''.join(f' else if (x == {i}) {{ return {i}; }}' for i in range(2000))
+        code = f"class A {{\n    int f(int x) {{\n        if (x < 0) {{ return -1; }}{branches}\n        return 0;\n    }}\n}}\n"
+        result = CodeAnalyzer('java').analyze(code)
+        assert result['syntax_error'] is None
+        assert result['function_metrics'][0]['cyclomatic_complexity'] == 2002
+
+    def test_deeply_nested_java_blocks_parse(self):
+        """Bare blocks nest without recursion"""
+        code = "class A {\n    void f() {\n" + '{' * 2000 + '}' * 2000 + "\n    }\n}\n"
+        assert CodeAnalyzer('java').analyze(code)['syntax_error'] is None
+
+    def test_java_nesting_past_the_stack_is_a_syntax_error(self):
+        """Runaway expression nesting is reported, not raised"""
+        code = "class A {\n    int f() {\n        return " + '(' * 5000 + '1' + ')' * 5000 + ";\n    }\n}\n"
+        result = CodeAnalyzer('java').analyze(code)
+        assert result['syntax_error'] == {'message': 'too deeply nested', 'line': 3}
+
+
+class TestDeepNesting:
+    """Test that code nested past the parsers' limits is rejected cleanly"""
+
+    PYTHON = "x = " + "+".join(["a"] * 20000) + "\n"
+    JAVA = "class A {\n    int f() {\n        return " + "(" * 5000 + "1" + ")" * 5000 + ";\n    }\n}\n"
+
+    def test_python_is_analyzed_from_tokens(self):
+        """ast.parse's RecursionError becomes a syntax_error"""
+        result = CodeAnalyzer('python').analyze(self.PYTHON)
+        assert result['syntax_error'] == {'message': 'too deeply nested', 'line': 1}
+        assert result['cyclomatic_complexity'] >= 1
+
+    def test_python_validation_raises_syntax_error(self):
+        """validate_syntax raises SyntaxError, not RecursionError"""
+        with pytest.raises(SyntaxError, match='too deeply nested'):
+            validate_syntax(self.PYTHON, 'python')
+
+    def test_java_validation_raises_syntax_error(self):
+        """The Java parser reports its recursion limit the same way"""
+        with pytest.raises(SyntaxError, match='too deeply nested'):
+            validate_syntax(self.JAVA, 'java')
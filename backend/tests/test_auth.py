@@ -6,29 +6,17 @@ Tests cover:
 - User login
 - Protected endpoints
 - Input validation
+- Stored analysis reports
+- User listings
+- Section rosters
+- Keyset pagination
+- Listing projections
+- Cached role checks
 """
 
-import pytest
-from app import create_app
-from app.models import db, User
-
-
-@pytest.fixture
-def app():
-    """Create a test Flask application."""
-    app = create_app()
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'  # in-memory
-    with app.app_context():
-        db.create_all()
-        yield app
-        db.drop_all()
-
+import re
 
-@pytest.fixture
-def client(app):
-    """Create a test client."""
-    return app.test_client()
+from app.models import db, User
 
 
 class TestRegistration:
@@ -149,4 +137,312 @@ class TestProtectedEndpoints:
     def test_me_without_token(self, client):
         """Should reject request without token"""
         response = client.get('/api/v1/auth/me')
-        assert response.status_code == 401
\ No newline at end of file
+        assert response.status_code == 401
+
+class TestAnalysisDetail:
+    """Test reopening a stored analysis"""
+
+    BODY = ("    total = 0\n    for item in items:\n        if item > limit:\n"
+            "            total += item * 2\n        else:\n            total -= item\n    return total\n")
+    CODE = "def f(items, limit):\n" + BODY + "\ndef g(items, limit):\n" + BODY
+
+    def test_detail_returns_stored_report(self, client, monkeypatch):
+        """Clones and suggestions come from the row, not a new analysis"""
+        token = client.post('/api/v1/auth/register', json={
+            'username': 'detailuser', 'email': 'detail@example.com', 'password': 'password123'
+        }).get_json()['access_token']
+        headers = {'Authorization': f'Bearer {token}'}
+        analyzed = client.post('/api/v1/analyze', headers=headers,
+                               json={'code': self.CODE, 'language': 'python'}).get_json()
+        assert analyzed['clones']
+
+        from app.services import analyzer
+        monkeypatch.setattr(analyzer.AnalysisPipeline, 'report', None)
+        response = client.get(f"/api/v1/auth/history/{analyzed['analysis_id']}", headers=headers)
+        assert response.status_code == 200
+        detail = response.get_json()['analysis']
+        assert detail['clones'] == analyzed['clones']
+        assert detail['refactoring_suggestions'] == analyzed['refactoring_suggestions']
+
+    def test_report_is_stored_compressed(self, app, client):
+        """The clone list is written as compressed bytes"""
+        token = client.post('/api/v1/auth/register', json={
+            'username': 'blobuser', 'email': 'blob@example.com', 'password': 'password123'
+        }).get_json()['access_token']
+        client.post('/api/v1/analyze', headers={'Authorization': f'Bearer {token}'},
+                    json={'code': self.CODE, 'language': 'python'})
+        raw = db.session.execute(db.text('SELECT clones_json FROM analyses')).scalar()
+        assert isinstance(raw, bytes)
+        assert raw[:1] == b'\x78'  # zlib header
+
+
+class TestUserListings:
+    """Test the user listing endpoints"""
+
+    def _instructor(self, client):
+        return {'Authorization': 'Bearer ' + client.post('/api/v1/auth/register', json={
+            'username': 'aaa_instructor', 'email': 'inst@example.com', 'password': 'password123'
+        }).get_json()['access_token']}
+
+    def _add_users(self, count):
+        for i in range(count):
+            db.session.add(User(username=f'user{i:02d}', email=f'u{i}@example.com',
+                                password_hash='x', role='student'))
+        db.session.commit()
+
+    def test_counts_do_not_query_per_user(self, app, client):
+        """Listing many users runs a constant number of queries"""
+        from sqlalchemy import event
+        headers = self._instructor(client)
+        self._add_users(30)
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            response = client.get('/api/v1/auth/registered-users', headers=headers)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        assert len(response.get_json()['users']) == 31
+        # the current user plus the listing itself
+        assert len(statements) == 2
+
+    def test_analysis_counts_are_reported(self, client):
+        """total_analyses matches each user's analyses"""
+        headers = self._instructor(client)
+        client.post('/api/v1/analyze', headers=headers, json={'code': 'x = 1', 'language': 'python'})
+        users = client.get('/api/v1/auth/registered-users', headers=headers).get_json()['users']
+        assert users[0]['total_analyses'] == 1
+
+    def test_cursor_pages_through_students(self, client):
+        """after=next_cursor continues where the previous page ended"""
+        headers = self._instructor(client)
+        self._add_users(5)
+        first = client.get('/api/v1/auth/registered-students?limit=3', headers=headers).get_json()
+        assert [u['username'] for u in first['users']] == ['user00', 'user01', 'user02']
+        second = client.get(f"/api/v1/auth/registered-students?limit=3&after={first['next_cursor']}",
+                            headers=headers).get_json()
+        assert [u['username'] for u in second['users']] == ['user03', 'user04']
+        assert second['next_cursor'] is None
+
+
+class TestSectionRosters:
+    """Test section listing with rosters"""
+
+    def _setup(self, client, sections=3, students=4):
+        headers = {'Authorization': 'Bearer ' + client.post('/api/v1/auth/register', json={
+            'username': 'rosteruser', 'email': 'roster@example.com', 'password': 'password123'
+        }).get_json()['access_token']}
+        for i in range(sections):
+            section_id = client.post('/api/v1/auth/sections', headers=headers,
+                                     json={'name': f'Section {i}'}).get_json()['section']['id']
+            for j in range(students):
+                client.post(f'/api/v1/auth/sections/{section_id}/students', headers=headers,
+                            json={'name': f'Student {i}-{j}', 'email': f's{i}{j}@example.com'})
+        return headers
+
+    def test_rosters_load_in_one_query(self, app, client):
+        """Listing sections does not query once per section"""
+        from sqlalchemy import event
+        headers = self._setup(client)
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            sections = client.get('/api/v1/auth/sections', headers=headers).get_json()['sections']
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        assert [len(s['students']) for s in sections] == [4, 4, 4]
+        assert len(statements) == 2
+
+    def test_roster_limit_and_projection(self, client):
+        """roster_limit truncates rosters and fields projects students"""
+        headers = self._setup(client)
+        sections = client.get('/api/v1/auth/sections?roster_limit=2&fields=id,name',
+                              headers=headers).get_json()['sections']
+        assert sections[0]['student_count'] == 4
+        assert [s['name'] for s in sections[0]['students']] == ['Student 0-0', 'Student 0-1']
+        assert set(sections[0]['students'][0]) == {'id', 'name'}
+
+        rest = client.get(f"/api/v1/auth/sections/{sections[0]['id']}/students"
+                          f"?after={sections[0]['students_next_cursor']}", headers=headers).get_json()
+        assert [s['name'] for s in rest['students']] == ['Student 0-2', 'Student 0-3']
+        assert rest['next_cursor'] is None
+
+    def test_zero_roster_limit_still_signals_truncation(self, client):
+        """roster_limit=0 gives an empty cursor, not None, for non-empty sections"""
+        headers = self._setup(client, sections=1, students=2)
+        client.post('/api/v1/auth/sections', headers=headers, json={'name': 'Empty'})
+        sections = client.get('/api/v1/auth/sections?roster_limit=0',
+                              headers=headers).get_json()['sections']
+        assert [(s['student_count'], s['students'], s['students_next_cursor']) for s in sections] == [
+            (2, [], ''), (0, [], None)]
+
+        rest = client.get(f"/api/v1/auth/sections/{sections[0]['id']}/students"
+                          f"?after={sections[0]['students_next_cursor']}", headers=headers).get_json()
+        assert len(rest['students']) == 2
+
+    def test_unknown_field_is_rejected(self, client):
+        """fields must name student fields"""
+        headers = self._setup(client, sections=1, students=1)
+        response = client.get('/api/v1/auth/sections?fields=password', headers=headers)
+        assert response.status_code == 400
+
+
+class TestKeysetPagination:
+    """Test cursor pagination of history, activity and files"""
+
+    def _login(self, client):
+        response = client.post('/api/v1/auth/register', json={
+            'username': 'pageuser', 'email': 'page@example.com', 'password': 'password123'
+        }).get_json()
+        return response['user']['id'], {'Authorization': f"Bearer {response['access_token']}"}
+
+    def test_activity_pages_cover_every_entry_once(self, client):
+        """Entries sharing a timestamp are split across pages by id"""
+        from datetime import datetime
+        from app.models import HistoryEntry
+        user_id, headers = self._login(client)
+        stamp = datetime(2025, 1, 1)
+        for i in range(7):
+            db.session.add(HistoryEntry(user_id=user_id, entry_type='upload',
+                                        description=f'entry {i}', created_at=stamp))
+        db.session.commit()
+
+        seen, cursor = [], None
+        while True:
+            url = '/api/v1/auth/activity?limit=3' + (f'&cursor={cursor}' if cursor else '')
+            page = client.get(url, headers=headers).get_json()
+            seen += [e['description'] for e in page['history']]
+            cursor = page['next_cursor']
+            if not cursor:
+                break
+        assert sorted(seen) == [f'entry {i}' for i in range(7)]
+
+    def test_history_counts_total_on_first_page_only(self, client):
+        """Cursor pages skip the COUNT query"""
+        _, headers = self._login(client)
+        for i in range(3):
+            client.post('/api/v1/analyze', headers=headers, json={'code': f'x = {i}', 'language': 'python'})
+        first = client.get('/api/v1/auth/history?limit=2', headers=headers).get_json()
+        assert first['total'] == 3
+        second = client.get(f"/api/v1/auth/history?limit=2&cursor={first['next_cursor']}",
+                            headers=headers).get_json()
+        assert 'total' not in second
+        assert len(second['analyses']) == 1
+        assert second['next_cursor'] is None
+
+    def test_history_reports_effective_limit(self, client):
+        """The limit echoed back is the clamped page size"""
+        from app.api.auth import MAX_FEED_PAGE
+        _, headers = self._login(client)
+        page = client.get('/api/v1/auth/history?limit=100000', headers=headers).get_json()
+        assert page['limit'] == MAX_FEED_PAGE
+
+    def test_rows_without_timestamp_do_not_break_pages(self, client):
+        """Legacy rows with a NULL created_at are left out of paged listings"""
+        from datetime import datetime
+        from app.models import HistoryEntry
+        user_id, headers = self._login(client)
+        for i in range(2):
+            db.session.add(HistoryEntry(user_id=user_id, entry_type='upload', description=f'legacy {i}'))
+        for i in range(3):
+            db.session.add(HistoryEntry(user_id=user_id, entry_type='upload',
+                                        description=f'entry {i}', created_at=datetime(2025, 1, 1 + i)))
+        db.session.commit()
+        HistoryEntry.query.filter(HistoryEntry.description.startswith('legacy')).update({'created_at': None})
+        db.session.commit()
+        # A NULL row ending a full page used to break the cursor
+        response = client.get('/api/v1/auth/activity?limit=4', headers=headers)
+        assert response.status_code == 200
+        page = response.get_json()
+        assert [e['description'] for e in page['history']] == ['entry 2', 'entry 1', 'entry 0']
+        assert page['next_cursor'] is None
+
+    def test_invalid_cursor_is_400(self, client):
+        """Malformed cursors are rejected"""
+        _, headers = self._login(client)
+        assert client.get('/api/v1/auth/files?cursor=%%%', headers=headers).status_code == 400
+
+
+class TestListingProjections:
+    """Test that listings leave code and file content in the database"""
+
+    def test_listings_do_not_select_blobs(self, app, client):
+        """Only detail endpoints read code, content and stored results"""
+        from sqlalchemy import event
+        headers = {'Authorization': 'Bearer ' + client.post('/api/v1/auth/register', json={
+            'username': 'blobless', 'email': 'blobless@example.com', 'password': 'password123'
+        }).get_json()['access_token']}
+        client.post('/api/v1/analyze', headers=headers, json={'code': 'x = 1', 'language': 'python'})
+        file_id = client.post('/api/v1/auth/files', headers=headers,
+                              json={'name': 'a.py', 'content': 'y = 2'}).get_json()['file']['id']
+
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            client.get('/api/v1/auth/history', headers=headers)
+            client.get('/api/v1/auth/files', headers=headers)
+            listed = list(statements)
+            detail = client.get(f'/api/v1/auth/files/{file_id}', headers=headers).get_json()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        for column in (r'analyses\.code\b(?!_)', 'clones_json', 'suggestions_json',
+                       r'uploaded_files\.content\b(?!_)', 'blobs'):
+            assert not any(re.search(column, sql) for sql in listed)
+        assert detail['file']['content'] == 'y = 2'
+
+
+class TestRoleChecks:
+    """Test cached role lookups on admin and instructor endpoints"""
+
+    def _register(self, client, name):
+        response = client.post('/api/v1/auth/register', json={
+            'username': name, 'email': f'{name}@example.com', 'password': 'password123'
+        })
+        return {'Authorization': 'Bearer ' + response.get_json()['access_token']}
+
+    def _admin(self, client):
+        headers = self._register(client, 'roleadmin')
+        User.query.filter_by(username='roleadmin').update({'role': 'admin'})
+        db.session.commit()
+        return headers
+
+    def test_role_is_looked_up_once(self, app, client):
+        """Repeated calls reuse the cached role"""
+        from sqlalchemy import event
+        headers = self._admin(client)
+        client.get('/api/v1/auth/admin/users', headers=headers)
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            response = client.get('/api/v1/auth/admin/users', headers=headers)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        assert response.status_code == 200
+        assert len(statements) == 1
+
+    def test_role_change_takes_effect_at_once(self, client):
+        """Demoting a user invalidates their cached role"""
+        admin = self._admin(client)
+        instructor = self._register(client, 'demoted')
+        assert client.get('/api/v1/auth/registered-users', headers=instructor).status_code == 200
+        user_id = User.query.filter_by(username='demoted').one().id
+        client.put(f'/api/v1/auth/admin/users/{user_id}/role', headers=admin, json={'role': 'student'})
+        response = client.get('/api/v1/auth/registered-users', headers=instructor)
+        assert response.status_code == 403
+        assert response.get_json()['error'] == 'Instructor or admin access required'
+
+    def test_deleted_user_loses_access(self, client):
+        """A deleted admin's token no longer passes the check"""
+        admin = self._admin(client)
+        other = self._register(client, 'otheradmin')
+        User.query.filter_by(username='otheradmin').update({'role': 'admin'})
+        db.session.commit()
+        assert client.get('/api/v1/auth/admin/users', headers=other).status_code == 200
+        user_id = User.query.filter_by(username='otheradmin').one().id
+        assert client.delete(f'/api/v1/auth/admin/users/{user_id}', headers=admin).status_code == 200
+        response = client.get('/api/v1/auth/admin/users', headers=other)
+        assert response.status_code == 403
+        assert response.get_json()['error'] == 'Admin access required'
@@ -0,0 +1,154 @@
+"""
+Tests for the content-addressed blob store
+
+Tests cover:
+- Deduplication and reference counting
+- Concurrent first stores of the same text
+- Uploads and analyses referring to blobs
+- Exact duplicates reusing clone index fingerprints
+- Upgrading databases created before blobs
+"""
+
+import sqlite3
+import threading
+
+from app import create_app
+from app.models import db, Blob
+from app.services import blob_store
+
+
+def _login(client, name='blobowner'):
+    token = client.post('/api/v1/auth/register', json={
+        'username': name, 'email': f'{name}@example.com', 'password': 'password123'
+    }).get_json()['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+STARTER = "def main():\n    for i in range(10):\n        print(i * i)\n    return 0\n"
+
+
+class TestBlobStore:
+    """Test storing and releasing blobs"""
+
+    def test_identical_text_is_stored_once(self, app):
+        """References to the same text share one compressed row"""
+        pairs = blob_store.put_many([STARTER, STARTER, 'other'])
+        db.session.commit()
+        assert pairs[0][0] == pairs[1][0] == blob_store.content_hash(STARTER)
+        assert blob_store.put(STARTER) == (pairs[0][0], False)
+        db.session.commit()
+        blob = db.session.get(Blob, pairs[0][0])
+        assert blob.refcount == 3
+        assert blob.text == STARTER
+        assert Blob.query.count() == 2
+
+    def test_last_release_deletes_blob(self, app):
+        """A blob goes away with its last reference"""
+        h, _ = blob_store.put(STARTER)
+        blob_store.put(STARTER)
+        db.session.commit()
+        blob_store.release([h])
+        db.session.commit()
+        assert db.session.get(Blob, h) is not None
+        blob_store.release([h, None])
+        db.session.commit()
+        assert Blob.query.filter_by(hash=h).first() is None
+
+    def test_concurrent_first_stores(self, tmp_path, monkeypatch):
+        """Requests storing the same new text at once all succeed and count"""
+        monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "race.db"}')
+        app = create_app()
+        with app.app_context():
+            db.create_all()
+        workers = 16
+        barrier = threading.Barrier(workers)
+        errors = []
+
+        def store():
+            with app.app_context():
+                try:
+                    barrier.wait()
+                    blob_store.put_many([STARTER])
+                    db.session.commit()
+                except Exception as e:
+                    errors.append(e)
+
+        threads = [threading.Thread(target=store) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+        with app.app_context():
+            assert db.session.get(Blob, blob_store.content_hash(STARTER)).refcount == workers
+            db.engine.dispose()
+
+
+class TestBlobReferences:
+    """Test rows that refer to blobs"""
+
+    def test_uploads_share_content(self, client):
+        """Two uploads of the same starter file store it once"""
+        logins = [_login(client, f'student{i}') for i in range(2)]
+        ids = [
+            client.post('/api/v1/auth/files', headers=headers,
+                        json={'name': 'main.py', 'content': STARTER}).get_json()['file']['id']
+            for headers in logins
+        ]
+        assert Blob.query.count() == 1
+        assert Blob.query.one().refcount == 2
+        detail = client.get(f'/api/v1/auth/files/{ids[1]}', headers=logins[1])
+        assert detail.get_json()['file']['content'] == STARTER
+
+    def test_duplicate_upload_copies_fingerprints(self, client, monkeypatch):
+        """An exact duplicate is indexed without tokenizing it again"""
+        from app.models import CloneFingerprint
+        from app.services import clone_index
+        client.post('/api/v1/auth/files', headers=_login(client, 'first'),
+                    json={'name': 'main.py', 'content': STARTER})
+
+        def fail(*args):
+            raise AssertionError('duplicate content was fingerprinted again')
+
+        monkeypatch.setattr(clone_index, 'fingerprint_hashes', fail)
+        file_id = client.post('/api/v1/auth/files', headers=_login(client, 'second'),
+                              json={'name': 'main.py', 'content': STARTER}).get_json()['file']['id']
+        assert CloneFingerprint.query.filter_by(source_id=file_id).count() > 0
+
+    def test_deleting_file_releases_blob(self, client):
+        """The blob is removed with the only file using it"""
+        headers = _login(client)
+        file_id = client.post('/api/v1/auth/files', headers=headers,
+                              json={'name': 'main.py', 'content': STARTER}).get_json()['file']['id']
+        client.delete(f'/api/v1/auth/files/{file_id}', headers=headers)
+        assert Blob.query.count() == 0
+
+    def test_analysis_code_comes_from_blob(self, client):
+        """Saved analyses keep their code in a blob"""
+        headers = _login(client)
+        analysis_id = client.post('/api/v1/analyze', headers=headers,
+                                  json={'code': STARTER, 'language': 'python'}).get_json()['analysis_id']
+        detail = client.get(f'/api/v1/auth/history/{analysis_id}', headers=headers).get_json()
+        assert detail['analysis']['code'] == STARTER
+        assert Blob.query.one().refcount == 1
+
+
+class TestSchemaUpgrade:
+    """Test that older databases gain the blob columns"""
+
+    def test_missing_columns_are_added(self, tmp_path, monkeypatch):
+        """The schema upgrade adds new columns to tables that already exist"""
+        path = tmp_path / 'old.db'
+        conn = sqlite3.connect(path)
+        conn.execute('CREATE TABLE uploaded_files (id VARCHAR(36) PRIMARY KEY, user_id VARCHAR(36) NOT NULL,'
+                     ' name VARCHAR(255) NOT NULL, size INTEGER NOT NULL, file_type VARCHAR(20) NOT NULL,'
+                     ' content TEXT, created_at DATETIME)')
+        conn.commit()
+        conn.close()
+        monkeypatch.setenv('DATABASE_URL', f'sqlite:///{path}')
+        result = create_app().test_cli_runner().invoke(args=['db-upgrade'])
+        assert result.exit_code == 0
+        conn = sqlite3.connect(path)
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(uploaded_files)')}
+        conn.close()
+        assert {'content', 'content_hash'} <= columns
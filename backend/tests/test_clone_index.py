@@ -0,0 +1,154 @@
+"""
+Tests for the cross-submission clone index
+
+Tests cover:
+- Indexing uploaded files and analyses
+- Section-level scan endpoint
+"""
+
+import pytest
+from app.models import db, CloneFingerprint, User
+
+
+SUBMISSION = '''def average(values):
+    total = 0
+    count = 0
+    for value in values:
+        if value is not None:
+            total += value
+            count += 1
+    if count == 0:
+        return 0
+    return total / count
+'''
+
+RENAMED = SUBMISSION.replace('values', 'nums').replace('value', 'n').replace('total', 's')
+
+UNRELATED = '''class Stack:
+    def __init__(self):
+        self.items = []
+
+    def push(self, item):
+        self.items.append(item)
+
+    def pop(self):
+        return self.items.pop()
+'''
+
+
+def _register(client, username, role):
+    response = client.post('/api/v1/auth/register', json={
+        'username': username,
+        'email': f'{username}@example.com',
+        'password': 'password123',
+        'role': role,
+    })
+    return {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+
+def _upload(client, headers, name, content):
+    return client.post('/api/v1/auth/files', headers=headers, json={
+        'name': name, 'size': len(content), 'content': content,
+    })
+
+
+@pytest.fixture
+def section(client):
+    """A section with three registered students and its instructor's headers."""
+    instructor = _register(client, 'teacher', 'instructor')
+    section_id = client.post('/api/v1/auth/sections', headers=instructor,
+                             json={'name': 'CS101'}).get_json()['section']['id']
+    students = {}
+    for name in ('alice', 'bob', 'carol'):
+        students[name] = _register(client, name, 'student')
+        client.post(f'/api/v1/auth/sections/{section_id}/students', headers=instructor,
+                    json={'name': name.title(), 'email': f'{name}@example.com'})
+    return section_id, instructor, students
+
+
+class TestIndexing:
+    """Test that stored submissions are indexed"""
+
+    def test_upload_indexes_file(self, client, app):
+        """Uploading a source file adds its fingerprints"""
+        headers = _register(client, 'alice', 'student')
+        file_id = _upload(client, headers, 'avg.py', SUBMISSION).get_json()['file']['id']
+        with app.app_context():
+            assert CloneFingerprint.query.filter_by(source_id=file_id).count() > 0
+
+    def test_delete_removes_fingerprints(self, client, app):
+        """Deleting a file removes it from the index"""
+        headers = _register(client, 'alice', 'student')
+        file_id = _upload(client, headers, 'avg.py', SUBMISSION).get_json()['file']['id']
+        client.delete(f'/api/v1/auth/files/{file_id}', headers=headers)
+        with app.app_context():
+            assert CloneFingerprint.query.filter_by(source_id=file_id).count() == 0
+
+    def test_saved_analysis_is_indexed(self, client, app):
+        """Authenticated analyses are indexed"""
+        headers = _register(client, 'alice', 'student')
+        analysis_id = client.post('/api/v1/analyze', headers=headers, json={
+            'code': SUBMISSION, 'language': 'python',
+        }).get_json()['analysis_id']
+        with app.app_context():
+            assert CloneFingerprint.query.filter_by(source_id=analysis_id).count() > 0
+
+    def test_deleted_user_analyses_leave_index(self, client, app):
+        """Deleting a user drops their analyses' fingerprints"""
+        admin = _register(client, 'root', 'instructor')
+        headers = _register(client, 'alice', 'student')
+        analysis_ids = [
+            client.post('/api/v1/analyze', headers=headers, json={
+                'code': code, 'language': 'python',
+            }).get_json()['analysis_id']
+            for code in (SUBMISSION, UNRELATED)
+        ]
+        with app.app_context():
+            User.query.filter_by(username='root').update({'role': 'admin'})
+            user_id = User.query.filter_by(username='alice').one().id
+            db.session.commit()
+        assert client.delete(f'/api/v1/auth/admin/users/{user_id}', headers=admin).status_code == 200
+        with app.app_context():
+            assert CloneFingerprint.query.filter(CloneFingerprint.source_id.in_(analysis_ids)).count() == 0
+
+
+class TestSectionScan:
+    """Test the section scan endpoint"""
+
+    def test_scan_finds_copied_submission(self, client, section):
+        """Renamed copies between students are matched"""
+        section_id, instructor, students = section
+        _upload(client, students['alice'], 'avg.py', SUBMISSION)
+        _upload(client, students['bob'], 'avg.py', RENAMED)
+        _upload(client, students['carol'], 'stack.py', UNRELATED)
+
+        response = client.post(f'/api/v1/auth/sections/{section_id}/scan', headers=instructor)
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['submissions'] == 3
+        assert len(data['matches']) == 1
+        pair = {data['matches'][0]['a']['student_name'], data['matches'][0]['b']['student_name']}
+        assert pair == {'Alice', 'Bob'}
+        assert data['matches'][0]['similarity'] >= 0.9
+
+    def test_scan_ignores_own_resubmissions(self, client, section):
+        """A student's own resubmissions are not reported"""
+        section_id, instructor, students = section
+        _upload(client, students['alice'], 'v1.py', SUBMISSION)
+        _upload(client, students['alice'], 'v2.py', SUBMISSION)
+
+        data = client.post(f'/api/v1/auth/sections/{section_id}/scan', headers=instructor).get_json()
+        assert data['matches'] == []
+
+    def test_scan_other_instructors_section(self, client, section):
+        """Only the owning instructor can scan a section"""
+        section_id, _, students = section
+        response = client.post(f'/api/v1/auth/sections/{section_id}/scan', headers=students['alice'])
+        assert response.status_code == 404
+
+    def test_scan_rejects_bad_threshold(self, client, section):
+        """Threshold must be within (0, 1]"""
+        section_id, instructor, _ = section
+        response = client.post(f'/api/v1/auth/sections/{section_id}/scan', headers=instructor,
+                               json={'threshold': 5})
+        assert response.status_code == 400
@@ -0,0 +1,61 @@
+"""
+Tests for database engine tuning
+
+Tests cover:
+- Pool options for server databases
+- SQLite pragmas on new connections
+"""
+
+import pytest
+from app import create_app
+from app.models import db
+from app.models.engine import engine_options
+
+
+@pytest.fixture
+def sqlite_app(tmp_path, monkeypatch):
+    """Factory for apps on a fresh SQLite file."""
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'engine.db'}")
+    return create_app
+
+
+def _pragma(app, name):
+    with app.app_context():
+        with db.engine.connect() as conn:
+            return conn.exec_driver_sql(f'PRAGMA {name}').scalar()
+
+
+class TestEngineOptions:
+    """Test options chosen per database"""
+
+    def test_server_database_gets_pool(self):
+        """PostgreSQL URIs get a sized, pre-pinged pool"""
+        app = create_app()
+        config = dict(app.config, SQLALCHEMY_DATABASE_URI='postgresql://u:p@db/clones', DB_POOL_SIZE=7)
+        options = engine_options(config)
+        assert options['pool_size'] == 7
+        assert options['pool_pre_ping'] is True
+        assert 'connect_args' not in options
+
+    def test_sqlite_gets_lock_timeout(self):
+        """SQLite URIs wait for locks instead of getting pool options"""
+        app = create_app()
+        options = engine_options(dict(app.config, SQLITE_BUSY_TIMEOUT_MS=2500))
+        assert options == {'connect_args': {'timeout': 2.5}}
+
+
+class TestSqlitePragmas:
+    """Test pragmas run on each SQLite connection"""
+
+    def test_wal_and_busy_timeout(self, sqlite_app):
+        """File databases use WAL, synchronous=NORMAL and the busy timeout"""
+        app = sqlite_app()
+        assert _pragma(app, 'journal_mode') == 'wal'
+        assert _pragma(app, 'synchronous') == 1  # NORMAL
+        assert _pragma(app, 'busy_timeout') == app.config['SQLITE_BUSY_TIMEOUT_MS']
+        assert _pragma(app, 'mmap_size') == app.config['SQLITE_MMAP_BYTES']
+
+    def test_wal_can_be_disabled(self, sqlite_app, monkeypatch):
+        """SQLITE_WAL=0 keeps the rollback journal"""
+        monkeypatch.setenv('SQLITE_WAL', '0')
+        assert _pragma(sqlite_app(), 'journal_mode') == 'delete'
@@ -0,0 +1,155 @@
+"""
+Unit tests for token fingerprinting and clone detection
+
+Tests cover:
+- Tokenization and normalization, including streamed Java
+- Winnowing
+- Clone detection within a submission
+"""
+
+import time
+
+from app.services.fingerprint import (
+    KGRAM,
+    WINDOW,
+    detect_clones,
+    fingerprint,
+    iter_fingerprints,
+    iter_java_tokens,
+    kgram_hashes,
+    tokenize,
+    winnow,
+)
+
+
+PYTHON_FUNC = '''def process_{i}(items, limit):
+    total = 0
+    for item in items:
+        if item.value > limit:
+            total += item.value * {i}
+        else:
+            total -= 1
+    return total
+
+'''
+
+
+class TestTokenize:
+    """Test tokenizer and normalization"""
+
+    def test_identifiers_and_literals_are_abstracted(self):
+        """Renamed variables and changed literals normalize the same"""
+        a = tokenize("x = foo(1, 'a')", 'python')
+        b = tokenize("y = bar(2, \"b\")", 'python')
+        assert [t.norm for t in a] == [t.norm for t in b]
+        assert [t.norm for t in a][:3] == ['ID', '=', 'ID']
+
+    def test_keywords_are_kept(self):
+        """Keywords survive normalization"""
+        tokens = tokenize("for i in range(3):\n    pass", 'python')
+        norms = [t.norm for t in tokens]
+        assert 'for' in norms and 'in' in norms and 'pass' in norms
+
+    def test_comments_are_dropped_and_lines_tracked(self):
+        """Comments produce no tokens and line numbers stay correct"""
+        tokens = tokenize("int a = 1; // note\n/* block\ncomment */\nint b = 2;", 'java')
+        assert [t.text for t in tokens] == ['int', 'a', '=', '1', ';', 'int', 'b', '=', '2', ';']
+        assert tokens[-1].line == 4
+
+    def test_java_text_blocks_span_lines(self):
+        """A text block is one string token and later lines stay correct"""
+        code = 'String s = """\n    hi "there"\n    """;\nint x;'
+        tokens = tokenize(code, 'java')
+        assert [t.norm for t in tokens] == ['ID', 'ID', '=', 'STR', ';', 'int', 'ID', ';']
+        assert tokens[-1].line == 4
+
+    def test_java_tokens_stream_from_lines(self):
+        """Any iterable of lines can be tokenized lazily"""
+        code = "class A {\n  int x = 1; /* open\n  still comment */ int y;\n}\n"
+        streamed = list(iter_java_tokens(iter(code.splitlines(keepends=True))))
+        assert streamed == tokenize(code, 'java')
+        assert [t.text for t in streamed][-4:] == ['int', 'y', ';', '}']
+
+    def test_java_unclosed_comment_is_reported(self):
+        """An unterminated block comment leaves a marker token"""
+        tokens = tokenize("int a;\n/* never closed\nint b;", 'java')
+        assert tokens[-1].text == '/*' and tokens[-1].line == 2
+
+    def test_java_tokenizer_is_fast(self):
+        """120k lines of Java tokenize at 100k lines/s or better"""
+        unit = "class A {\n    int f(int a) {\n        if (a > 0 && a < 9) { return a * 2; }\n        return 0;\n    }\n}\n"
+        code = unit * 20000
+        start = time.perf_counter()
+        tokenize(code, 'java')
+        assert time.perf_counter() - start < 1.2
+
+
+class TestWinnowing:
+    """Test fingerprint selection"""
+
+    def test_short_input_has_no_kgrams(self):
+        """Fewer tokens than k yields no hashes"""
+        assert kgram_hashes(tokenize("print(1)", 'python')) == []
+
+    def test_every_window_has_a_fingerprint(self):
+        """Winnowing guarantees one fingerprint in every window"""
+        hashes = [7, 3, 9, 3, 5, 1, 8, 8, 2, 6, 4]
+        positions = [fp.pos for fp in winnow(hashes, 4)]
+        for start in range(len(hashes) - 3):
+            assert any(start <= p < start + 4 for p in positions)
+
+    def test_identical_hashes_are_thinned(self):
+        """A run of identical hashes selects one fingerprint per window"""
+        fps = winnow([5] * 40, 4)
+        assert len(fps) == 10
+
+    def test_fingerprints_are_stable(self):
+        """Same code produces the same fingerprints"""
+        code = PYTHON_FUNC.format(i=0)
+        assert fingerprint(tokenize(code, 'python')) == fingerprint(tokenize(code, 'python'))
+
+
+    def test_streamed_fingerprints_match(self):
+        """The lazy fingerprint stream selects the same fingerprints"""
+        code = PYTHON_FUNC.format(i=1) * 3
+        tokens = tokenize(code, 'python')
+        assert list(iter_fingerprints(iter(tokens))) == fingerprint(tokens)
+
+
+class TestDetectClones:
+    """Test clone detection within one submission"""
+
+    def test_no_clones_in_unique_code(self):
+        """Unrelated code has no clones"""
+        result = detect_clones("def a():\n    return 1\n", 'python')
+        assert result['clones'] == []
+        assert result['clone_percentage'] == 0.0
+
+    def test_renamed_copy_is_type_2_clone(self):
+        """A copy with different literals is reported as a Type-2 clone"""
+        code = PYTHON_FUNC.format(i=1) + PYTHON_FUNC.format(i=2)
+        result = detect_clones(code, 'python')
+        assert len(result['clones']) == 1
+        clone = result['clones'][0]
+        assert clone['type'] == 2
+        assert clone['locations'] == [
+            {'start_line': 1, 'end_line': 8},
+            {'start_line': 10, 'end_line': 17},
+        ]
+        assert result['clone_percentage'] > 80
+
+    def test_exact_copy_is_type_1_clone(self):
+        """An exact copy is reported as a Type-1 clone"""
+        body = PYTHON_FUNC.format(i=1)
+        result = detect_clones(body + body, 'python')
+        assert result['clones'][0]['type'] == 1
+        assert result['clones'][0]['similarity'] == 1.0
+
+    def test_large_file_is_fast(self):
+        """A 5,000-line file analyzes well under a second"""
+        code = ''.join(PYTHON_FUNC.format(i=i) for i in range(560))
+        start = time.perf_counter()
+        result = detect_clones(code, 'python')
+        assert time.perf_counter() - start < 1.0
+        assert result['clone_percentage'] > 80
+        assert KGRAM + WINDOW - 1 < result['clones'][0]['token_count']
@@ -0,0 +1,129 @@
+"""
+Unit tests for incremental re-analysis
+
+Tests cover:
+- Matching unchanged regions against edited code
+- Reused results equal a full analysis
+- Reuse counts
+- Snapshot store budget
+"""
+
+from app.services.analyzer import analyze_with_snapshot, run_analysis
+from app.services.incremental import SnapshotStore, plan_reuse
+
+
+PY_FUNC = '''def process_{i}(items, limit):
+    total = 0
+    for item in items:
+        if item.value > limit and item.flag:
+            total += item.value * {i}
+    return total
+
+'''
+
+JAVA_CLASS = '''class Box{i} {{
+    private int v;
+    public int get(int a) {{
+        if (a > {i}) {{ return v * a; }}
+        Runnable r = new Runnable() {{ public void run() {{ v = a > 0 ? 1 : 2; }} }};
+        return v;
+    }}
+    public String toString() {{ return "Box" + v; }}
+}}
+'''
+
+
+def _versions(unit, count=20):
+    """Original code and a version with one edit, one insertion, one deletion."""
+    parts = [unit.format(i=i) for i in range(count)]
+    old = ''.join(parts)
+    parts[3] = parts[3].replace('limit', 'bound').replace('v * a', 'v + a * 2')
+    parts.insert(10, unit.format(i=99))
+    del parts[15]
+    return old, ''.join(parts)
+
+
+def _comparable(result):
+    """Result without the per-run random ids."""
+    result = dict(result, analysis_id=None)
+    result['clones'] = [dict(c, clone_id=None) for c in result['clones']]
+    result['refactoring_suggestions'] = [
+        dict(s, suggestion_id=None, affected_clone_id=None) for s in result['refactoring_suggestions']
+    ]
+    return result
+
+
+class TestPlanReuse:
+    """Test matching snapshot regions against new code"""
+
+    def test_unchanged_regions_are_found_at_new_position(self):
+        """Shifted functions are matched with their line delta"""
+        old, new = _versions(PY_FUNC)
+        snapshot = analyze_with_snapshot(old, 'python')[2]
+        plan = plan_reuse(snapshot, new)
+        deltas = {region.functions[0].name: delta for region, delta in plan}
+        assert 'process_3' not in deltas
+        assert 'process_14' not in deltas  # deleted
+        assert deltas['process_0'] == 0
+        assert deltas['process_12'] == 7
+
+    def test_identical_methods_stay_with_their_class(self):
+        """Repeated one-line methods are not matched into a neighbour"""
+        old, new = _versions(JAVA_CLASS)
+        snapshot = analyze_with_snapshot(old, 'java')[2]
+        stats = analyze_with_snapshot(new, 'java', snapshot)[3]
+        # Box3.get edited and both methods of the inserted class are new
+        assert stats == {'regions_total': 40, 'regions_reused': 37, 'regions_recomputed': 3}
+
+
+class TestIncrementalAnalysis:
+    """Test that reuse does not change results"""
+
+    def test_python_matches_full_analysis(self):
+        """Reused Python functions give the same report and hashes"""
+        old, new = _versions(PY_FUNC)
+        snapshot = analyze_with_snapshot(old, 'python')[2]
+        result, hashes, _, stats = analyze_with_snapshot(new, 'python', snapshot)
+        full, full_hashes = run_analysis(new, 'python')
+        assert _comparable(result) == _comparable(full)
+        assert hashes == full_hashes
+        assert stats == {'regions_total': 20, 'regions_reused': 18, 'regions_recomputed': 2}
+
+    def test_java_matches_full_analysis(self):
+        """Reused Java methods give the same report and hashes"""
+        old, new = _versions(JAVA_CLASS)
+        snapshot = analyze_with_snapshot(old, 'java')[2]
+        result, hashes, _, _ = analyze_with_snapshot(new, 'java', snapshot)
+        full, full_hashes = run_analysis(new, 'java')
+        assert _comparable(result) == _comparable(full)
+        assert hashes == full_hashes
+
+    def test_edit_opening_comment_falls_back(self):
+        """A comment left open across a reused region is tokenized whole"""
+        old = PY_FUNC.format(i=1) + PY_FUNC.format(i=2)
+        new = 'x = """\n' + old + '"""\n'
+        snapshot = analyze_with_snapshot(old, 'python')[2]
+        result, _, _, stats = analyze_with_snapshot(new, 'python', snapshot)
+        assert stats['regions_reused'] == 0
+        assert result['function_metrics'] == []
+
+    def test_unparsable_code_leaves_no_snapshot(self):
+        """Code that does not parse cannot be reused later"""
+        assert analyze_with_snapshot("def broken(:\n", 'python')[2] is None
+
+
+class TestSnapshotStore:
+    """Test the snapshot LRU"""
+
+    def test_evicts_to_token_budget(self):
+        """Least recently used snapshots are dropped first"""
+        snapshots = [analyze_with_snapshot(PY_FUNC.format(i=i), 'python')[2] for i in range(3)]
+        size = snapshots[0].token_count
+        store = SnapshotStore(max_tokens=size * 2)
+        store.put('a', snapshots[0])
+        store.put('b', snapshots[1])
+        store.get('a')
+        store.put('c', snapshots[2])
+        assert store.get('b') is None
+        assert store.get('a') is snapshots[0]
+        assert len(store) == 2
@@ -0,0 +1,157 @@
+"""
+Unit tests for code quality metrics
+
+Tests cover:
+- Per-function cyclomatic complexity
+- Halstead volume and maintainability index
+- Java metrics from the parsed unit
+- Token-based fallback
+"""
+
+import ast
+import time
+
+from app.services.fingerprint import tokenize
+from app.services.java_parser import parse_java
+from app.services.metrics import java_metrics, maintainability_index, python_metrics, token_metrics
+
+
+BRANCHY = '''def classify(n):
+    if n < 0:
+        return "negative"
+    elif n == 0:
+        return "zero"
+    for i in range(n):
+        if i % 2 and i > 3:
+            break
+    return "positive"
+
+
+def simple():
+    return 1
+'''
+
+# Benchmark input: 10k lines packed with expressions, 200k AST nodes.
+# Time goes with the node count; stdlib-like code has about a fifth
+# as many nodes per line.
+DENSE = ''.join(
+    f"def f{i}(a, b, c):\n"
+    f"    x = a * {i} + b - c / (a + 1) if a > b and b < c else -a\n"
+    f"    return [y ** 2 for y in range(x) if y % 3 == 0 or y % 5 == 1]\n\n"
+    for i in range(2500)
+)
+
+
+def _metrics(code):
+    return python_metrics(ast.parse(code), code)
+
+
+class TestCyclomaticComplexity:
+    """Test complexity counting"""
+
+    def test_straight_line_code_is_one(self):
+        """Code without branches has complexity 1"""
+        assert _metrics("x = 1\nprint(x)\n")['cyclomatic_complexity'] == 1
+
+    def test_per_function_breakdown(self):
+        """Each function is measured on its own"""
+        functions = {f['name']: f for f in _metrics(BRANCHY)['functions']}
+        # if + elif + for + if + and = 5 decisions
+        assert functions['classify']['cyclomatic_complexity'] == 6
+        assert functions['simple']['cyclomatic_complexity'] == 1
+        assert functions['classify']['start_line'] == 1
+        assert functions['classify']['end_line'] == 9
+
+    def test_nested_functions_are_separate(self):
+        """Decisions in a nested function do not count for the outer one"""
+        code = "def outer():\n    def inner(x):\n        if x:\n            return 1\n    return inner\n"
+        functions = {f['name']: f for f in _metrics(code)['functions']}
+        assert functions['outer']['cyclomatic_complexity'] == 1
+        assert functions['outer.inner']['cyclomatic_complexity'] == 2
+
+    def test_methods_are_qualified(self):
+        """Methods are reported as Class.method"""
+        code = "class A:\n    def run(self):\n        return [x for x in self.items if x]\n"
+        functions = _metrics(code)['functions']
+        assert functions[0]['name'] == 'A.run'
+        assert functions[0]['cyclomatic_complexity'] == 3
+
+
+class TestMaintainability:
+    """Test Halstead volume and maintainability index"""
+
+    def test_index_is_bounded(self):
+        """The index is clamped to 0-100"""
+        assert maintainability_index(1e12, 500, 100000) == 0.0
+        assert maintainability_index(0, 1, 1) <= 100.0
+
+    def test_bigger_function_is_less_maintainable(self):
+        """More branches and operands lower the index"""
+        functions = {f['name']: f for f in _metrics(BRANCHY)['functions']}
+        assert functions['classify']['halstead_volume'] > functions['simple']['halstead_volume']
+        assert functions['classify']['maintainability_index'] < functions['simple']['maintainability_index']
+
+    def test_large_module_is_fast(self):
+        """A 10k-line module of ordinary code is measured in well under a second"""
+        code = BRANCHY * 770
+        tree = ast.parse(code)
+        start = time.perf_counter()
+        result = python_metrics(tree, code)
+        assert time.perf_counter() - start < 0.5
+        assert len(result['functions']) == 1540
+
+    def test_dense_module_is_fast(self):
+        """A 10k-line module with about 20 AST nodes per line also stays under half a second"""
+        tree = ast.parse(DENSE)
+        start = time.perf_counter()
+        result = python_metrics(tree, DENSE)
+        assert time.perf_counter() - start < 0.5
+        assert len(result['functions']) == 2500
+
+
+class TestJavaMetrics:
+    """Test metrics for parsed Java"""
+
+    CODE = """class Box {
+    List<?> items;
+    int count(int limit) {
+        Runnable r = new Runnable() {
+            public void run() { if (limit > 0) { } }
+        };
+        for (Object o : items) {
+            if (o != null && limit > 0) { limit--; }
+        }
+        return limit > 0 ? limit : 0;
+    }
+}
+"""
+
+    def _metrics(self):
+        tokens = tokenize(self.CODE, 'java')
+        return java_metrics(parse_java(tokens), tokens, self.CODE)
+
+    def test_methods_are_measured_separately(self):
+        """Anonymous class methods do not add to the enclosing method"""
+        functions = {f['name']: f for f in self._metrics()['functions']}
+        # for + if + && + ?: = 4 decisions; the wildcard '?' is not one
+        assert functions['Box.count']['cyclomatic_complexity'] == 5
+        assert functions['Box.count.<anonymous Runnable>.run']['cyclomatic_complexity'] == 2
+        assert functions['Box.count']['start_line'] == 3
+        assert functions['Box.count']['end_line'] == 11
+
+    def test_halstead_counts_innermost_method_only(self):
+        """Tokens of a nested method count towards that method"""
+        functions = {f['name']: f for f in self._metrics()['functions']}
+        assert functions['Box.count']['halstead_volume'] > functions['Box.count.<anonymous Runnable>.run']['halstead_volume']
+        assert self._metrics()['max_cyclomatic_complexity'] == 5
+
+
+class TestTokenMetrics:
+    """Test the token-based fallback"""
+
+    def test_java_decisions_are_counted(self):
+        """Branch keywords and short-circuit operators add complexity"""
+        code = "int f(int a) { if (a > 0 && a < 9) { return 1; } while (a > 0) a--; return 0; }"
+        result = token_metrics(tokenize(code, 'java'), code)
+        assert result['cyclomatic_complexity'] == 4
+        assert 0 <= result['maintainability_index'] <= 100
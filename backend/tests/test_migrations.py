@@ -0,0 +1,115 @@
+"""
+Tests for versioned schema migrations
+
+Tests cover:
+- App start without schema work
+- The db-upgrade command
+- Opt-in upgrade at start
+- Backfilling missing timestamps
+- Binary payload columns on server databases
+"""
+
+import sqlite3
+
+import pytest
+from app import create_app
+from app.models import CompressedJSON
+from app.models.migrations import SCHEMA_VERSION, binary_column_sql
+
+
+@pytest.fixture
+def db_path(tmp_path, monkeypatch):
+    """A database file that does not exist yet."""
+    path = tmp_path / 'app.db'
+    monkeypatch.setenv('DATABASE_URL', f'sqlite:///{path}')
+    return path
+
+
+def _tables(path):
+    conn = sqlite3.connect(path)
+    try:
+        return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    finally:
+        conn.close()
+
+
+class TestStartup:
+    """Test that creating the app leaves the schema alone"""
+
+    def test_create_app_does_not_touch_database(self, db_path):
+        """No connection is opened while building the app"""
+        create_app()
+        assert not db_path.exists()
+
+    def test_auto_upgrade_when_requested(self, db_path, monkeypatch):
+        """SCHEMA_AUTO_UPGRADE=1 applies migrations in create_app"""
+        monkeypatch.setenv('SCHEMA_AUTO_UPGRADE', '1')
+        create_app()
+        assert {'users', 'analyses', 'schema_version'} <= _tables(db_path)
+
+
+class TestUpgradeCommand:
+    """Test flask db-upgrade"""
+
+    def test_creates_schema_and_records_version(self, db_path):
+        """A new database gets every table and the latest version"""
+        result = create_app().test_cli_runner().invoke(args=['db-upgrade'])
+        assert result.exit_code == 0
+        assert 'Applied 1' in result.output
+        assert {'users', 'analyses', 'uploaded_files', 'blobs', 'schema_version'} <= _tables(db_path)
+        conn = sqlite3.connect(db_path)
+        assert conn.execute('SELECT MAX(version) FROM schema_version').fetchone()[0] == SCHEMA_VERSION
+        conn.close()
+
+    def test_second_run_applies_nothing(self, db_path):
+        """Migrations already recorded are not run again"""
+        runner = create_app().test_cli_runner()
+        runner.invoke(args=['db-upgrade'])
+        result = runner.invoke(args=['db-upgrade'])
+        assert result.exit_code == 0
+        assert 'Applied' not in result.output
+        conn = sqlite3.connect(db_path)
+        assert conn.execute('SELECT COUNT(*) FROM schema_version').fetchone()[0] == SCHEMA_VERSION
+        conn.close()
+
+
+class TestBackfill:
+    """Test filling in missing timestamps"""
+
+    def test_missing_created_at_is_backfilled(self, db_path):
+        """Rows without created_at become the oldest entries"""
+        runner = create_app().test_cli_runner()
+        runner.invoke(args=['db-upgrade'])
+        conn = sqlite3.connect(db_path)
+        conn.execute("INSERT INTO history_entries (id, user_id, entry_type, description) VALUES ('h1', 'u1', 'upload', 'old')")
+        conn.execute('DELETE FROM schema_version WHERE version >= 4')
+        conn.commit()
+        conn.close()
+        result = runner.invoke(args=['db-upgrade'])
+        assert 'Applied 4' in result.output
+        conn = sqlite3.connect(db_path)
+        assert conn.execute("SELECT created_at FROM history_entries WHERE id = 'h1'").fetchone()[0].startswith('1970-01-01')
+        conn.close()
+
+
+class TestBinaryPayloads:
+    """Test the TEXT to binary change of stored analysis payloads"""
+
+    def test_postgresql_keeps_text_bytes(self):
+        """PostgreSQL columns become BYTEA holding the old text's bytes"""
+        assert binary_column_sql('postgresql', 'analyses', 'clones_json') == (
+            "ALTER TABLE analyses ALTER COLUMN clones_json TYPE BYTEA USING convert_to(clones_json, 'UTF8')"
+        )
+
+    def test_mysql_becomes_blob(self):
+        """MySQL columns become LONGBLOB"""
+        assert binary_column_sql('mysql', 'analyses', 'suggestions_json') == (
+            'ALTER TABLE analyses MODIFY suggestions_json LONGBLOB'
+        )
+
+    def test_converted_text_is_still_readable(self):
+        """Uncompressed JSON left in a converted column still loads"""
+        column = CompressedJSON()
+        assert column.process_result_value(b'[{"a": 1}]', None) == [{'a': 1}]
+        stored = column.process_bind_param([{'a': 1}], None)
+        assert column.process_result_value(stored, None) == [{'a': 1}]
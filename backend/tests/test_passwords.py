@@ -0,0 +1,116 @@
+"""
+Tests for password hashing on the process pool
+
+Tests cover:
+- Hashing and checking
+- Rehash on login when the cost changes
+- Rejecting work beyond the pending limit
+- Pending count of timed-out work
+- Latency statistics
+"""
+
+import pytest
+from app.models import db, User
+from app.services.passwords import PasswordHasher, HasherBusy, password_hasher
+
+
+@pytest.fixture
+def app(app):
+    """The shared test app, with per-test hasher overrides undone."""
+    yield app
+    password_hasher.init_app(app)
+
+
+def _register(client, name):
+    return client.post('/api/v1/auth/register', json={
+        'username': name, 'email': f'{name}@example.com', 'password': 'password123'
+    })
+
+
+class TestPasswordHasher:
+    """Test the hasher itself"""
+
+    def test_hash_and_check(self):
+        """A hash verifies its password and nothing else"""
+        hasher = PasswordHasher(rounds=4, max_workers=1)
+        try:
+            hashed = hasher.hash('password123')
+            assert hashed.startswith('$2b$04$')
+            assert hasher.check(hashed, 'password123')
+            assert not hasher.check(hashed, 'password124')
+            assert not hasher.check(hashed, '')
+        finally:
+            hasher.shutdown()
+
+    def test_needs_rehash_on_cost_change(self):
+        """Only hashes made with another cost need upgrading"""
+        hasher = PasswordHasher(rounds=5)
+        assert not hasher.needs_rehash('$2b$05$' + 'a' * 53)
+        assert hasher.needs_rehash('$2b$04$' + 'a' * 53)
+        assert hasher.needs_rehash('not a hash')
+
+    def test_rejects_beyond_pending_limit(self):
+        """Work beyond max_pending fails fast instead of queueing"""
+        hasher = PasswordHasher(rounds=4, max_workers=1, max_pending=0)
+        with pytest.raises(HasherBusy):
+            hasher.hash('password123')
+        assert hasher.stats()['rejected'] == 1
+
+    def test_rejects_when_wait_would_exceed_timeout(self):
+        """Recent bcrypt times decide whether a new operation can finish in time"""
+        hasher = PasswordHasher(rounds=4, max_workers=2, timeout=1)
+        hasher._bcrypt_seconds = 0.8
+        assert hasher.estimated_wait() == pytest.approx(0.4)
+        hasher._pending = 2
+        with pytest.raises(HasherBusy):
+            hasher.hash('password123')
+
+
+    def test_timed_out_work_stays_pending(self):
+        """A hash still running after the timeout keeps its slot until it ends"""
+        hasher = PasswordHasher(rounds=12, max_workers=1, timeout=0.05)
+        try:
+            with pytest.raises(HasherBusy):
+                hasher.hash('password123')
+            assert hasher.stats()['pending'] == 1
+        finally:
+            hasher.shutdown()
+        assert hasher.stats()['pending'] == 0
+
+class TestLoginHashing:
+    """Test hashing through the auth routes"""
+
+    def test_login_upgrades_old_cost(self, client):
+        """Logging in rehashes a password stored with another cost"""
+        _register(client, 'rehash')
+        user = User.query.filter_by(username='rehash').one()
+        assert user.password_hash.startswith('$2b$04$')
+        password_hasher.rounds = 5
+        response = client.post('/api/v1/auth/login', json={'username': 'rehash', 'password': 'password123'})
+        assert response.status_code == 200
+        db.session.refresh(user)
+        assert user.password_hash.startswith('$2b$05$')
+        assert client.post('/api/v1/auth/login', json={
+            'username': 'rehash', 'password': 'password123'
+        }).status_code == 200
+
+    def test_busy_pool_is_503(self, client):
+        """A saturated pool answers 503 with Retry-After"""
+        password_hasher.max_pending = 0
+        response = _register(client, 'toobusy')
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+        assert User.query.filter_by(username='toobusy').first() is None
+
+    def test_admin_sees_latency(self, client):
+        """Admins can read hash counts and percentiles"""
+        token = _register(client, 'hashadmin').get_json()['access_token']
+        User.query.filter_by(username='hashadmin').update({'role': 'admin'})
+        db.session.commit()
+        client.post('/api/v1/auth/login', json={'username': 'hashadmin', 'password': 'password123'})
+        stats = client.get('/api/v1/auth/admin/password-hashing',
+                           headers={'Authorization': f'Bearer {token}'}).get_json()
+        assert stats['rounds'] == 4
+        assert stats['hash']['count'] >= 1
+        assert stats['check']['count'] >= 1
+        assert stats['check']['p99_ms'] >= stats['check']['bcrypt_p50_ms'] > 0
@@ -0,0 +1,102 @@
+"""
+Tests for request timing and sampled profiles
+
+Tests cover:
+- Server-Timing phases
+- Slow-request profile dumps
+- Disabling the header
+"""
+
+import pstats
+import uuid
+
+from app import create_app
+from app.services.profiling import timed
+
+
+def _phases(response):
+    """Server-Timing entries as {name: [params]}"""
+    phases = {}
+    for entry in response.headers['Server-Timing'].split(', '):
+        name, *params = entry.split(';')
+        phases[name] = params
+    return phases
+
+
+def _token(client):
+    response = client.post('/api/v1/auth/register', json={
+        'username': 'timer',
+        'email': 'timer@example.com',
+        'password': 'password123'
+    })
+    return response.get_json()['access_token']
+
+
+def _unique_code():
+    return f'def f():\n    return "{uuid.uuid4().hex}"\n'
+
+
+class TestServerTiming:
+    """Test the Server-Timing header"""
+
+    def test_analysis_phases(self, client):
+        """An analysis reports decode, stage and serialization timings"""
+        response = client.post('/api/v1/analyze', json={'code': _unique_code(), 'language': 'python'})
+        assert response.status_code == 200
+        phases = _phases(response)
+        for name in ('json_decode', 'analyze_tokenize', 'analyze_parse', 'analyze_clones',
+                     'analyze_metrics', 'serialize', 'total'):
+            assert name in phases
+        assert phases['total'][0].startswith('dur=')
+
+    def test_db_queries_and_jwt_are_counted(self, client):
+        """Authenticated requests time the JWT and count queries"""
+        token = _token(client)
+        response = client.get('/api/v1/auth/me', headers={'Authorization': f'Bearer {token}'})
+        assert response.status_code == 200
+        phases = _phases(response)
+        assert 'jwt' in phases
+        assert any(param.startswith('desc="') and 'quer' in param for param in phases['db'])
+
+    def test_timed_outside_request_is_a_no_op(self):
+        """Worker processes and scripts can call timed() freely"""
+        with timed('anything'):
+            value = 1
+        assert value == 1
+
+    def test_header_can_be_disabled(self, monkeypatch):
+        """SERVER_TIMING=0 leaves responses without the header"""
+        monkeypatch.setenv('SERVER_TIMING', '0')
+        app = create_app()
+        response = app.test_client().get('/api/v1/health')
+        assert 'Server-Timing' not in response.headers
+
+
+class TestSampledProfiles:
+    """Test cProfile dumps of slow requests"""
+
+    def test_slow_sampled_request_is_dumped(self, app, client, tmp_path):
+        """Sampled requests over PROFILE_SLOW_MS leave a pstats file"""
+        profiler = app.extensions['request_profiler']
+        profiler.sample_rate, profiler.slow_ms, profiler.profile_dir = 1.0, 0, str(tmp_path)
+        client.post('/api/v1/analyze', json={'code': _unique_code(), 'language': 'python'})
+        dumps = list(tmp_path.glob('*.prof'))
+        assert len(dumps) == 1
+        assert 'analyze_code' in dumps[0].name
+        assert pstats.Stats(str(dumps[0])).total_calls > 0
+
+    def test_fast_requests_are_not_dumped(self, app, client, tmp_path):
+        """Requests under the threshold are profiled but not kept"""
+        profiler = app.extensions['request_profiler']
+        profiler.sample_rate, profiler.slow_ms, profiler.profile_dir = 1.0, 60000, str(tmp_path)
+        client.get('/api/v1/health')
+        assert list(tmp_path.glob('*.prof')) == []
+
+    def test_dump_count_is_capped(self, app, client, tmp_path):
+        """No more than PROFILE_MAX_DUMPS files are written"""
+        profiler = app.extensions['request_profiler']
+        profiler.sample_rate, profiler.slow_ms, profiler.profile_dir = 1.0, 0, str(tmp_path)
+        profiler.max_dumps = 2
+        for _ in range(4):
+            client.get('/api/v1/health')
+        assert len(list(tmp_path.glob('*.prof'))) == 2
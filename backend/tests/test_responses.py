@@ -0,0 +1,99 @@
+"""
+Tests for JSON encoding and response compression
+
+Tests cover:
+- Compact JSON output and decoding
+- Negotiated gzip and brotli compression
+- Responses left uncompressed
+"""
+
+import gzip
+import json
+import types
+from datetime import datetime, timezone
+
+import pytest
+from flask import Response
+from app import create_app
+from app.services import responses
+
+
+BIG = {'items': [{'name': f'clone_{i}', 'code': 'x = 1\n' * 20} for i in range(200)]}
+
+
+@pytest.fixture
+def app():
+    """Create a test Flask application with a few extra routes."""
+    app = create_app()
+    app.config['TESTING'] = True
+
+    @app.route('/test/big')
+    def big():
+        return BIG
+
+    @app.route('/test/stream')
+    def stream():
+        return Response((json.dumps(item) + '\n' for item in BIG['items']), mimetype='application/x-ndjson')
+
+    return app
+
+
+@pytest.fixture
+def client(app):
+    """Create a test client."""
+    return app.test_client()
+
+
+class TestJSONProvider:
+    """Test the app's JSON encoder"""
+
+    def test_output_is_compact(self, app):
+        """No whitespace between tokens, key order kept"""
+        assert app.json.dumps({'b': 1, 'a': [1, 2]}) == '{"b":1,"a":[1,2]}'
+
+    def test_datetimes_match_flask_default(self, app):
+        """Datetimes keep Flask's HTTP date format"""
+        moment = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+        assert json.loads(app.json.dumps({'at': moment})) == {'at': 'Wed, 01 May 2024 12:30:00 GMT'}
+
+    def test_request_bodies_are_decoded(self, client):
+        """Malformed JSON still gets the endpoint's 400"""
+        response = client.post('/api/v1/analyze', data='{"code": ', content_type='application/json')
+        assert response.status_code == 400
+
+
+class TestCompression:
+    """Test Accept-Encoding negotiation"""
+
+    def test_gzip_when_accepted(self, client):
+        """Large responses are gzipped for gzip clients"""
+        response = client.get('/test/big', headers={'Accept-Encoding': 'gzip, deflate'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert json.loads(gzip.decompress(response.data)) == BIG
+        assert len(response.data) < len(json.dumps(BIG)) / 10
+
+    def test_brotli_preferred_when_available(self, client, monkeypatch):
+        """brotli wins over gzip when the package is installed"""
+        fake = types.SimpleNamespace(compress=lambda data, quality: b'br:' + data)
+        monkeypatch.setattr(responses, 'brotli', fake)
+        response = client.get('/test/big', headers={'Accept-Encoding': 'gzip, br'})
+        assert response.headers['Content-Encoding'] == 'br'
+        assert response.data.startswith(b'br:')
+
+    def test_identity_without_accept_encoding(self, client):
+        """Clients that do not ask get plain JSON"""
+        response = client.get('/test/big')
+        assert 'Content-Encoding' not in response.headers
+        assert response.get_json() == BIG
+
+    def test_small_responses_are_not_compressed(self, client):
+        """Bodies below COMPRESS_MIN_BYTES are sent as they are"""
+        response = client.get('/api/v1/health', headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in response.headers
+
+    def test_streams_are_not_compressed(self, client):
+        """Streamed NDJSON keeps arriving line by line"""
+        response = client.get('/test/stream', headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in response.headers
+        assert len(response.data.splitlines()) == len(BIG['items'])
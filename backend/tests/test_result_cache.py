@@ -0,0 +1,73 @@
+"""
+Unit tests for the analysis result cache
+
+Tests cover:
+- Cache keys
+- LRU and size-bounded eviction
+- SQLite tier persistence
+"""
+
+from app.services.result_cache import AnalysisResultCache, cache_key
+
+
+class TestCacheKey:
+    """Test content-addressed keys"""
+
+    def test_language_changes_key(self):
+        """Same code in different languages gets different keys"""
+        assert cache_key("int x = 1;", 'java') != cache_key("int x = 1;", 'python')
+
+    def test_line_endings_do_not_change_key(self):
+        """CRLF and trailing whitespace normalize away"""
+        assert cache_key("a = 1\nb = 2", 'python') == cache_key("a = 1 \r\nb = 2", 'python')
+
+    def test_indentation_changes_key(self):
+        """Leading whitespace is significant"""
+        assert cache_key("a = 1", 'python') != cache_key("  a = 1", 'python')
+
+
+class TestMemoryTier:
+    """Test in-process LRU behavior"""
+
+    def test_get_returns_copy(self):
+        """Mutating a returned value does not corrupt the cache"""
+        cache = AnalysisResultCache()
+        cache.put('k', {'clones': []})
+        cache.get('k')['clones'].append(1)
+        assert cache.get('k') == {'clones': []}
+
+    def test_least_recently_used_is_evicted(self):
+        """Entry count bound evicts the oldest unused entry"""
+        cache = AnalysisResultCache(max_entries=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        cache.get('a')
+        cache.put('c', 3)
+        assert cache.get('b') is None
+        assert cache.get('a') == 1 and cache.get('c') == 3
+
+    def test_byte_bound_is_enforced(self):
+        """Total payload size stays under max_bytes"""
+        cache = AnalysisResultCache(max_bytes=100)
+        for i in range(10):
+            cache.put(str(i), 'x' * 40)
+        assert len(cache) == 2
+
+
+class TestDiskTier:
+    """Test the optional SQLite tier"""
+
+    def test_entries_survive_restart(self, tmp_path):
+        """A new cache on the same file sees earlier entries"""
+        path = str(tmp_path / 'cache.db')
+        AnalysisResultCache(path=path).put('k', {'v': 1})
+        assert AnalysisResultCache(path=path).get('k') == {'v': 1}
+
+    def test_disk_entry_bound(self, tmp_path):
+        """Disk tier keeps at most max_disk_entries rows"""
+        path = str(tmp_path / 'cache.db')
+        cache = AnalysisResultCache(max_entries=1, path=path, max_disk_entries=3)
+        for i in range(5):
+            cache.put(str(i), i)
+        fresh = AnalysisResultCache(path=path)
+        assert [fresh.get(str(i)) for i in range(5)] == [None, None, 2, 3, 4]
@@ -4,31 +4,13 @@ Tests for API routes
 Tests cover:
 - Health check endpoint
 - Languages endpoint
+- Deeply nested submissions
+- Incremental re-analysis against a previous analysis
 """
 
-import pytest
-from app import create_app
 from app.models import db
 
 
-@pytest.fixture
-def app():
-    """Create a test Flask application."""
-    app = create_app()
-    app.config['TESTING'] = True
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite://'  # in-memory
-    with app.app_context():
-        db.create_all()
-        yield app
-        db.drop_all()
-
-
-@pytest.fixture
-def client(app):
-    """Create a test client."""
-    return app.test_client()
-
-
 class TestHealthEndpoint:
     """Test health check endpoint"""
 
@@ -61,3 +43,319 @@ class TestLanguagesEndpoint:
         assert isinstance(data['languages'], list)
         assert 'python' in data['languages']
         assert 'java' in data['languages']
+
+
+class TestAnalyzeCache:
+    """Test the analysis result cache"""
+
+    CODE = "def add(a, b):\n    return a + b\n"
+
+    def test_resubmission_is_cache_hit(self, client):
+        """Second identical submission is served from the cache"""
+        from app.services.result_cache import result_cache
+        result_cache.clear()
+        first = client.post('/api/v1/analyze', json={'code': self.CODE, 'language': 'python'})
+        second = client.post('/api/v1/analyze', json={'code': self.CODE, 'language': 'python'})
+        assert first.get_json()['cache_hit'] is False
+        assert second.get_json()['cache_hit'] is True
+        assert second.get_json()['clone_percentage'] == first.get_json()['clone_percentage']
+
+    def test_whitespace_only_change_is_cache_hit(self, client):
+        """Trailing whitespace and CRLF line endings share a cache entry"""
+        from app.services.result_cache import result_cache
+        result_cache.clear()
+        client.post('/api/v1/analyze', json={'code': self.CODE, 'language': 'python'})
+        crlf = self.CODE.replace('\n', '  \r\n')
+        response = client.post('/api/v1/analyze', json={'code': crlf, 'language': 'python'})
+        assert response.get_json()['cache_hit'] is True
+
+    def test_cache_hit_still_saves_analysis(self, client):
+        """Authenticated cache hits record a new Analysis row"""
+        from app.services.result_cache import result_cache
+        result_cache.clear()
+        token = client.post('/api/v1/auth/register', json={
+            'username': 'cacheuser', 'email': 'cache@example.com', 'password': 'password123'
+        }).get_json()['access_token']
+        headers = {'Authorization': f'Bearer {token}'}
+        ids = [
+            client.post('/api/v1/analyze', headers=headers,
+                        json={'code': self.CODE, 'language': 'python'}).get_json()['analysis_id']
+            for _ in range(2)
+        ]
+        assert ids[0] != ids[1]
+        history = client.get('/api/v1/auth/history', headers=headers).get_json()
+        assert history['total'] == 2
+
+
+class TestDeeplyNestedCode:
+    """Test submissions nested past the parsers' limits"""
+
+    def test_deep_nesting_is_a_syntax_error(self, client):
+        """Both languages answer 200 with a syntax_error, not a 500"""
+        python = "x = " + "+".join(["a"] * 20000) + "\n"
+        java = "class A {\n    int f() {\n        return " + "(" * 170 + "1" + ")" * 170 + ";\n    }\n}\n"
+        for code, language in ((python, 'python'), (java, 'java')):
+            response = client.post('/api/v1/analyze', json={'code': code, 'language': language})
+            assert response.status_code == 200
+            assert response.get_json()['syntax_error']['message'] == 'too deeply nested'
+
+
+class TestIncrementalAnalyze:
+    """Test re-analysis against previous_analysis_id"""
+
+    FUNCS = ''.join(f"def f{i}(x):\n    if x > {i}:\n        return x\n    return {i}\n\n" for i in range(5))
+
+    def _login(self, client, name):
+        return {'Authorization': 'Bearer ' + client.post('/api/v1/auth/register', json={
+            'username': name, 'email': f'{name}@example.com', 'password': 'password123'
+        }).get_json()['access_token']}
+
+    def test_unchanged_functions_are_reused(self, client):
+        """Editing one function recomputes only that function"""
+        from app.services.incremental import snapshot_store
+        from app.services.result_cache import result_cache
+        result_cache.clear()
+        snapshot_store.clear()
+        headers = self._login(client, 'incuser')
+        first = client.post('/api/v1/analyze', headers=headers,
+                            json={'code': self.FUNCS, 'language': 'python'}).get_json()
+        edited = self.FUNCS.replace('x > 2', 'x >= 2')
+        response = client.post('/api/v1/analyze', headers=headers, json={
+            'code': edited, 'language': 'python', 'previous_analysis_id': first['analysis_id'],
+        })
+        assert response.status_code == 200
+        incremental = response.get_json()['incremental']
+        assert incremental['previous_analysis_id'] == first['analysis_id']
+        assert incremental['snapshot_found'] is True
+        assert incremental['regions_reused'] == 4
+        assert incremental['regions_recomputed'] == 1
+
+    def test_previous_analysis_requires_login(self, client):
+        """Anonymous requests cannot refer to a previous analysis"""
+        response = client.post('/api/v1/analyze', json={
+            'code': self.FUNCS, 'language': 'python', 'previous_analysis_id': 'x',
+        })
+        assert response.status_code == 401
+
+    def test_other_users_analysis_is_404(self, client):
+        """Only the user's own analyses can be used"""
+        owner = self._login(client, 'incowner')
+        analysis_id = client.post('/api/v1/analyze', headers=owner,
+                                  json={'code': self.FUNCS, 'language': 'python'}).get_json()['analysis_id']
+        response = client.post('/api/v1/analyze', headers=self._login(client, 'incother'), json={
+            'code': self.FUNCS, 'language': 'python', 'previous_analysis_id': analysis_id,
+        })
+        assert response.status_code == 404
+
+    def test_language_mismatch_is_400(self, client):
+        """The previous analysis must be in the same language"""
+        headers = self._login(client, 'inclang')
+        analysis_id = client.post('/api/v1/analyze', headers=headers,
+                                  json={'code': self.FUNCS, 'language': 'python'}).get_json()['analysis_id']
+        response = client.post('/api/v1/analyze', headers=headers, json={
+            'code': 'class A { }', 'language': 'java', 'previous_analysis_id': analysis_id,
+        })
+        assert response.status_code == 400
+
+
+class TestAsyncJobs:
+    """Test asynchronous analysis jobs"""
+
+    CODE = "def mul(a, b):\n    return a * b\n"
+
+    def _wait(self, client, job_id, headers=None):
+        import time
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            data = client.get(f'/api/v1/jobs/{job_id}', headers=headers).get_json()
+            if data['status'] in ('finished', 'failed'):
+                return data
+            time.sleep(0.05)
+        raise AssertionError('job did not finish')
+
+    def test_async_returns_job_and_result(self, client):
+        """async=1 returns 202 with a job id that eventually finishes"""
+        response = client.post('/api/v1/analyze?async=1', json={'code': self.CODE, 'language': 'python'})
+        assert response.status_code == 202
+        job_id = response.get_json()['job_id']
+        data = self._wait(client, job_id)
+        assert data['status'] == 'finished'
+        assert data['result']['language'] == 'python'
+        assert data['result']['saved'] is False
+
+    def test_async_saves_for_authenticated_user(self, client):
+        """Finished jobs record an Analysis for the submitting user"""
+        token = client.post('/api/v1/auth/register', json={
+            'username': 'jobuser', 'email': 'job@example.com', 'password': 'password123'
+        }).get_json()['access_token']
+        headers = {'Authorization': f'Bearer {token}'}
+        job_id = client.post('/api/v1/analyze?async=1', headers=headers,
+                             json={'code': self.CODE, 'language': 'python'}).get_json()['job_id']
+        data = self._wait(client, job_id, headers)
+        assert data['result']['saved'] is True
+        history = client.get('/api/v1/auth/history', headers=headers).get_json()
+        assert history['analyses'][0]['id'] == data['result']['analysis_id']
+
+    def test_other_users_cannot_see_job(self, client):
+        """A user's job is hidden from anonymous callers"""
+        token = client.post('/api/v1/auth/register', json={
+            'username': 'jobowner', 'email': 'owner@example.com', 'password': 'password123'
+        }).get_json()['access_token']
+        headers = {'Authorization': f'Bearer {token}'}
+        job_id = client.post('/api/v1/analyze?async=1', headers=headers,
+                             json={'code': self.CODE, 'language': 'python'}).get_json()['job_id']
+        assert client.get(f'/api/v1/jobs/{job_id}').status_code == 404
+        self._wait(client, job_id, headers)
+
+    def test_job_is_visible_to_other_workers(self, client):
+        """Polls served by a worker that did not run the job still find it"""
+        from app.services.jobs import AnalysisJobQueue
+        job_id = client.post('/api/v1/analyze?async=1',
+                             json={'code': self.CODE, 'language': 'python'}).get_json()['job_id']
+        other_worker = AnalysisJobQueue()
+        assert other_worker.get(job_id).status in ('queued', 'finished')
+        data = self._wait(client, job_id)
+        job = other_worker.get(job_id)
+        assert job.to_dict() == data
+
+    def test_unknown_job_is_404(self, client):
+        """Unknown job ids return 404"""
+        assert client.get('/api/v1/jobs/does-not-exist').status_code == 404
+
+    def test_full_queue_returns_429(self, client):
+        """Submissions beyond the queue depth are rejected with 429"""
+        from app.services.jobs import job_queue
+        depth = job_queue.max_pending
+        job_queue.max_pending = 0
+        try:
+            response = client.post('/api/v1/analyze?async=1', json={'code': self.CODE, 'language': 'python'})
+        finally:
+            job_queue.max_pending = depth
+        assert response.status_code == 429
+        assert 'Retry-After' in response.headers
+
+
+class TestBatchAnalyze:
+    """Test the batch analysis endpoint"""
+
+    def _items(self, count):
+        return [
+            {'name': f'f{i}.py', 'language': 'python', 'code': f'def f{i}(x):\n    return x + {i}\n'}
+            for i in range(count)
+        ]
+
+    def test_batch_returns_result_per_item(self, client):
+        """Each item gets a result in request order"""
+        response = client.post('/api/v1/analyze/batch', json={'items': self._items(5)})
+        assert response.status_code == 200
+        data = response.get_json()
+        assert data['total'] == 5 and data['succeeded'] == 5
+        assert [r['name'] for r in data['results']] == [f'f{i}.py' for i in range(5)]
+
+    def test_invalid_items_do_not_fail_batch(self, client):
+        """Invalid items get an error entry, the rest are analyzed"""
+        items = self._items(2) + [{'name': 'bad.js', 'code': 'x', 'language': 'javascript'}]
+        data = client.post('/api/v1/analyze/batch', json=items).get_json()
+        assert data['succeeded'] == 2 and data['failed'] == 1
+        assert 'Unsupported language' in data['results'][2]['error']
+
+    def test_batch_saves_all_rows_for_user(self, client):
+        """Authenticated batches save one Analysis per successful item"""
+        token = client.post('/api/v1/auth/register', json={
+            'username': 'batchuser', 'email': 'batch@example.com', 'password': 'password123'
+        }).get_json()['access_token']
+        headers = {'Authorization': f'Bearer {token}'}
+        items = self._items(3)
+        items.append(dict(items[0], name='copy.py'))
+        data = client.post('/api/v1/analyze/batch', headers=headers, json={'items': items}).get_json()
+        assert all(r['saved'] for r in data['results'])
+        assert len({r['analysis_id'] for r in data['results']}) == 4
+        assert data['results'][3]['cache_hit'] is True
+        history = client.get('/api/v1/auth/history', headers=headers).get_json()
+        assert history['total'] == 4
+
+    def test_empty_batch_rejected(self, client):
+        """An empty item list is a 400"""
+        assert client.post('/api/v1/analyze/batch', json={'items': []}).status_code == 400
+
+    def test_oversized_batch_rejected(self, client, app):
+        """Batches above ANALYSIS_BATCH_MAX_ITEMS are rejected"""
+        app.config['ANALYSIS_BATCH_MAX_ITEMS'] = 2
+        assert client.post('/api/v1/analyze/batch', json=self._items(3)).status_code == 413
+
+    def test_stream_returns_ndjson_lines(self, client):
+        """stream=1 yields one JSON line per item and a summary line"""
+        import json
+        items = self._items(3) + [{'name': 'bad.py', 'code': '', 'language': 'python'}]
+        response = client.post('/api/v1/analyze/batch?stream=1', json={'items': items})
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+        lines = [json.loads(line) for line in response.data.decode().splitlines()]
+        assert len(lines) == 5
+        assert sorted(line['index'] for line in lines[:-1]) == [0, 1, 2, 3]
+        assert lines[-1]['summary'] == {
+            'total': 4, 'succeeded': 3, 'failed': 1, 'save_failed': 0,
+            'execution_time_ms': lines[-1]['summary']['execution_time_ms'],
+        }
+
+    def test_stream_saves_rows_for_user(self, client):
+        """Streamed batches still save every successful item"""
+        token = client.post('/api/v1/auth/register', json={
+            'username': 'streamuser', 'email': 'stream@example.com', 'password': 'password123'
+        }).get_json()['access_token']
+        headers = {'Authorization': f'Bearer {token}', 'Accept': 'application/x-ndjson'}
+        response = client.post('/api/v1/analyze/batch', headers=headers, json=self._items(3))
+        assert response.mimetype == 'application/x-ndjson'
+        assert len(response.data.decode().splitlines()) == 4
+        history = client.get('/api/v1/auth/history', headers=headers).get_json()
+        assert history['total'] == 3
+
+    def _stream_user(self, client):
+        token = client.post('/api/v1/auth/register', json={
+            'username': 'streamfail', 'email': 'streamfail@example.com', 'password': 'password123'
+        }).get_json()['access_token']
+        return {'Authorization': f'Bearer {token}'}
+
+    def _stream_lines(self, client, headers, items):
+        import json
+        response = client.post('/api/v1/analyze/batch?stream=1', headers=headers, json=items)
+        return [json.loads(line) for line in response.data.decode().splitlines()]
+
+    def test_stream_save_failure_keeps_earlier_rows(self, client, monkeypatch):
+        """One item failing to save rolls back only that item"""
+        from app.services import clone_index
+        headers = self._stream_user(client)
+        add_sources = clone_index.add_sources
+        calls = []
+
+        def flaky(sources):
+            calls.append(sources)
+            if len(calls) == 3:
+                raise RuntimeError('index unavailable')
+            return add_sources(sources)
+
+        monkeypatch.setattr(clone_index, 'add_sources', flaky)
+        lines = self._stream_lines(client, headers, self._items(4))
+        saved = [line for line in lines[:-1] if line['saved']]
+        assert len(saved) == 3
+        assert [line['save_error'] for line in lines[:-1] if not line['saved']] == ['index unavailable']
+        summary = lines[-1]['summary']
+        assert summary['succeeded'] == 3 and summary['save_failed'] == 1
+        history = client.get('/api/v1/auth/history', headers=headers).get_json()
+        assert sorted(a['id'] for a in history['analyses']) == sorted(line['analysis_id'] for line in saved)
+
+    def test_stream_commit_failure_is_reported(self, client, monkeypatch):
+        """Items whose commit fails are not reported as saved"""
+        headers = self._stream_user(client)
+
+        def failing_commit():
+            raise RuntimeError('disk full')
+
+        monkeypatch.setattr(db.session, 'commit', failing_commit)
+        lines = self._stream_lines(client, headers, self._items(2))
+        assert all(not line['saved'] and 'analysis_id' not in line for line in lines[:-1])
+        summary = lines[-1]['summary']
+        assert summary['succeeded'] == 0 and summary['save_failed'] == 2
+        monkeypatch.undo()
+        history = client.get('/api/v1/auth/history', headers=headers).get_json()
+        assert history['total'] == 0
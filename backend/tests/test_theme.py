@@ -0,0 +1,104 @@
+"""
+Tests for the cached theme endpoint
+
+Tests cover:
+- ETag and conditional requests
+- Updates through the admin endpoint
+- Serving from memory and noticing changes by other workers
+"""
+
+import json
+
+import pytest
+from app import create_app
+from app.models import db, User
+from app.services.theme import ThemeStore
+
+
+@pytest.fixture
+def theme_file(tmp_path, monkeypatch):
+    """theme.json location for the app under test."""
+    path = tmp_path / 'theme.json'
+    monkeypatch.setenv('THEME_FILE', str(path))
+    return path
+
+
+@pytest.fixture
+def app(theme_file):
+    """Create a test Flask application."""
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.drop_all()
+
+
+@pytest.fixture
+def client(app):
+    """Create a test client."""
+    return app.test_client()
+
+
+def _admin(client):
+    token = client.post('/api/v1/auth/register', json={
+        'username': 'themeadmin', 'email': 'themeadmin@example.com', 'password': 'password123'
+    }).get_json()['access_token']
+    User.query.filter_by(username='themeadmin').update({'role': 'admin'})
+    db.session.commit()
+    return {'Authorization': f'Bearer {token}'}
+
+
+class TestConditionalRequests:
+    """Test ETag handling"""
+
+    def test_default_theme_has_etag(self, client):
+        """Without a file the default theme is served with validators"""
+        response = client.get('/api/v1/auth/admin/theme')
+        assert response.get_json() == {'accentColor': '#6366f1'}
+        assert response.headers['ETag']
+        assert response.headers['Cache-Control'] == 'no-cache'
+
+    def test_matching_etag_is_304(self, client):
+        """A revalidation with the current ETag gets an empty 304"""
+        etag = client.get('/api/v1/auth/admin/theme').headers['ETag']
+        response = client.get('/api/v1/auth/admin/theme', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert response.data == b''
+
+
+class TestThemeUpdates:
+    """Test setting the theme"""
+
+    def test_update_changes_theme_and_etag(self, client, theme_file):
+        """A new color is written atomically and served with a new ETag"""
+        old_etag = client.get('/api/v1/auth/admin/theme').headers['ETag']
+        response = client.put('/api/v1/auth/admin/theme', headers=_admin(client), json={'accentColor': '#112233'})
+        assert response.status_code == 200
+        current = client.get('/api/v1/auth/admin/theme', headers={'If-None-Match': old_etag})
+        assert current.status_code == 200
+        assert current.get_json() == {'accentColor': '#112233'}
+        assert current.headers['ETag'] == response.headers['ETag']
+        assert json.loads(theme_file.read_text()) == {'accentColor': '#112233'}
+        assert [p.name for p in theme_file.parent.iterdir()] == ['theme.json']
+
+
+class TestThemeStore:
+    """Test the in-memory store"""
+
+    def test_steady_state_reads_no_file(self, theme_file, monkeypatch):
+        """Within the check interval the file is not looked at"""
+        theme_file.write_text('{"accentColor": "#abcdef"}')
+        store = ThemeStore(str(theme_file), check_interval=60)
+        body, _ = store.get()
+        assert json.loads(body) == {'accentColor': '#abcdef'}
+        monkeypatch.setattr(store, '_signature', lambda: pytest.fail('file checked again'))
+        assert store.get()[0] == body
+
+    def test_change_by_another_process_is_picked_up(self, theme_file):
+        """A rewritten file is reloaded after the interval"""
+        store = ThemeStore(str(theme_file), check_interval=0)
+        first = store.get()
+        ThemeStore(str(theme_file)).set({'accentColor': '#000000'})
+        assert store.get() != first
+        assert json.loads(store.get()[0]) == {'accentColor': '#000000'}
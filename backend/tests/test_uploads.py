@@ -0,0 +1,125 @@
+"""
+Tests for streaming multipart uploads
+
+Tests cover:
+- Single source files
+- Zip and tar.gz archive expansion
+- Size and member-count limits
+- Corrupt archives
+"""
+
+import io
+import tarfile
+import zipfile
+
+import pytest
+from app.models import UploadedFile
+
+
+@pytest.fixture
+def headers(client):
+    """Authorization header of a fresh user."""
+    token = client.post('/api/v1/auth/register', json={
+        'username': 'uploader', 'email': 'uploader@example.com', 'password': 'password123'
+    }).get_json()['access_token']
+    return {'Authorization': f'Bearer {token}'}
+
+
+def _zip(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def _tar_gz(members):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode='w:gz') as archive:
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+def _upload(client, headers, *files):
+    return client.post('/api/v1/auth/files/upload', headers=headers, content_type='multipart/form-data',
+                       data={'file': [(io.BytesIO(data), name) for name, data in files]})
+
+
+class TestSingleFiles:
+    """Test plain file parts"""
+
+    def test_source_file_is_stored(self, client, headers):
+        """A .py part becomes one python file entry"""
+        response = _upload(client, headers, ('main.py', b'print(1)\n'))
+        assert response.status_code == 201
+        stored = response.get_json()['files']
+        assert [(f['name'], f['file_type'], f['size']) for f in stored] == [('main.py', 'python', 9)]
+        content = client.get(f"/api/v1/auth/files/{stored[0]['id']}", headers=headers).get_json()
+        assert content['file']['content'] == 'print(1)\n'
+
+    def test_missing_part_is_400(self, client, headers):
+        """The request needs at least one file part"""
+        response = client.post('/api/v1/auth/files/upload', headers=headers,
+                               content_type='multipart/form-data', data={})
+        assert response.status_code == 400
+
+
+class TestArchives:
+    """Test archive expansion"""
+
+    MEMBERS = {
+        'project/Main.java': b'class Main { }\n',
+        'project/util.py': b'def f():\n    return 1\n',
+        'project/logo.png': b'\x89PNG\0\0',
+        'project/.hidden': b'secret',
+        '__MACOSX/project/._util.py': b'meta',
+    }
+
+    def test_zip_members_become_files(self, client, headers):
+        """Text members are stored, binary ones skipped, metadata ignored"""
+        response = _upload(client, headers, ('project.zip', _zip(self.MEMBERS)))
+        body = response.get_json()
+        assert response.status_code == 201
+        assert sorted(f['name'] for f in body['files']) == ['project/Main.java', 'project/util.py']
+        assert body['skipped'] == [{'name': 'project/logo.png', 'reason': 'binary'}]
+
+    def test_tar_gz_members_become_files(self, client, headers):
+        """tar.gz archives are read as a stream"""
+        response = _upload(client, headers, ('project.tar.gz', _tar_gz(self.MEMBERS)))
+        types = {f['name']: f['file_type'] for f in response.get_json()['files']}
+        assert types == {'project/Main.java': 'java', 'project/util.py': 'python'}
+
+    def test_oversized_member_is_skipped(self, app, client, headers):
+        """Members above UPLOAD_MAX_FILE_BYTES are reported, not stored"""
+        app.config['UPLOAD_MAX_FILE_BYTES'] = 10
+        response = _upload(client, headers, ('p.zip', _zip({'big.py': b'x = 1\n' * 10, 'ok.py': b'x = 1\n'})))
+        body = response.get_json()
+        assert [f['name'] for f in body['files']] == ['ok.py']
+        assert body['skipped'] == [{'name': 'big.py', 'reason': 'too large'}]
+
+    def test_corrupt_archive_is_400(self, client, headers):
+        """A part named .zip that is not a zip is rejected"""
+        response = _upload(client, headers, ('p.zip', b'not a zip'))
+        assert response.status_code == 400
+
+
+class TestLimits:
+    """Test limits enforced while reading"""
+
+    def test_request_over_limit_is_413(self, app, client, headers):
+        """The body size limit applies to this endpoint"""
+        app.config['UPLOAD_MAX_BYTES'] = 1024
+        response = _upload(client, headers, ('big.py', b'x = 1\n' * 1000))
+        assert response.status_code == 413
+        assert UploadedFile.query.count() == 0
+
+    def test_too_many_members_is_413(self, app, client, headers):
+        """Archives with too many files are rejected as a whole"""
+        app.config['UPLOAD_MAX_ARCHIVE_FILES'] = 2
+        members = {f'f{i}.py': b'x = 1\n' for i in range(3)}
+        response = _upload(client, headers, ('p.zip', _zip(members)))
+        assert response.status_code == 413
+        assert UploadedFile.query.count() == 0